@@ -3,6 +3,9 @@ ASGI config for funds project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve it with ``uvicorn config.asgi:application`` to get the async views
+under /api/v1/async/ without a thread per waiting request.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/3.1/howto/deployment/asgi/
 """
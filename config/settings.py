@@ -43,6 +43,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'funds.middleware.TimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -76,17 +77,141 @@ WSGI_APPLICATION = 'config.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/3.1/ref/settings/#databases
 
+# Connections are kept open for POSTGRES_CONN_MAX_AGE seconds and checked
+# before their first use in each request. With POSTGRES_POOL on, every
+# request instead takes a connection from a pool shared by the threads of
+# the process and puts it back when it finishes, see funds.backends.postgresql.
+
+POSTGRES_POOL = environ.get('POSTGRES_POOL', 'false').lower() in ('1', 'true', 'yes')
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': 'funds.backends.postgresql',
         'USER': environ['POSTGRES_USER'],
         'PASSWORD': environ['POSTGRES_PASSWORD'],
         'NAME': 'postgres',
         'HOST': 'db',
-        'PORT': environ['POSTGRES_PORT']
+        'PORT': environ['POSTGRES_PORT'],
+        # The pool keeps the connections open, so the requests don't have to:
+        # closing a connection at the end of a request puts it back in the pool
+        'CONN_MAX_AGE': (
+            0 if POSTGRES_POOL else int(environ.get('POSTGRES_CONN_MAX_AGE', 60))
+        ),
+        'CONN_HEALTH_CHECKS': environ.get(
+            'POSTGRES_CONN_HEALTH_CHECKS',
+            'true'
+        ).lower() in ('1', 'true', 'yes'),
+        'POOL': {
+            'MAX_SIZE': int(environ.get('POSTGRES_POOL_MAX_SIZE', 10)),
+            'TIMEOUT': float(environ.get('POSTGRES_POOL_TIMEOUT', 30)),
+        } if POSTGRES_POOL else None,
     }
 }
 
+# Django REST framework
+# https://www.django-rest-framework.org/api-guide/settings/
+
+REST_FRAMEWORK = {
+    'DEFAULT_PAGINATION_CLASS': 'funds.pagination.KeysetPagination',
+    'PAGE_SIZE': int(environ.get('FUNDS_PAGE_SIZE', 100)),
+    'DEFAULT_RENDERER_CLASSES': [
+        'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+}
+
+# Number of rows per INSERT statement for bulk imports
+FUNDS_BULK_BATCH_SIZE = int(environ.get('FUNDS_BULK_BATCH_SIZE', 1000))
+
+# Number of rows fetched per round trip when streaming exports
+FUNDS_EXPORT_CHUNK_SIZE = int(environ.get('FUNDS_EXPORT_CHUNK_SIZE', 2000))
+
+# Longest balance forecast an account may request, and how far ahead
+# materialize_recurring may create postings, in days
+FUNDS_FORECAST_MAX_DAYS = int(environ.get('FUNDS_FORECAST_MAX_DAYS', 5 * 366))
+
+# Seconds before the payee suggestions are reloaded to pick up other processes' writes
+FUNDS_PAYEE_INDEX_MAX_AGE = int(environ.get('FUNDS_PAYEE_INDEX_MAX_AGE', 300))
+
+# Cache
+# https://docs.djangoproject.com/en/3.1/topics/cache/
+# Process local by default, which is only correct with a single process. With
+# more than one worker process FUNDS_CACHE_BACKEND must be a shared backend
+# such as Memcached or Redis, or writes handled by one worker won't invalidate
+# the ETags and cached rows of the others. check --deploy fails otherwise.
+
+CACHES = {
+    'default': {
+        'BACKEND': environ.get(
+            'FUNDS_CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': environ.get('FUNDS_CACHE_LOCATION', 'funds'),
+    }
+}
+
+# Cache used for serialized accounts and categories and list ETag versions
+FUNDS_CACHE_ALIAS = 'default'
+FUNDS_CACHE_TIMEOUT = int(environ.get('FUNDS_CACHE_TIMEOUT', 3600))
+
+# Async views
+# Run the queries of the async views on a psycopg 3 AsyncConnectionPool when
+# psycopg and psycopg_pool are installed and the database is Postgres,
+# otherwise on Django's connection through sync_to_async.
+FUNDS_ASYNC_DB_POOL = environ.get(
+    'FUNDS_ASYNC_DB_POOL',
+    'true'
+).lower() in ('1', 'true', 'yes')
+FUNDS_ASYNC_DB_POOL_MIN_SIZE = int(environ.get('FUNDS_ASYNC_DB_POOL_MIN_SIZE', 1))
+FUNDS_ASYNC_DB_POOL_MAX_SIZE = int(environ.get('FUNDS_ASYNC_DB_POOL_MAX_SIZE', 10))
+FUNDS_ASYNC_DB_POOL_TIMEOUT = float(environ.get('FUNDS_ASYNC_DB_POOL_TIMEOUT', 30))
+
+# Longest a long polling request may wait for a change, and how often it checks
+FUNDS_LONG_POLL_MAX_WAIT = int(environ.get('FUNDS_LONG_POLL_MAX_WAIT', 60))
+FUNDS_LONG_POLL_INTERVAL = float(environ.get('FUNDS_LONG_POLL_INTERVAL', 0.5))
+
+# Request timing
+# Send the database, serialization and render time of every request in a
+# Server-Timing header, and warn about any SQL statement repeated more than
+# the threshold within one request.
+FUNDS_SERVER_TIMING = environ.get(
+    'FUNDS_SERVER_TIMING',
+    'true'
+).lower() in ('1', 'true', 'yes')
+FUNDS_TIMING_DUPLICATE_THRESHOLD = int(environ.get('FUNDS_TIMING_DUPLICATE_THRESHOLD', 10))
+
+# Metrics
+# Set FUNDS_METRICS_DIR to a directory shared by the worker processes when
+# running more than one, so /metrics reports the totals of all of them.
+FUNDS_METRICS_DIR = environ.get('FUNDS_METRICS_DIR')
+FUNDS_METRICS_FLUSH_INTERVAL = float(environ.get('FUNDS_METRICS_FLUSH_INTERVAL', 1))
+# Seconds a gauge counted from the database is reused for, about the scrape interval
+FUNDS_METRICS_GAUGE_MAX_AGE = float(environ.get('FUNDS_METRICS_GAUGE_MAX_AGE', 15))
+
+# Logging
+# https://docs.djangoproject.com/en/3.1/topics/logging/
+# funds.timing logs one JSON line per request at INFO, which is only shown
+# with FUNDS_TIMING_LOG_LEVEL=INFO. Repeated statements are logged at WARNING.
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'funds': {
+            'handlers': ['console'],
+            'level': environ.get('FUNDS_LOG_LEVEL', 'INFO'),
+        },
+        'funds.timing': {
+            'level': environ.get('FUNDS_TIMING_LOG_LEVEL', 'WARNING'),
+        },
+    },
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/3.1/ref/settings/#auth-password-validators
 
@@ -0,0 +1,171 @@
+"""
+Async read-only views of the ledger for ASGI servers
+
+Served under /api/v1/async/ by `uvicorn config.asgi:application`. Lists
+return the compact representation, rows of values, paged by ?after= the
+last key of the previous page. Unlike the compact postings of the sync API
+the posting rows leave out their transactions, the transactions view lists
+them with their posting_num.
+
+Every view supports long polling: with ?wait=<seconds> and the ETag of a
+previous response in If-None-Match, the request is held until a write
+changes the ETag or the wait runs out, in which case it gets a 304. Waiting
+requests only hold a coroutine that checks the cache versions every
+FUNDS_LONG_POLL_INTERVAL seconds, not a thread or a database connection.
+The checks run in a worker thread, so a networked cache doesn't block the
+event loop. Writes handled by other processes only wake a long poll when
+the cache is shared by all of them, see funds.cache.
+"""
+import asyncio
+import json
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotAllowed
+
+from funds.asyncdb import fetch
+from funds.cache import get_list_etag
+from funds.models import Accounts, Balances, Postings, Transactions
+from funds.renderers import CompactJSONEncoder
+from funds.serializers import (
+    AsyncListSerializer,
+    BalanceSerializer,
+    LongPollSerializer,
+    PostingFilterSerializer,
+    TransactionFilterSerializer
+)
+from funds.views import PostingsViewset, TransactionsViewset
+
+
+def json_response(data, status=200):
+    return HttpResponse(
+        json.dumps(data, cls=CompactJSONEncoder),
+        content_type='application/json',
+        status=status
+    )
+
+
+async def poll(request, etag_models, wait):
+    """
+    Wait up to wait seconds for the ETag of the request to stop matching If-None-Match
+
+    Returns the current ETag and whether the client's copy is still current.
+    """
+    etags = {tag.strip() for tag in request.headers.get('If-None-Match', '').split(',')}
+    deadline = time.monotonic() + wait
+    # Not thread sensitive, polls don't need to queue behind each other on one thread
+    get_etag = sync_to_async(get_list_etag, thread_sensitive=False)
+    etag = await get_etag(request, etag_models)
+    while etag in etags and time.monotonic() < deadline:
+        remaining = deadline - time.monotonic()
+        await asyncio.sleep(min(settings.FUNDS_LONG_POLL_INTERVAL, remaining))
+        etag = await get_etag(request, etag_models)
+    return etag, etag in etags
+
+
+async def list_rows(request, queryset, key, fields, filter_serializer_class, etag_models):
+    """
+    Respond with a page of rows of fields ordered by the unique key
+    """
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    options = AsyncListSerializer(data=request.GET)
+    filters = filter_serializer_class(data=request.GET, partial=True)
+    options.is_valid()
+    filters.is_valid()
+    if options.errors or filters.errors:
+        return json_response({**options.errors, **filters.errors}, status=400)
+
+    etag, not_modified = await poll(request, etag_models, options.validated_data['wait'])
+    if not_modified:
+        response = HttpResponse(status=304)
+        response['ETag'] = etag
+        return response
+
+    page_size = options.validated_data['page_size']
+    queryset = queryset.filter(**filters.validated_data)
+    if 'after' in options.validated_data:
+        queryset = queryset.filter(**{f'{key}__gt': options.validated_data['after']})
+    # One extra row tells whether there is a next page
+    rows = await fetch(queryset.order_by(key).values_list(*fields)[:page_size + 1])
+    next_url = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        query = request.GET.copy()
+        query.pop('wait', None)
+        query['after'] = rows[-1][fields.index(key)]
+        next_url = request.build_absolute_uri(f'{request.path}?{query.urlencode()}')
+
+    response = json_response({'next': next_url, 'columns': fields, 'results': rows})
+    response['ETag'] = etag
+    return response
+
+
+async def postings(request):
+    """
+    List postings by posting_num
+    """
+    return await list_rows(
+        request,
+        Postings.objects.all(),
+        'posting_num',
+        PostingsViewset.compact_fields,
+        PostingFilterSerializer,
+        ['postings']
+    )
+
+
+async def transactions(request):
+    """
+    List transactions by id
+    """
+    return await list_rows(
+        request,
+        Transactions.objects.all(),
+        'id',
+        TransactionsViewset.compact_fields,
+        TransactionFilterSerializer,
+        ['transactions']
+    )
+
+
+async def account_balance(request, pk):
+    """
+    Get the balance of an account, optionally as of the end of a date
+    """
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    options = LongPollSerializer(data=request.GET)
+    serializer = BalanceSerializer(data=request.GET)
+    options.is_valid()
+    serializer.is_valid()
+    if options.errors or serializer.errors:
+        return json_response({**options.errors, **serializer.errors}, status=400)
+
+    etag, not_modified = await poll(
+        request,
+        ['accounts', 'transactions', 'postings'],
+        options.validated_data['wait']
+    )
+    if not_modified:
+        response = HttpResponse(status=304)
+        response['ETag'] = etag
+        return response
+
+    as_of = serializer.validated_data.get('as_of')
+    balances = Balances.objects.filter(account_id=pk)
+    if as_of is not None:
+        balances = balances.filter(date__lte=as_of)
+    account, balance = await asyncio.gather(
+        fetch(Accounts.objects.filter(pk=pk).values_list('id')),
+        fetch(balances.order_by('-date').values_list('balance')[:1])
+    )
+    if not account:
+        return json_response({'detail': 'Not found.'}, status=404)
+    response = json_response(BalanceSerializer({
+        'as_of': as_of,
+        'balance': balance[0][0] if balance else 0
+    }).data)
+    response['ETag'] = etag
+    return response
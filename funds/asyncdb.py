@@ -0,0 +1,92 @@
+"""
+Database access for the async views
+
+Querysets are built and compiled to SQL by the ORM as usual. On Postgres,
+with psycopg 3 and psycopg_pool installed and FUNDS_ASYNC_DB_POOL on, they
+run on an AsyncConnectionPool so a request waiting on the database holds no
+thread. Otherwise they run on Django's connection through sync_to_async, in
+the event loop's thread pool so concurrent requests don't queue behind one
+thread. That fallback holds a thread per running query and is meant for
+development, deployments should install psycopg[binary] and psycopg_pool.
+"""
+import asyncio
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, connections
+
+from funds.middleware import current_recorder
+
+try:
+    from psycopg.conninfo import make_conninfo
+    from psycopg_pool import AsyncConnectionPool
+except ImportError:
+    AsyncConnectionPool = None
+
+# Task opening the pool of each event loop, uvicorn runs one loop per worker process
+pools = {}
+
+
+def use_pool():
+    return (
+        settings.FUNDS_ASYNC_DB_POOL
+        and AsyncConnectionPool is not None
+        and connections['default'].vendor == 'postgresql'
+    )
+
+
+async def open_pool():
+    database = settings.DATABASES['default']
+    conninfo = make_conninfo(
+        dbname=database['NAME'],
+        user=database['USER'],
+        password=database['PASSWORD'],
+        host=database['HOST'],
+        port=database['PORT']
+    )
+    pool = AsyncConnectionPool(
+        conninfo,
+        min_size=settings.FUNDS_ASYNC_DB_POOL_MIN_SIZE,
+        max_size=settings.FUNDS_ASYNC_DB_POOL_MAX_SIZE,
+        timeout=settings.FUNDS_ASYNC_DB_POOL_TIMEOUT,
+        open=False
+    )
+    await pool.open()
+    return pool
+
+
+async def get_pool():
+    loop = asyncio.get_running_loop()
+    if loop not in pools:
+        # Stored before awaiting so concurrent first requests share one pool
+        pools[loop] = loop.create_task(open_pool())
+    return await pools[loop]
+
+
+def fetch_sync(queryset):
+    try:
+        return list(queryset)
+    finally:
+        # Each pool thread has its own connection, no request_finished closes it
+        close_old_connections()
+
+
+async def fetch(queryset):
+    """
+    Get the rows of a values_list() queryset as a list of tuples
+    """
+    if not use_pool():
+        # The query is recorded by the connection's execute wrapper
+        return await sync_to_async(fetch_sync, thread_sensitive=False)(queryset)
+
+    sql, params = queryset.query.sql_with_params()
+    pool = await get_pool()
+    started = time.perf_counter()
+    async with pool.connection() as connection:
+        cursor = await connection.execute(sql, params)
+        rows = await cursor.fetchall()
+    recorder = current_recorder.get()
+    if recorder is not None:
+        recorder.record(sql, time.perf_counter() - started)
+    return rows
@@ -0,0 +1,111 @@
+"""
+PostgreSQL backend with connection health checks and an optional pool
+
+CONN_HEALTH_CHECKS works as it does from Django 4.1 on: a persistent
+connection is checked with SELECT 1 before its first use in each request
+and reopened if the server or a proxy closed it in between.
+
+With POOL in the database settings, connections closed by Django at the end
+of a request are put back in a funds.pool.ConnectionPool of at most
+POOL['MAX_SIZE'] connections instead of being closed, and the next request
+of any thread reuses them. A request waits up to POOL['TIMEOUT'] seconds
+for a free connection before failing.
+"""
+from functools import partial
+
+from django.db.backends.postgresql import base
+from psycopg2 import extensions
+
+from funds.pool import get_pool
+
+Database = base.Database
+
+
+def is_open(connection):
+    return not connection.closed
+
+
+def is_usable(connection):
+    if connection.closed:
+        return False
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+    except Database.Error:
+        return False
+    return True
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.health_check_done = False
+
+    @property
+    def health_check_enabled(self):
+        return self.settings_dict.get('CONN_HEALTH_CHECKS', False)
+
+    def get_pool(self):
+        options = self.settings_dict.get('POOL')
+        if not options:
+            return None
+        return get_pool(
+            self.alias,
+            max_size=options.get('MAX_SIZE', 10),
+            timeout=options.get('TIMEOUT', 30),
+            check=is_usable if self.health_check_enabled else is_open
+        )
+
+    def get_new_connection(self, conn_params):
+        pool = self.get_pool()
+        if pool is None:
+            return super().get_new_connection(conn_params)
+        connection = pool.acquire(partial(super().get_new_connection, conn_params))
+        # A reused connection was set up by the wrapper that opened it
+        self.isolation_level = self.settings_dict['OPTIONS'].get(
+            'isolation_level',
+            connection.isolation_level
+        )
+        return connection
+
+    def _close(self):
+        pool = self.get_pool()
+        if pool is None:
+            return super()._close()
+        connection = self.connection
+        # Closed inside an atomic block the wrapper keeps the connection, so
+        # it can't go back to the pool for another thread to use
+        discard = connection.closed or self.in_atomic_block
+        idle = extensions.TRANSACTION_STATUS_IDLE
+        if not discard and connection.get_transaction_status() != idle:
+            try:
+                connection.rollback()
+            except Database.Error:
+                discard = True
+        pool.release(connection, discard=discard)
+
+    def connect(self):
+        super().connect()
+        self.health_check_done = True
+
+    def close_if_unusable_or_obsolete(self):
+        super().close_if_unusable_or_obsolete()
+        # Check the connection again before it's used in the next request
+        self.health_check_done = False
+
+    def close_if_health_check_failed(self):
+        if (
+            self.connection is None
+            or not self.health_check_enabled
+            or self.health_check_done
+            or self.in_atomic_block
+        ):
+            return
+        if not self.is_usable():
+            self.close()
+        self.health_check_done = True
+
+    def _cursor(self, name=None):
+        self.close_if_health_check_failed()
+        return super()._cursor(name)
@@ -0,0 +1,579 @@
+"""
+Benchmark scenarios for the API
+
+Each scenario makes one request through the in-process test client, so the
+numbers cover URL routing, the views, serialization and the database but no
+network or web server. Scenarios that write run every request in a
+transaction that is rolled back, so the ledger is the same for every run.
+
+The concurrency benchmarks at the end compare the sync views served by the
+WSGI handler on a pool of threads, like a threaded WSGI server, with the
+async views served by the ASGI handler on one event loop, like uvicorn.
+"""
+import asyncio
+import datetime
+import io
+import queue
+import random
+import statistics
+import subprocess
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from urllib.parse import urlencode
+from wsgiref.util import setup_testing_defaults
+
+from django.core.asgi import get_asgi_application
+from django.core.wsgi import get_wsgi_application
+from django.db import connection, connections, transaction
+from django.db.models import Max, Min
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from funds.models import Accounts, Budgets, Categories, Postings
+
+SCENARIOS = {}
+
+# Pairs of the sync and async endpoints serving the same rows
+CONCURRENCY_SCENARIOS = {
+    'postings': {
+        'description': 'First page of postings in the compact representation',
+        'sync': lambda context: (reverse('postings-list'), {'view': 'compact'}),
+        'async': lambda context: (reverse('async-postings'), {}),
+    },
+    'transactions': {
+        'description': 'First page of transactions in the compact representation',
+        'sync': lambda context: (reverse('transactions-list'), {'view': 'compact'}),
+        'async': lambda context: (reverse('async-transactions'), {}),
+    },
+    'accounts-balance': {
+        'description': 'Current balance of an account',
+        'sync': lambda context: (
+            reverse('accounts-balance', args=[context['account_id']]),
+            {}
+        ),
+        'async': lambda context: (
+            reverse('async-accounts-balance', args=[context['account_id']]),
+            {}
+        ),
+    },
+}
+
+
+def scenario(name, write=False):
+    """
+    Register a function taking (client, context) and returning a response as a scenario
+    """
+    def register(function):
+        SCENARIOS[name] = {
+            'function': function,
+            'write': write,
+            'description': function.__doc__.strip()
+        }
+        return function
+    return register
+
+
+def build_context(seed=0):
+    """
+    Collect the ids and dates the scenarios make requests for
+    """
+    postings = Postings.objects.aggregate(
+        first=Min('posting_num'),
+        last=Max('posting_num'),
+        latest=Max('date')
+    )
+    budget = Budgets.objects.order_by('-year', '-month').values('year', 'month').first()
+    latest = postings['latest'] or datetime.date.today()
+    return {
+        'random': random.Random(seed),
+        'account_id': (
+            Accounts.objects.order_by('id').values_list('id', flat=True).first()
+        ),
+        'category_id': (
+            Categories.objects.order_by('id').values_list('id', flat=True).first()
+        ),
+        'first_posting_num': postings['first'] or 0,
+        'last_posting_num': postings['last'] or 0,
+        'latest_date': latest,
+        'budget_year': budget['year'] if budget else latest.year,
+        'budget_month': budget['month'] if budget else latest.month,
+    }
+
+
+@scenario('postings-list')
+def postings_list(client, context):
+    """First page of postings with their transactions"""
+    return client.get(reverse('postings-list'))
+
+
+@scenario('postings-list-compact')
+def postings_list_compact(client, context):
+    """First page of postings in the compact representation"""
+    return client.get(reverse('postings-list'), {'view': 'compact'})
+
+
+@scenario('postings-filtered')
+def postings_filtered(client, context):
+    """Uncleared postings of the last 90 days, newest first"""
+    return client.get(reverse('postings-list'), {
+        'date__gte': context['latest_date'] - datetime.timedelta(days=90),
+        'cleared': 'false',
+        'ordering': '-date'
+    })
+
+
+@scenario('postings-detail')
+def postings_detail(client, context):
+    """A random posting by posting_num"""
+    posting_num = context['random'].randint(
+        context['first_posting_num'],
+        context['last_posting_num']
+    )
+    return client.get(reverse('postings-detail', args=[posting_num]))
+
+
+@scenario('postings-unbalanced')
+def postings_unbalanced(client, context):
+    """Audit of the transfers that don't net to zero"""
+    return client.get(reverse('postings-unbalanced'))
+
+
+@scenario('postings-search')
+def postings_search(client, context):
+    """Ranked search for one of the seeded payees"""
+    return client.get(
+        reverse('search-list'),
+        {'q': f"payee {context['random'].randint(1, 50)}"}
+    )
+
+
+@scenario('payees-suggest')
+def payees_suggest(client, context):
+    """Payee suggestions for a prefix, from the in-memory index"""
+    return client.get(
+        reverse('payees-suggest'),
+        {'prefix': f"seed payee {context['random'].randint(1, 9)}"}
+    )
+
+
+@scenario('transactions-list')
+def transactions_list(client, context):
+    """First page of transactions with nested accounts and categories"""
+    return client.get(reverse('transactions-list'))
+
+
+@scenario('transactions-list-compact')
+def transactions_list_compact(client, context):
+    """First page of transactions in the compact representation"""
+    return client.get(reverse('transactions-list'), {'view': 'compact'})
+
+
+@scenario('transactions-filtered')
+def transactions_filtered(client, context):
+    """Spending of one account and category"""
+    return client.get(reverse('transactions-list'), {
+        'account_id': context['account_id'],
+        'categories_id': context['category_id'],
+        'amount__lte': 0
+    })
+
+
+@scenario('accounts-list')
+def accounts_list(client, context):
+    """Accounts with their current balances"""
+    return client.get(reverse('accounts-list'))
+
+
+@scenario('accounts-balance')
+def accounts_balance(client, context):
+    """Balance of an account as of a random date"""
+    days = context['random'].randrange(365)
+    as_of = context['latest_date'] - datetime.timedelta(days=days)
+    return client.get(
+        reverse('accounts-balance', args=[context['account_id']]),
+        {'as_of': as_of}
+    )
+
+
+@scenario('accounts-forecast')
+def accounts_forecast(client, context):
+    """Projected daily balance of an account for the next five years"""
+    return client.get(
+        reverse('accounts-forecast', args=[context['account_id']]),
+        {'days': 5 * 365}
+    )
+
+
+@scenario('reports-net-worth')
+def reports_net_worth(client, context):
+    """Daily net worth over the whole ledger"""
+    return client.get(reverse('reports-net-worth'), {'interval': 'day'})
+
+
+@scenario('budgets-report-month')
+def budgets_report_month(client, context):
+    """Budget against actual spending for the latest budgeted month"""
+    return client.get(reverse('budgets-report'), {
+        'year': context['budget_year'],
+        'month': context['budget_month']
+    })
+
+
+@scenario('budgets-report-year')
+def budgets_report_year(client, context):
+    """Budget against actual spending for the latest budgeted year"""
+    return client.get(reverse('budgets-report'), {'year': context['budget_year']})
+
+
+@scenario('analytics-monthly')
+def analytics_monthly(client, context):
+    """Monthly rollups of the latest year"""
+    return client.get(reverse('analytics-monthly-list'), {
+        'year__gte': context['latest_date'].year
+    })
+
+
+@scenario('postings-create', write=True)
+def postings_create(client, context):
+    """Create a single posting"""
+    return client.post(reverse('postings-list'), {
+        'posting_num': context['last_posting_num'] + 1,
+        'date': context['latest_date'],
+        'payee': 'Benchmark'
+    }, format='json')
+
+
+@scenario('postings-bulk', write=True)
+def postings_bulk(client, context):
+    """Bulk create 100 postings with one transaction each"""
+    first = context['last_posting_num'] + 1
+    return client.post(reverse('postings-bulk'), [
+        {
+            'posting_num': posting_num,
+            'date': context['latest_date'],
+            'payee': 'Benchmark',
+            'transactions': [{
+                'account_id': context['account_id'],
+                'categories_id': context['category_id'],
+                'amount': '-12.34'
+            }]
+        }
+        for posting_num in range(first, first + 100)
+    ], format='json')
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True,
+            text=True,
+            check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def percentile(values, fraction):
+    """
+    Get a percentile of values by linear interpolation between the closest ranks
+    """
+    values = sorted(values)
+    position = (len(values) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+@contextmanager
+def memory_tracer(result):
+    """
+    Record the most memory Python allocated at once in the block
+
+    Stored as result['peak_memory_kb'], counted from what was allocated when
+    the block started, so unlike the peak RSS of the process it only covers
+    the block.
+    """
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    baseline, _ = tracemalloc.get_traced_memory()
+    try:
+        yield result
+    finally:
+        _, peak = tracemalloc.get_traced_memory()
+        if not tracing:
+            tracemalloc.stop()
+        result['peak_memory_kb'] = max(peak - baseline, 0) // 1024
+
+
+def run_scenario(name, client, context, requests=50, warmup=5):
+    """
+    Time requests to a scenario and summarize latency, throughput, queries and memory
+    """
+    function = SCENARIOS[name]['function']
+    write = SCENARIOS[name]['write']
+
+    def request():
+        with transaction.atomic() if write else nullcontext():
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = function(client, context)
+                elapsed = time.perf_counter() - started
+            if write:
+                transaction.set_rollback(True)
+        return response, captured, elapsed
+
+    latencies = []
+    queries = []
+    sizes = []
+    errors = 0
+    for number in range(warmup + requests):
+        response, captured, elapsed = request()
+        if number < warmup:
+            continue
+        latencies.append(elapsed * 1000)
+        queries.append(len(captured))
+        sizes.append(len(response.content))
+        if response.status_code >= 400:
+            errors += 1
+    # Traced by one more request, tracing slows down the requests it covers
+    memory = {}
+    with memory_tracer(memory):
+        request()
+
+    return {
+        'description': SCENARIOS[name]['description'],
+        'requests': requests,
+        'errors': errors,
+        'latency_ms': {
+            'p50': round(percentile(latencies, 0.5), 3),
+            'p95': round(percentile(latencies, 0.95), 3),
+            'mean': round(statistics.mean(latencies), 3),
+            'max': round(max(latencies), 3),
+        },
+        'requests_per_sec': round(requests / (sum(latencies) / 1000), 1),
+        'queries': {
+            'mean': round(statistics.mean(queries), 2),
+            'max': max(queries),
+        },
+        'response_bytes': round(statistics.mean(sizes)),
+        **memory,
+    }
+
+
+def summarize(latencies, elapsed, errors):
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'latency_ms': {
+            'p50': round(percentile(latencies, 0.5), 3),
+            'p95': round(percentile(latencies, 0.95), 3),
+            'max': round(max(latencies), 3),
+        },
+        'requests_per_sec': round(len(latencies) / elapsed, 1),
+    }
+
+
+@contextmanager
+def thread_sampler(result, interval=0.01):
+    """
+    Record the most threads alive at once while the block runs in result['peak_threads']
+    """
+    done = threading.Event()
+    result['peak_threads'] = threading.active_count()
+
+    def sample():
+        while not done.is_set():
+            result['peak_threads'] = max(result['peak_threads'], threading.active_count())
+            done.wait(interval)
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    try:
+        yield result
+    finally:
+        done.set()
+        sampler.join()
+        # Not counting the sampler itself
+        result['peak_threads'] -= 1
+
+
+def wsgi_get(application, host, path, query):
+    """
+    Make a GET request to a WSGI application and return the status code and body
+    """
+    environ = {
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': path,
+        'QUERY_STRING': urlencode(query),
+        'HTTP_HOST': host,
+        'wsgi.input': io.BytesIO(),
+    }
+    setup_testing_defaults(environ)
+    status = []
+
+    def start_response(status_line, headers, exc_info=None):
+        status.append(int(status_line.split()[0]))
+
+    response = application(environ, start_response)
+    try:
+        body = b''.join(response)
+    finally:
+        response.close()
+    return status[0], body
+
+
+async def asgi_get(application, host, path, query, headers=()):
+    """
+    Make a GET request to an ASGI application and return the status code, headers and body
+    """
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': urlencode(query).encode(),
+        'headers': [(b'host', host.encode()), *headers],
+        'client': ('127.0.0.1', 0),
+        'server': (host, 80),
+    }
+    response = {'body': []}
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            response['status'] = message['status']
+            response['headers'] = {
+                name.lower(): value for name, value in message['headers']
+            }
+        else:
+            response['body'].append(message.get('body', b''))
+
+    await application(scope, receive, send)
+    return response['status'], response['headers'], b''.join(response['body'])
+
+
+def run_wsgi(name, context, host, clients, requests, threads):
+    """
+    Have clients each make requests to the sync endpoint of a scenario on a pool of threads
+
+    Like the threads of a WSGI server, each thread serves one client after
+    another and keeps its database connections until it exits.
+    """
+    path, query = CONCURRENCY_SCENARIOS[name]['sync'](context)
+    application = get_wsgi_application()
+    waiting = queue.SimpleQueue()
+    for _ in range(clients):
+        waiting.put(None)
+    lock = threading.Lock()
+    latencies = []
+    errors = 0
+
+    def serve():
+        nonlocal errors
+        try:
+            while True:
+                try:
+                    waiting.get_nowait()
+                except queue.Empty:
+                    return
+                for _ in range(requests):
+                    started = time.perf_counter()
+                    status, _ = wsgi_get(application, host, path, query)
+                    elapsed = (time.perf_counter() - started) * 1000
+                    with lock:
+                        latencies.append(elapsed)
+                        errors += status >= 400
+        finally:
+            connections.close_all()
+
+    result = {}
+    with thread_sampler(result):
+        started = time.perf_counter()
+        workers = [threading.Thread(target=serve) for _ in range(min(threads, clients))]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - started
+    return {**summarize(latencies, elapsed, errors), **result}
+
+
+def run_asgi(name, context, host, clients, requests):
+    """
+    Have clients each make requests to the async endpoint of a scenario on one event loop
+    """
+    path, query = CONCURRENCY_SCENARIOS[name]['async'](context)
+    application = get_asgi_application()
+
+    async def client():
+        timings = []
+        failed = 0
+        for _ in range(requests):
+            started = time.perf_counter()
+            status, _, _ = await asgi_get(application, host, path, query)
+            timings.append((time.perf_counter() - started) * 1000)
+            failed += status >= 400
+        return timings, failed
+
+    async def run():
+        return await asyncio.gather(*(client() for _ in range(clients)))
+
+    result = {}
+    with thread_sampler(result):
+        started = time.perf_counter()
+        finished = asyncio.run(run())
+        elapsed = time.perf_counter() - started
+    latencies = [timing for timings, _ in finished for timing in timings]
+    errors = sum(failed for _, failed in finished)
+    return {**summarize(latencies, elapsed, errors), **result}
+
+
+def run_long_poll(host, clients, wait):
+    """
+    Hold clients in a long poll of the async transactions until the wait runs out
+
+    Every client should get a 304. A sync view would need a thread for each
+    waiting client, the async ones share the event loop's thread.
+    """
+    path = reverse('async-transactions')
+    query = {'wait': wait}
+    application = get_asgi_application()
+
+    async def client(etag):
+        started = time.perf_counter()
+        headers = [(b'if-none-match', etag)]
+        status, _, _ = await asgi_get(application, host, path, query, headers)
+        return (time.perf_counter() - started) * 1000, status
+
+    async def run():
+        # Without If-None-Match this returns at once, with the ETag for the query
+        _, headers, _ = await asgi_get(application, host, path, query)
+        return await asyncio.gather(*(client(headers[b'etag']) for _ in range(clients)))
+
+    result = {}
+    with thread_sampler(result), memory_tracer(result):
+        started = time.perf_counter()
+        finished = asyncio.run(run())
+        elapsed = time.perf_counter() - started
+    return {
+        'clients': clients,
+        'wait': wait,
+        'not_modified': sum(status == 304 for _, status in finished),
+        'errors': sum(status >= 400 for _, status in finished),
+        'latency_ms': {
+            'p50': round(percentile([latency for latency, _ in finished], 0.5), 3),
+            'max': round(max(latency for latency, _ in finished), 3),
+        },
+        'elapsed_sec': round(elapsed, 3),
+        **result,
+    }
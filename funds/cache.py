@@ -0,0 +1,112 @@
+"""
+Caching of serialized reference data and list ETags
+
+Every model has a version number in the cache that is bumped whenever a row
+of it is written. Cache keys and ETags include the versions they depend on,
+so a write invalidates them without having to find and delete the keys.
+
+The default cache is process local (locmem), which is only correct with a
+single process. Deployments with several workers need a shared backend such
+as Memcached or Redis, otherwise a write handled by one worker is not seen
+by the versions in the others. `manage.py check --deploy` reports a process
+local cache as funds.E001.
+
+Writes that skip the model signals, bulk inserts, queryset update() and the
+rebuilds, have to call bump_versions themselves.
+"""
+import hashlib
+import random
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+
+def get_cache():
+    return caches[settings.FUNDS_CACHE_ALIAS]
+
+
+def version_key(name):
+    return f'funds:version:{name}'
+
+
+def get_versions(names):
+    """
+    Get the current version of each model name in one cache round trip
+
+    Versions missing from the cache, after a restart or eviction, start at a
+    random number so ETags handed out before can't match by accident.
+    """
+    cache = get_cache()
+    keys = [version_key(name) for name in names]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, random.randrange(1 << 30), timeout=None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def bump_versions(*names):
+    """
+    Invalidate everything cached for the model names
+
+    The versions are bumped again once the surrounding transaction commits,
+    so anything cached from another request before the commit is dropped too.
+    """
+    def bump():
+        cache = get_cache()
+        for name in names:
+            try:
+                cache.incr(version_key(name))
+            except ValueError:
+                # Not cached yet, the first read will start it at a random version
+                pass
+
+    bump()
+    transaction.on_commit(bump)
+
+
+def get_representations(serializer_class, request):
+    """
+    Get the serialized representation of every row of the serializer's model by pk
+
+    Meant for small reference tables nested in many other rows. The whole
+    table is serialized and cached on a miss, and kept on the request so it
+    is only fetched from the cache once per request.
+    """
+    model = serializer_class.Meta.model
+    name = model._meta.model_name
+    memo = getattr(request, '_funds_representations', None)
+    if memo is None:
+        memo = request._funds_representations = {}
+    if serializer_class in memo:
+        return memo[serializer_class]
+
+    # Hyperlinked representations depend on the host the request came in on
+    version, = get_versions([name])
+    base_url = request.build_absolute_uri('/')
+    key = f'funds:{name}:{serializer_class.__name__}:{version}:{base_url}'
+    cache = get_cache()
+    representations = cache.get(key)
+    if representations is None:
+        serializer = serializer_class(
+            model.objects.all(),
+            many=True,
+            context={'request': request}
+        )
+        representations = {row['id']: row for row in serializer.data}
+        cache.set(key, representations, timeout=settings.FUNDS_CACHE_TIMEOUT)
+    memo[serializer_class] = representations
+    return representations
+
+
+def get_list_etag(request, names):
+    """
+    Build an ETag for a list request from the versions of the models it depends on
+    """
+    versions = get_versions(names)
+    renderer = getattr(request, 'accepted_renderer', None)
+    accept = renderer.media_type if renderer is not None else ''
+    source = f'{request.get_full_path()}|{accept}|{versions}'
+    return '"' + hashlib.md5(source.encode()).hexdigest() + '"'
@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+# Backends whose contents only the process that wrote them can see
+PROCESS_LOCAL_CACHES = [
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+]
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """
+    Require a cache shared by every worker process
+
+    It holds the versions behind the cached representations and the ETags.
+    A version bumped in a process local cache only reaches the worker that
+    handled the write, the others keep answering with stale nested rows,
+    304s and long polls that never wake up.
+    """
+    backend = settings.CACHES[settings.FUNDS_CACHE_ALIAS]['BACKEND']
+    if backend in PROCESS_LOCAL_CACHES:
+        return [
+            Error(
+                f'The {settings.FUNDS_CACHE_ALIAS!r} cache is local to each process.',
+                hint=(
+                    'Set FUNDS_CACHE_BACKEND to a backend shared by the workers, such as '
+                    'Memcached or Redis, so writes invalidate the cache in every worker.'
+                ),
+                id='funds.E001',
+            )
+        ]
+    return []
@@ -0,0 +1,74 @@
+import csv
+from itertools import islice
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from funds.models import Transactions
+
+# Output column name and the Transactions lookup it is read from
+EXPORT_COLUMNS = [
+    ('posting_num', 'posting_num'),
+    ('date', 'posting_num__date'),
+    ('posting_type', 'posting_num__posting_type'),
+    ('payee', 'posting_num__payee'),
+    ('cleared', 'posting_num__cleared'),
+    ('posting_note', 'posting_num__note'),
+    ('transaction_id', 'id'),
+    ('account_id', 'account_id'),
+    ('account_name', 'account_id__account_name'),
+    ('categories_id', 'categories_id'),
+    ('category_name', 'categories_id__category_name'),
+    ('amount', 'amount'),
+    ('note', 'note'),
+]
+
+
+def export_rows(start=None, end=None, chunk_size=2000):
+    """
+    Iterate the ledger as flat tuples, one per transaction, in posting date order
+
+    Uses a server-side cursor where the database supports it, so only
+    chunk_size rows are held in memory at a time.
+    """
+    transactions = Transactions.objects.all()
+    if start is not None:
+        transactions = transactions.filter(posting_num__date__gte=start)
+    if end is not None:
+        transactions = transactions.filter(posting_num__date__lte=end)
+    return (
+        transactions.order_by('posting_num__date', 'posting_num', 'id')
+        .values_list(*(lookup for _, lookup in EXPORT_COLUMNS))
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+class Echo:
+    """
+    File-like object that returns what is written so csv.writer can build lines
+    """
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows, lines_per_chunk=500):
+    writer = csv.writer(Echo())
+    yield writer.writerow([name for name, _ in EXPORT_COLUMNS])
+    while True:
+        lines = [writer.writerow(row) for row in islice(rows, lines_per_chunk)]
+        if not lines:
+            return
+        yield ''.join(lines)
+
+
+def stream_ndjson(rows, lines_per_chunk=500):
+    names = [name for name, _ in EXPORT_COLUMNS]
+    encoder = DjangoJSONEncoder()
+    while True:
+        lines = [
+            encoder.encode(dict(zip(names, row))) + '\n'
+            for row in islice(rows, lines_per_chunk)
+        ]
+        if not lines:
+            return
+        yield ''.join(lines)
@@ -0,0 +1,40 @@
+from rest_framework import filters
+
+
+class QueryParamFilterBackend(filters.BaseFilterBackend):
+    """
+    Filter a queryset by the query parameters declared on the view's filter serializer
+
+    Each field name of `filter_serializer_class` is a queryset lookup, such
+    as `date__gte`, so validated parameters go straight into the WHERE clause.
+    Invalid values are a 400 error rather than being ignored.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        serializer_class = getattr(view, 'filter_serializer_class', None)
+        if serializer_class is None:
+            return queryset
+        # Partial so missing booleans are left out instead of read as False
+        serializer = serializer_class(data=request.query_params, partial=True)
+        serializer.is_valid(raise_exception=True)
+        return queryset.filter(**serializer.validated_data)
+
+
+class KeysetOrderingFilter(filters.OrderingFilter):
+    """
+    Ordering filter that keeps the ordering usable for keyset pagination
+
+    Falls back to the pagination class ordering and always ends with the
+    pagination's unique field so every row has a distinct position.
+    """
+
+    def get_default_ordering(self, view):
+        return super().get_default_ordering(view) or view.pagination_class.ordering
+
+    def get_ordering(self, request, queryset, view):
+        ordering = list(super().get_ordering(request, queryset, view))
+        unique = view.pagination_class.ordering[-1]
+        if unique not in (order.lstrip('-') for order in ordering):
+            prefix = '-' if ordering and ordering[-1].startswith('-') else ''
+            ordering.append(prefix + unique)
+        return tuple(ordering)
@@ -0,0 +1,162 @@
+"""
+Projection of an account's balance forward one day at a time
+
+The projection starts from the balance in the ledger and adds, on the day
+they fall on:
+
+- transactions of postings dated in the future
+- occurrences of recurring postings not materialized yet, with the ones
+  already due counted on the first day
+- the budgeted spending of every category the account pays for, spread
+  evenly over each month and scaled by the account's share of the
+  category's past spending. Months without a budget use the category's
+  average budget. Spending already scheduled in the month is taken out of
+  it, so rent that is both budgeted and recurring is only counted once.
+
+Amounts are added into a grid with one cell per day and the balances are
+its running sum, so the cost grows with the number of events and months,
+plus one pass of itertools.accumulate over the days.
+"""
+import calendar
+import datetime
+import decimal
+from collections import defaultdict
+from itertools import accumulate
+from operator import add
+
+from django.db.models import Avg, Q, Sum
+
+from funds.models import (
+    Balances,
+    Budgets,
+    MonthlyRollups,
+    RecurringTransactions,
+    Transactions
+)
+
+ZERO = decimal.Decimal(0)
+CENT = decimal.Decimal('0.0001')
+
+
+def months(start, end):
+    """
+    Yield (year, month, first, last) for each month overlapping the dates start to end
+    """
+    first = start
+    while first <= end:
+        days = calendar.monthrange(first.year, first.month)[1]
+        last = min(first.replace(day=days), end)
+        yield first.year, first.month, first, last
+        first = last + datetime.timedelta(days=1)
+
+
+def category_shares(account_id, before):
+    """
+    Get the account's share of the spending of each category it has spent in
+
+    Only the whole months before the date are counted.
+    """
+    totals = (
+        MonthlyRollups.objects.filter(
+            Q(year__lt=before.year) | Q(year=before.year, month__lt=before.month),
+            total__lt=0
+        )
+        .values_list('categories_id', 'account_id')
+        .annotate(spent=Sum('total'))
+        .order_by()
+    )
+    spent = defaultdict(lambda: ZERO)
+    account_spent = {}
+    for categories_id, row_account_id, total in totals:
+        spent[categories_id] += total
+        if row_account_id == account_id:
+            account_spent[categories_id] = total
+    return {
+        categories_id: total / spent[categories_id]
+        for categories_id, total in account_spent.items()
+    }
+
+
+def forecast(account_id, days, start=None):
+    """
+    List (date, balance) for the end of every day from start to days after it
+
+    The start defaults to today.
+    """
+    start = start or datetime.date.today()
+    end = start + datetime.timedelta(days=days)
+    # Amounts added on each day, and changes to the daily budget spending rate
+    deltas = [ZERO] * (days + 1)
+    rates = [ZERO] * (days + 2)
+    # Spending already scheduled per (category, year, month)
+    scheduled = defaultdict(lambda: ZERO)
+
+    deltas[0] += Balances.objects.as_of(account_id, start)
+
+    future = (
+        Transactions.objects.filter(
+            account_id=account_id,
+            posting_num__date__gt=start,
+            posting_num__date__lte=end
+        )
+        .values_list('posting_num__date', 'categories_id')
+        .annotate(total=Sum('amount'))
+        .order_by()
+    )
+    for date, categories_id, total in future:
+        deltas[(date - start).days] += total
+        # Refunds and other inflows don't take the place of budgeted spending
+        scheduled[(categories_id, date.year, date.month)] -= min(total, 0)
+
+    lines = RecurringTransactions.objects.filter(
+        account_id=account_id,
+        recurring__next_date__lte=end
+    ).select_related('recurring')
+    for line in lines:
+        template = line.recurring
+        index = template.materialized
+        date = template.next_date
+        while date is not None and date <= end:
+            # Past due occurrences will be dated before start once materialized
+            deltas[max((date - start).days, 0)] += line.amount
+            key = (line.categories_id_id, date.year, date.month)
+            scheduled[key] -= min(line.amount, 0)
+            index += 1
+            date = template.occurrence(index)
+
+    shares = category_shares(account_id, start)
+    budgets = {
+        (categories_id, year, month): amount
+        for categories_id, year, month, amount in Budgets.objects.filter(
+            categories_id__in=shares,
+            year__gte=start.year,
+            year__lte=end.year
+        ).values_list('categories_id', 'year', 'month', 'amount')
+    }
+    averages = dict(
+        Budgets.objects.filter(categories_id__in=shares)
+        .values_list('categories_id')
+        .annotate(average=Avg('amount'))
+        .order_by()
+    )
+    # Budgeted spending starts the day after start, which is already in the ledger
+    first_day = start + datetime.timedelta(days=1)
+    for year, month, first, last in months(first_day, end):
+        month_days = calendar.monthrange(year, month)[1]
+        period_days = (last - first).days + 1
+        for categories_id, average in averages.items():
+            budget = budgets.get((categories_id, year, month), average)
+            spending = (
+                decimal.Decimal(budget) * shares[categories_id] * period_days / month_days
+                - scheduled[(categories_id, year, month)]
+            )
+            if spending > 0:
+                rate = spending / period_days
+                rates[(first - start).days] -= rate
+                rates[(last - start).days + 1] += rate
+
+    balances = accumulate(map(add, deltas, accumulate(rates)))
+    return [
+        (start + datetime.timedelta(days=day), balance.quantize(CENT))
+        for day, balance in enumerate(balances)
+    ]
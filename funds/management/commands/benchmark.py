@@ -0,0 +1,102 @@
+import datetime
+import json
+import platform
+from pathlib import Path
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from rest_framework.test import APIClient
+
+from funds.benchmarks import SCENARIOS, build_context, git_commit, run_scenario
+from funds.models import Postings, Transactions
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the API scenarios in funds.benchmarks on the configured database'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scenario',
+            action='append',
+            choices=sorted(SCENARIOS),
+            help='Scenario to run, can be repeated, defaults to all of them'
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=50,
+            help='Timed requests per scenario'
+        )
+        parser.add_argument(
+            '--warmup',
+            type=int,
+            default=5,
+            help='Untimed requests per scenario made first'
+        )
+        parser.add_argument('--seed', type=int, default=0, help='Random seed')
+        parser.add_argument(
+            '--host',
+            default='localhost',
+            help='Host header of the requests, must be in ALLOWED_HOSTS'
+        )
+        parser.add_argument(
+            '--output',
+            default='benchmark.json',
+            help='File the results are written to as JSON'
+        )
+        parser.add_argument(
+            '--compare',
+            help='Results of an earlier run to print the change against'
+        )
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1:
+            raise CommandError('--requests must be at least 1')
+        baseline = {}
+        if options['compare']:
+            try:
+                baseline = json.loads(Path(options['compare']).read_text())['scenarios']
+            except (OSError, ValueError, KeyError) as error:
+                raise CommandError(f'Could not read {options["compare"]}: {error}')
+
+        client = APIClient(HTTP_HOST=options['host'])
+        context = build_context(options['seed'])
+        results = {
+            'created': datetime.datetime.now().isoformat(timespec='seconds'),
+            'commit': git_commit(),
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'postings': Postings.objects.count(),
+            'transactions': Transactions.objects.count(),
+            'scenarios': {},
+        }
+        self.stdout.write(
+            f'{"scenario":<28}{"p50 ms":>10}{"p95 ms":>10}{"req/s":>10}'
+            f'{"queries":>9}{"mem KiB":>10}'
+        )
+        for name in options['scenario'] or SCENARIOS:
+            result = run_scenario(
+                name,
+                client,
+                context,
+                requests=options['requests'],
+                warmup=options['warmup']
+            )
+            results['scenarios'][name] = result
+            latency = result['latency_ms']
+            line = (
+                f'{name:<28}{latency["p50"]:>10.2f}{latency["p95"]:>10.2f}'
+                f'{result["requests_per_sec"]:>10.1f}{result["queries"]["max"]:>9}'
+                f'{result["peak_memory_kb"]:>10}'
+            )
+            if name in baseline:
+                before = baseline[name]['latency_ms']['p50']
+                line += f'  p50 {(result["latency_ms"]["p50"] - before) / before:+.0%}'
+            if result['errors']:
+                line += self.style.ERROR(f'  {result["errors"]} errors')
+            self.stdout.write(line)
+
+        Path(options['output']).write_text(json.dumps(results, indent=2) + '\n')
+        self.stdout.write(self.style.SUCCESS(f'Wrote results to {options["output"]}'))
@@ -0,0 +1,139 @@
+import datetime
+import json
+import platform
+from pathlib import Path
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from funds.asyncdb import use_pool
+from funds.benchmarks import (
+    CONCURRENCY_SCENARIOS,
+    build_context,
+    git_commit,
+    run_asgi,
+    run_long_poll,
+    run_wsgi
+)
+from funds.models import Postings, Transactions
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark concurrent clients of the sync views on the WSGI handler '
+        'against the async views on the ASGI handler'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scenario',
+            action='append',
+            choices=sorted(CONCURRENCY_SCENARIOS),
+            help='Scenario to run, can be repeated, defaults to all of them'
+        )
+        parser.add_argument('--clients', type=int, default=50, help='Concurrent clients')
+        parser.add_argument('--requests', type=int, default=10, help='Requests per client')
+        parser.add_argument(
+            '--threads',
+            type=int,
+            default=8,
+            help='Threads serving the WSGI handler, like the threads of a WSGI server'
+        )
+        parser.add_argument(
+            '--long-poll-clients',
+            type=int,
+            default=1000,
+            help='Clients held in a long poll of the async views, 0 to skip it'
+        )
+        parser.add_argument(
+            '--wait',
+            type=int,
+            default=2,
+            help='Seconds each long poll waits'
+        )
+        parser.add_argument(
+            '--host',
+            default='localhost',
+            help='Host header of the requests, must be in ALLOWED_HOSTS'
+        )
+        parser.add_argument(
+            '--output',
+            default='benchmark-asgi.json',
+            help='File the results are written to as JSON'
+        )
+
+    def handle(self, *args, **options):
+        if min(options['clients'], options['requests'], options['threads']) < 1:
+            raise CommandError('--clients, --requests and --threads must be at least 1')
+
+        context = build_context()
+        results = {
+            'created': datetime.datetime.now().isoformat(timespec='seconds'),
+            'commit': git_commit(),
+            'database': connection.vendor,
+            'async_db_pool': use_pool(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'postings': Postings.objects.count(),
+            'transactions': Transactions.objects.count(),
+            'clients': options['clients'],
+            'requests': options['requests'],
+            'threads': options['threads'],
+            'scenarios': {},
+        }
+        # The handlers open their own connections, in other threads for WSGI
+        connection.close()
+
+        self.stdout.write(
+            f'{"scenario":<20}{"server":<8}{"p50 ms":>10}{"p95 ms":>10}'
+            f'{"req/s":>10}{"threads":>9}'
+        )
+        for name in options['scenario'] or CONCURRENCY_SCENARIOS:
+            result = results['scenarios'][name] = {
+                'description': CONCURRENCY_SCENARIOS[name]['description'],
+                'wsgi': run_wsgi(
+                    name,
+                    context,
+                    options['host'],
+                    options['clients'],
+                    options['requests'],
+                    options['threads']
+                ),
+                'asgi': run_asgi(
+                    name,
+                    context,
+                    options['host'],
+                    options['clients'],
+                    options['requests']
+                ),
+            }
+            for server in ('wsgi', 'asgi'):
+                line = (
+                    f'{name:<20}{server:<8}{result[server]["latency_ms"]["p50"]:>10.2f}'
+                    f'{result[server]["latency_ms"]["p95"]:>10.2f}'
+                    f'{result[server]["requests_per_sec"]:>10.1f}'
+                    f'{result[server]["peak_threads"]:>9}'
+                )
+                if result[server]['errors']:
+                    line += self.style.ERROR(f'  {result[server]["errors"]} errors')
+                self.stdout.write(line)
+
+        if options['long_poll_clients']:
+            result = results['long_poll'] = run_long_poll(
+                options['host'],
+                options['long_poll_clients'],
+                options['wait']
+            )
+            line = (
+                f'Long poll: {result["not_modified"]}/{result["clients"]} clients '
+                f'got 304 after {result["elapsed_sec"]:.2f}s '
+                f'with {result["peak_threads"]} threads, '
+                f'peak memory {result["peak_memory_kb"]} KiB'
+            )
+            if result['errors']:
+                line += self.style.ERROR(f'  {result["errors"]} errors')
+            self.stdout.write(line)
+
+        Path(options['output']).write_text(json.dumps(results, indent=2) + '\n')
+        self.stdout.write(self.style.SUCCESS(f'Wrote results to {options["output"]}'))
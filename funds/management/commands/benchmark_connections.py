@@ -0,0 +1,136 @@
+import datetime
+import json
+import platform
+import threading
+from pathlib import Path
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.db.backends.signals import connection_created
+
+from funds.benchmarks import CONCURRENCY_SCENARIOS, build_context, git_commit, run_wsgi
+
+
+class Command(BaseCommand):
+    help = (
+        'Load test the sync views with connections closed after every request, '
+        'kept open between requests and pooled, counting the connections opened'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scenario',
+            default='accounts-balance',
+            choices=sorted(CONCURRENCY_SCENARIOS),
+            help='Scenario the requests are made to'
+        )
+        parser.add_argument(
+            '--threads',
+            type=int,
+            default=8,
+            help='Threads making requests'
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=100,
+            help='Requests per thread'
+        )
+        parser.add_argument(
+            '--conn-max-age',
+            type=int,
+            default=60,
+            help='CONN_MAX_AGE of the persistent connections'
+        )
+        parser.add_argument(
+            '--pool-size',
+            type=int,
+            default=4,
+            help='Connections in the pool, only with the funds.backends.postgresql backend'
+        )
+        parser.add_argument(
+            '--host',
+            default='localhost',
+            help='Host header of the requests, must be in ALLOWED_HOSTS'
+        )
+        parser.add_argument(
+            '--output',
+            default='benchmark-connections.json',
+            help='File the results are written to as JSON'
+        )
+
+    def handle(self, *args, **options):
+        if min(options['threads'], options['requests'], options['pool_size']) < 1:
+            raise CommandError('--threads, --requests and --pool-size must be at least 1')
+
+        context = build_context()
+        database = connections.databases['default']
+        modes = {
+            'per-request': {'CONN_MAX_AGE': 0, 'POOL': None},
+            'persistent': {'CONN_MAX_AGE': options['conn_max_age'], 'POOL': None},
+        }
+        if hasattr(connection, 'get_pool'):
+            modes['pool'] = {'CONN_MAX_AGE': 0, 'POOL': {'MAX_SIZE': options['pool_size']}}
+        results = {
+            'created': datetime.datetime.now().isoformat(timespec='seconds'),
+            'commit': git_commit(),
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'scenario': options['scenario'],
+            'threads': options['threads'],
+            'requests': options['requests'],
+            'modes': {},
+        }
+
+        lock = threading.Lock()
+        created = []
+
+        def count(sender, connection, **kwargs):
+            with lock:
+                created.append(connection.alias)
+
+        self.stdout.write(
+            f'{"mode":<14}{"connects":>10}{"opened":>8}'
+            f'{"p50 ms":>10}{"p95 ms":>10}{"req/s":>10}'
+        )
+        original = {key: database.get(key) for key in ('CONN_MAX_AGE', 'POOL')}
+        connection_created.connect(count)
+        try:
+            for mode, values in modes.items():
+                database.update(values)
+                connection.close()
+                created.clear()
+                pool = connection.get_pool() if values['POOL'] else None
+                opened = pool.stats['opened'] if pool else 0
+                result = run_wsgi(
+                    options['scenario'],
+                    context,
+                    options['host'],
+                    clients=options['threads'],
+                    requests=options['requests'],
+                    threads=options['threads']
+                )
+                # A pooled connection is set up again every time a request takes
+                # it, but only opened when the pool has none idle
+                result['connects'] = len(created)
+                result['opened'] = pool.stats['opened'] - opened if pool else len(created)
+                if pool:
+                    pool.close()
+                results['modes'][mode] = result
+                latency = result['latency_ms']
+                line = (
+                    f'{mode:<14}{result["connects"]:>10}{result["opened"]:>8}'
+                    f'{latency["p50"]:>10.2f}{latency["p95"]:>10.2f}'
+                    f'{result["requests_per_sec"]:>10.1f}'
+                )
+                if result['errors']:
+                    line += self.style.ERROR(f'  {result["errors"]} errors')
+                self.stdout.write(line)
+        finally:
+            connection_created.disconnect(count)
+            database.update(original)
+
+        Path(options['output']).write_text(json.dumps(results, indent=2) + '\n')
+        self.stdout.write(self.style.SUCCESS(f'Wrote results to {options["output"]}'))
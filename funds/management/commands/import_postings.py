@@ -0,0 +1,294 @@
+import csv
+import datetime
+import decimal
+import re
+import time
+from itertools import islice
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DataError, IntegrityError
+
+from funds.models import Accounts, Categories, Postings, Transactions
+from funds.serializers import MAX_ID, existing_values
+
+OFX_TAG = re.compile(rb'<(/?)([A-Za-z0-9.]+)>([^<]*)')
+
+
+def read_csv(stream, offset):
+    """
+    Yield (end offset, row dict) for every row of a CSV file after offset
+
+    The header is always read from the start of the file. Rows are decoded
+    one line at a time, so quoted fields may not contain newlines.
+    """
+    header = next(csv.reader([stream.readline().decode('utf-8-sig')]))
+    columns = [column.strip().lower() for column in header]
+    position = max(offset, stream.tell())
+    stream.seek(position)
+    for line in stream:
+        position += len(line)
+        text = line.decode('utf-8').strip()
+        if text:
+            yield position, dict(zip(columns, next(csv.reader([text]))))
+
+
+def read_ofx(stream, offset, chunk_size=65536):
+    """
+    Yield (end offset, row dict) for every STMTTRN of an OFX file after offset
+
+    Works on both SGML (OFX 1.x, no closing tags) and XML statements by
+    tokenizing tags from fixed size chunks of the file.
+    """
+    stream.seek(offset)
+    position = offset
+    buffer = b''
+    row = None
+    while True:
+        chunk = stream.read(chunk_size)
+        buffer += chunk
+        # Only tokenize up to the last tag opening, it may continue in the next chunk
+        end = len(buffer) if not chunk else buffer.rfind(b'<')
+        consumed = 0
+        for match in OFX_TAG.finditer(buffer, 0, max(end, 0)):
+            closing, tag, value = match.groups()
+            tag = tag.upper()
+            consumed = match.end()
+            if tag == b'STMTTRN':
+                if closing and row is not None:
+                    yield position + consumed, row
+                    row = None
+                elif not closing:
+                    row = {}
+            elif row is not None and not closing:
+                row[tag.decode('ascii').lower()] = value.decode('utf-8', 'replace').strip()
+        position += consumed
+        buffer = buffer[consumed:]
+        if not chunk:
+            return
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class Command(BaseCommand):
+    help = 'Stream postings and transactions from a bank CSV or OFX export'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or OFX file to import')
+        parser.add_argument(
+            '--format',
+            choices=['csv', 'ofx'],
+            help='File format, defaults to the file extension'
+        )
+        parser.add_argument(
+            '--account',
+            help='Account name for rows without an account column, required for OFX'
+        )
+        parser.add_argument(
+            '--category',
+            help='Category name for rows without a category column, required for OFX'
+        )
+        parser.add_argument(
+            '--date-format',
+            default='%Y-%m-%d',
+            help='strptime format of the CSV date column'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.FUNDS_BULK_BATCH_SIZE,
+            help='Number of rows written per transaction'
+        )
+        parser.add_argument(
+            '--offset',
+            type=int,
+            default=0,
+            help='Byte offset to resume from, as reported after each committed batch'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Parse and validate the file without writing anything'
+        )
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        file_format = options['format'] or path.suffix.lstrip('.').lower()
+        if file_format not in ('csv', 'ofx'):
+            raise CommandError(f'Unknown file format {file_format!r}, use --format')
+        if file_format == 'ofx' and not (options['account'] and options['category']):
+            raise CommandError('OFX imports need --account and --category')
+
+        # Names are resolved with dicts built once rather than a query per row
+        self.accounts = dict(Accounts.objects.values_list('account_name', 'id'))
+        self.categories = dict(Categories.objects.values_list('category_name', 'id'))
+        self.default_account = options['account']
+        self.default_category = options['category']
+        self.date_format = options['date_format']
+        # Allocated a batch at a time, so several imports can run at once
+        self.batch_size = options['batch_size']
+        self.posting_nums = iter(())
+        if options['dry_run']:
+            # Placeholders no posting can have, a dry run doesn't use up real numbers
+            self.posting_nums = iter(range(-1, -MAX_ID - 1, -1))
+
+        reader = read_csv if file_format == 'csv' else read_ofx
+        parse = self.parse_csv_row if file_format == 'csv' else self.parse_ofx_row
+        started = time.monotonic()
+        count = 0
+        with path.open('rb') as stream:
+            rows = (
+                (position, parse(row, position))
+                for position, row in reader(stream, options['offset'])
+            )
+            for batch in batched(rows, options['batch_size']):
+                self.check_posting_nums(batch)
+                postings = [posting for _, (posting, _) in batch]
+                transactions = [row for _, (_, row) in batch]
+                if not options['dry_run']:
+                    try:
+                        Postings.objects.bulk_import(
+                            postings,
+                            transactions,
+                            options['batch_size']
+                        )
+                    except (DataError, IntegrityError) as error:
+                        # Another writer took a posting number since it was checked,
+                        # or the database rejected a value the checks let through
+                        raise CommandError(
+                            f'Could not import the rows ending at bytes {batch[0][0]} to '
+                            f'{batch[-1][0]}: {error}'
+                        )
+                count += len(batch)
+                elapsed = time.monotonic() - started
+                self.stdout.write(
+                    f'{"Checked" if options["dry_run"] else "Committed"} {count} rows '
+                    f'through byte offset {batch[-1][0]} ({count / elapsed:.0f} rows/sec)'
+                )
+
+        elapsed = time.monotonic() - started
+        rate = count / elapsed if elapsed else 0
+        verb = 'Checked' if options['dry_run'] else 'Imported'
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'{verb} {count} rows in {elapsed:.1f}s ({rate:.0f} rows/sec)'
+            )
+        )
+
+    def check_posting_nums(self, batch):
+        """
+        Stop at the first row of a batch whose posting number is already used
+
+        Used either by a posting or by an earlier row of the file.
+        """
+        posting_nums = [posting.posting_num for _, (posting, _) in batch]
+        used = existing_values(Postings.objects.all(), 'posting_num', posting_nums)
+        for position, (posting, _) in batch:
+            if posting.posting_num in used:
+                raise CommandError(
+                    f'Posting number {posting.posting_num} already exists '
+                    f'in row ending at byte {position}'
+                )
+            used.add(posting.posting_num)
+
+    def build(self, position, date, amount, account, category, payee='', note='',
+              posting_num=None, cleared=False):
+        """
+        Map one parsed row onto a posting and its single transaction
+        """
+        try:
+            account_id = self.accounts[account or self.default_account]
+        except KeyError:
+            raise CommandError(
+                f'Unknown account {account!r} in row ending at byte {position}'
+            )
+        try:
+            categories_id = self.categories[category or self.default_category]
+        except KeyError:
+            raise CommandError(
+                f'Unknown category {category!r} in row ending at byte {position}'
+            )
+        try:
+            value = decimal.Decimal(amount.replace(',', ''))
+            # Rejects NaN and infinity too, and amounts with more digits than the column
+            Transactions._meta.get_field('amount').run_validators(value)
+        except (decimal.InvalidOperation, ValidationError):
+            raise CommandError(
+                f'Invalid amount {amount!r} in row ending at byte {position}'
+            )
+        amount = value
+        if posting_num:
+            try:
+                number = int(posting_num)
+            except ValueError:
+                number = 0
+            if not 1 <= number <= MAX_ID:
+                raise CommandError(
+                    f'Invalid posting number {posting_num!r} '
+                    f'in row ending at byte {position}'
+                )
+            posting_num = number
+        else:
+            posting_num = next(self.posting_nums, None)
+            if posting_num is None:
+                self.posting_nums = iter(Postings.objects.allocate(self.batch_size))
+                posting_num = next(self.posting_nums)
+        posting = Postings(
+            posting_num=posting_num,
+            date=date,
+            posting_type=Postings.INCOME if amount > 0 else Postings.STANDARD,
+            payee=payee[:50],
+            cleared=cleared,
+            note=note
+        )
+        transaction = Transactions(
+            posting_num_id=posting_num,
+            account_id_id=account_id,
+            categories_id_id=categories_id,
+            amount=amount
+        )
+        return posting, transaction
+
+    def parse_csv_row(self, row, position):
+        try:
+            date = datetime.datetime.strptime(row['date'], self.date_format).date()
+            amount = row['amount']
+        except (KeyError, ValueError) as error:
+            raise CommandError(f'Invalid row ending at byte {position}: {error}')
+        return self.build(
+            position,
+            date,
+            amount,
+            row.get('account'),
+            row.get('category'),
+            payee=row.get('payee', ''),
+            note=row.get('note', ''),
+            posting_num=row.get('posting_num'),
+            cleared=row.get('cleared', '').lower() in ('1', 'true', 'yes', 'y', 'x')
+        )
+
+    def parse_ofx_row(self, row, position):
+        try:
+            date = datetime.datetime.strptime(row['dtposted'][:8], '%Y%m%d').date()
+            amount = row['trnamt']
+        except (KeyError, ValueError) as error:
+            raise CommandError(f'Invalid transaction ending at byte {position}: {error}')
+        return self.build(
+            position,
+            date,
+            amount,
+            None,
+            None,
+            payee=row.get('name', ''),
+            note=row.get('memo', ''),
+            cleared=True
+        )
@@ -0,0 +1,46 @@
+import datetime
+import time
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from funds.models import RecurringPostings
+
+
+class Command(BaseCommand):
+    help = 'Create the postings of the recurring posting templates due by a date'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--until',
+            help=(
+                'Create the occurrences dated on or before this YYYY-MM-DD date, '
+                'defaults to today, at most FUNDS_FORECAST_MAX_DAYS ahead'
+            )
+        )
+
+    def handle(self, *args, **options):
+        if options['until']:
+            try:
+                until = datetime.date.fromisoformat(options['until'])
+            except ValueError:
+                raise CommandError(f'Invalid date {options["until"]!r}, use YYYY-MM-DD')
+        else:
+            until = datetime.date.today()
+        # As far ahead as a forecast reaches, rather than postings up to year 9999
+        max_days = settings.FUNDS_FORECAST_MAX_DAYS
+        if until > datetime.date.today() + datetime.timedelta(days=max_days):
+            raise CommandError(f'Date {until} is more than {max_days} days ahead')
+
+        started = time.monotonic()
+        try:
+            count = RecurringPostings.objects.materialize(until)
+        except ValidationError as error:
+            raise CommandError(error.messages[0])
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Created {count} postings due by {until} in {elapsed:.2f}s'
+            )
+        )
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from funds.models import Balances
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the account balance ledger from the transactions and verify it'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Only verify the ledger against a full recomputation, do not rebuild it'
+        )
+        parser.add_argument(
+            '--account',
+            type=int,
+            action='append',
+            dest='accounts',
+            help='Limit to an account id, may be given more than once'
+        )
+
+    def handle(self, *args, **options):
+        accounts = options['accounts']
+        if not options['check']:
+            rows = Balances.objects.rebuild(accounts)
+            self.stdout.write(f'Rebuilt {rows} balance rows')
+
+        mismatches = Balances.objects.verify(accounts)
+        for account_id, date, stored, expected in mismatches:
+            self.stderr.write(
+                f'Account {account_id} on {date}: stored {stored}, expected {expected}'
+            )
+        if mismatches:
+            raise CommandError(
+                f'{len(mismatches)} balance rows do not match the transactions'
+            )
+        self.stdout.write(self.style.SUCCESS('Balance ledger matches the transactions'))
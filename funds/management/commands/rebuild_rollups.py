@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from funds.models import MonthlyRollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the monthly category rollups from the transactions'
+
+    def handle(self, *args, **options):
+        rows = MonthlyRollups.objects.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rows} monthly rollup rows'))
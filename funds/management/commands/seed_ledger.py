@@ -0,0 +1,196 @@
+import datetime
+import decimal
+import random
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from funds.cache import bump_versions
+from funds.models import Accounts, Budgets, Categories, Postings, Transactions
+
+CENT = decimal.Decimal('0.01')
+
+
+class Command(BaseCommand):
+    help = 'Generate a large random ledger for benchmarking'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--accounts', type=int, default=8, help='Number of accounts')
+        parser.add_argument(
+            '--categories',
+            type=int,
+            default=40,
+            help='Number of categories'
+        )
+        parser.add_argument(
+            '--postings',
+            type=int,
+            default=100000,
+            help='Number of postings'
+        )
+        parser.add_argument(
+            '--years',
+            type=int,
+            default=5,
+            help='Number of years up to today the postings are spread over'
+        )
+        parser.add_argument(
+            '--payees',
+            type=int,
+            default=500,
+            help='Number of distinct payees'
+        )
+        parser.add_argument('--seed', type=int, default=0, help='Random seed')
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.FUNDS_BULK_BATCH_SIZE,
+            help='Number of postings written per transaction'
+        )
+
+    def handle(self, *args, **options):
+        if min(options['accounts'], options['categories'], options['postings']) < 1:
+            raise CommandError(
+                '--accounts, --categories and --postings must be at least 1'
+            )
+        self.random = random.Random(options['seed'])
+        self.accounts = self.get_or_create(
+            Accounts,
+            'account_name',
+            [f'Seed Account {number}' for number in range(1, options['accounts'] + 1)],
+            lambda number: {
+                'account_type': Accounts.ACCT_TYPES[number % len(Accounts.ACCT_TYPES)][0]
+            }
+        )
+        self.categories = self.get_or_create(
+            Categories,
+            'category_name',
+            [f'Seed Category {number}' for number in range(1, options['categories'] + 1)]
+        )
+        # A few accounts, categories and payees get most of the postings
+        self.account_weights = [1 / rank for rank in range(1, len(self.accounts) + 1)]
+        self.category_weights = [1 / rank for rank in range(1, len(self.categories) + 1)]
+        self.payees = [
+            f'Seed Payee {number}' for number in range(1, options['payees'] + 1)
+        ]
+        self.payee_weights = [1 / rank for rank in range(1, len(self.payees) + 1)]
+
+        end = datetime.date.today()
+        start = end - datetime.timedelta(days=365 * options['years'])
+        self.seed_budgets(start, end)
+
+        started = time.monotonic()
+        total = options['postings']
+        days = (end - start).days
+        count = 0
+        while count < total:
+            size = min(options['batch_size'], total - count)
+            postings = []
+            transactions = []
+            posting_nums = Postings.objects.allocate(size)
+            for number, posting_num in zip(range(count, count + size), posting_nums):
+                # Spread evenly over the days so batches are in date order
+                date = start + datetime.timedelta(days=number * days // total)
+                posting, rows = self.build(posting_num, date, end)
+                postings.append(posting)
+                transactions.extend(rows)
+            Postings.objects.bulk_import(postings, transactions, options['batch_size'])
+            count += size
+            elapsed = time.monotonic() - started
+            self.stdout.write(
+                f'Committed {count} postings ({count / elapsed:.0f} postings/sec)'
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {len(self.accounts)} accounts, {len(self.categories)} categories '
+            f'and {total} postings in {time.monotonic() - started:.1f}s'
+        ))
+
+    def get_or_create(self, model, field, names, defaults=lambda number: {}):
+        """
+        Get the ids of the rows with the names, creating the missing ones in one INSERT
+        """
+        rows = model.objects.filter(**{f'{field}__in': names})
+        existing = set(rows.values_list(field, flat=True))
+        model.objects.bulk_create(
+            model(**{field: name}, **defaults(number))
+            for number, name in enumerate(names)
+            if name not in existing
+        )
+        bump_versions(model._meta.model_name)
+        return list(rows.order_by('id').values_list('id', flat=True))
+
+    def seed_budgets(self, start, end):
+        """
+        Budget every category for every month of the range that isn't budgeted yet
+        """
+        budgets = []
+        year, month = start.year, start.month
+        while (year, month) <= (end.year, end.month):
+            for categories_id in self.categories:
+                amount = decimal.Decimal(self.random.randrange(50, 1500, 25))
+                budgets.append(Budgets(
+                    year=year,
+                    month=month,
+                    categories_id_id=categories_id,
+                    amount=amount
+                ))
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+        Budgets.objects.bulk_create(budgets, batch_size=1000, ignore_conflicts=True)
+        bump_versions('budgets')
+
+    def amount(self):
+        """
+        Pick a spending amount, most are small with a long tail of large ones
+        """
+        return -decimal.Decimal(self.random.lognormvariate(3.3, 1.1)).quantize(CENT)
+
+    def build(self, posting_num, date, today):
+        """
+        Make a random posting and its transactions
+        """
+        pick = self.random.random()
+        account = self.random.choices(self.accounts, self.account_weights)[0]
+        if pick < 0.05:
+            # Transfer between two accounts that nets to zero
+            posting_type = Postings.TRANSFER
+            other = self.random.choice(self.accounts)
+            category = self.random.choice(self.categories)
+            amount = (-self.amount() * 10).quantize(CENT)
+            rows = [(account, category, -amount), (other, category, amount)]
+            payee = ''
+        elif pick < 0.12:
+            posting_type = Postings.INCOME
+            amount = decimal.Decimal(self.random.gauss(2500, 400)).quantize(CENT)
+            rows = [(account, self.categories[0], amount)]
+            payee = self.payees[0]
+        else:
+            posting_type = Postings.STANDARD
+            # Some purchases are split over several categories
+            splits = 1 if self.random.random() < 0.9 else self.random.randint(2, 4)
+            categories = self.random.choices(
+                self.categories,
+                self.category_weights,
+                k=splits
+            )
+            rows = [(account, category, self.amount()) for category in categories]
+            payee = self.random.choices(self.payees, self.payee_weights)[0]
+        posting = Postings(
+            posting_num=posting_num,
+            date=date,
+            posting_type=posting_type,
+            payee=payee,
+            # Older postings have almost all cleared the bank
+            cleared=(today - date).days > 30 and self.random.random() < 0.98
+        )
+        transactions = [
+            Transactions(
+                posting_num_id=posting_num,
+                account_id_id=account_id,
+                categories_id_id=categories_id,
+                amount=amount
+            )
+            for account_id, categories_id, amount in rows
+        ]
+        return posting, transactions
@@ -0,0 +1,306 @@
+"""
+In-process metrics in the Prometheus text exposition format
+
+Metrics are kept in the memory of each process. When FUNDS_METRICS_DIR is
+set, every process also writes its values to its own file in that
+directory at most every FUNDS_METRICS_FLUSH_INTERVAL seconds. A scrape then
+adds up the files of all processes, so any gunicorn worker can answer
+/metrics for all of them. Files of exited workers are kept so counters
+don't go backwards; empty the directory when the server is restarted.
+"""
+import atexit
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from pathlib import Path
+
+from django.conf import settings
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"'))
+        for name, value in pairs
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+def format_value(value):
+    return repr(float(value)) if value != float('inf') else '+Inf'
+
+
+class Metric:
+    type = None
+
+    def __init__(self, registry, name, documentation, labelnames=()):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+
+    def key(self, labels):
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def merge(self, values, other):
+        for key, value in other.items():
+            values[key] = values.get(key, 0) + value
+
+    def samples(self, values):
+        for key, value in sorted(values.items()):
+            yield self.name, format_labels(self.labelnames, key), value
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def __init__(self, registry, name, documentation, labelnames=()):
+        super().__init__(registry, name, documentation, labelnames)
+        if not self.labelnames:
+            self.values[()] = 0
+
+    def inc(self, amount=1, **labels):
+        key = self.key(labels)
+        with self.registry.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+        self.registry.changed()
+
+
+class Histogram(Metric):
+    """
+    Histogram keeping a count per bucket plus the sum and count of the observations
+    """
+    type = 'histogram'
+
+    def __init__(self, registry, name, documentation, labelnames=(),
+                 buckets=DURATION_BUCKETS):
+        super().__init__(registry, name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self.key(labels)
+        with self.registry.lock:
+            # One count per bucket, then +Inf, sum and count
+            counts = self.values.get(key)
+            if counts is None:
+                counts = self.values[key] = [0] * (len(self.buckets) + 3)
+            counts[bisect_left(self.buckets, value)] += 1
+            counts[-2] += value
+            counts[-1] += 1
+        self.registry.changed()
+
+    def merge(self, values, other):
+        for key, counts in other.items():
+            if key in values:
+                values[key] = [mine + theirs for mine, theirs in zip(values[key], counts)]
+            else:
+                values[key] = list(counts)
+
+    def samples(self, values):
+        for key, counts in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                labels = format_labels(self.labelnames, key, [('le', format_value(bound))])
+                yield f'{self.name}_bucket', labels, cumulative
+            labels = format_labels(self.labelnames, key)
+            yield f'{self.name}_sum', labels, counts[-2]
+            yield f'{self.name}_count', labels, counts[-1]
+
+
+class Registry:
+    """
+    Named counters and histograms plus gauges computed when scraped
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics = {}
+        self.gauges = {}
+        # Time each gauge was computed at and its value
+        self.gauge_values = {}
+        self.last_flush = 0.0
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(self, name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DURATION_BUCKETS):
+        return self.register(Histogram(self, name, documentation, labelnames, buckets))
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def gauge(self, name, documentation):
+        """
+        Register a function returning the current value of a gauge when scraped
+
+        The value is reused for FUNDS_METRICS_GAUGE_MAX_AGE seconds, so
+        frequent scrapes don't each run the query behind it.
+        """
+        def register(function):
+            self.gauges[name] = (documentation, function)
+            return function
+        return register
+
+    def gauge_value(self, name):
+        documentation, function = self.gauges[name]
+        now = time.monotonic()
+        computed = self.gauge_values.get(name)
+        if computed is None or now - computed[0] >= settings.FUNDS_METRICS_GAUGE_MAX_AGE:
+            computed = self.gauge_values[name] = (now, function())
+        return computed[1]
+
+    def directory(self):
+        return Path(settings.FUNDS_METRICS_DIR) if settings.FUNDS_METRICS_DIR else None
+
+    def changed(self):
+        directory = self.directory()
+        interval = settings.FUNDS_METRICS_FLUSH_INTERVAL
+        if directory and time.monotonic() - self.last_flush >= interval:
+            self.flush(directory)
+
+    def flush(self, directory=None):
+        """
+        Write this process's values to its file in the metrics directory
+        """
+        directory = directory or self.directory()
+        if directory is None:
+            return
+        with self.lock:
+            data = json.dumps({
+                name: [[list(key), value] for key, value in metric.values.items()]
+                for name, metric in self.metrics.items()
+            })
+            self.last_flush = time.monotonic()
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f'funds-{os.getpid()}.json'
+        temporary = path.with_suffix('.tmp')
+        temporary.write_text(data)
+        os.replace(temporary, path)
+
+    def collect(self):
+        """
+        Get the values of every metric summed over all processes
+        """
+        directory = self.directory()
+        if directory is None:
+            with self.lock:
+                return {name: dict(metric.values) for name, metric in self.metrics.items()}
+        self.flush(directory)
+        totals = {name: {} for name in self.metrics}
+        for path in directory.glob('funds-*.json'):
+            try:
+                data = json.loads(path.read_text())
+            except (OSError, ValueError):
+                # Being replaced by its process
+                continue
+            for name, rows in data.items():
+                if name in self.metrics:
+                    values = {tuple(key): value for key, value in rows}
+                    self.metrics[name].merge(totals[name], values)
+        return totals
+
+    def render(self):
+        """
+        Render every metric in the Prometheus text exposition format
+        """
+        lines = []
+        for name, values in self.collect().items():
+            metric = self.metrics[name]
+            lines.append(f'# HELP {name} {metric.documentation}')
+            lines.append(f'# TYPE {name} {metric.type}')
+            for sample, labels, value in metric.samples(values):
+                lines.append(f'{sample}{labels} {format_value(value)}')
+        for name, (documentation, _) in self.gauges.items():
+            lines.append(f'# HELP {name} {documentation}')
+            lines.append(f'# TYPE {name} gauge')
+            lines.append(f'{name} {format_value(self.gauge_value(name))}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+atexit.register(registry.flush)
+
+REQUESTS = registry.counter(
+    'funds_http_requests_total',
+    'Requests handled by route, method and status code',
+    ['route', 'method', 'status']
+)
+ERRORS = registry.counter(
+    'funds_http_errors_total',
+    'Requests answered with a 4xx or 5xx status code by route and status code',
+    ['route', 'status']
+)
+DURATION = registry.histogram(
+    'funds_http_request_duration_seconds',
+    'Time to handle a request by route and method',
+    ['route', 'method']
+)
+QUERIES = registry.counter(
+    'funds_db_queries_total',
+    'SQL queries run while handling requests by route',
+    ['route']
+)
+DB_DURATION = registry.counter(
+    'funds_db_duration_seconds_total',
+    'Time spent in SQL queries while handling requests by route',
+    ['route']
+)
+ROWS = registry.counter(
+    'funds_rows_returned_total',
+    'Rows returned in response bodies by route',
+    ['route']
+)
+TRANSACTIONS_INSERTED = registry.counter(
+    'funds_transactions_inserted_total',
+    'Transactions rows inserted and committed, including bulk imports'
+)
+
+
+# funds.models imports this module, so the gauges import it when called
+@registry.gauge('funds_postings', 'Number of postings')
+def count_postings():
+    from funds.models import Postings
+    return Postings.objects.count()
+
+
+@registry.gauge('funds_postings_uncleared', 'Number of postings not cleared yet')
+def count_uncleared_postings():
+    from funds.models import Postings
+    return Postings.objects.filter(cleared=False).count()
+
+
+def count_rows(data):
+    """
+    Get the number of rows in response data, a page, a list or a single object
+    """
+    if isinstance(data, dict) and isinstance(data.get('results'), list):
+        return len(data['results'])
+    if isinstance(data, list):
+        return len(data)
+    return 1 if data else 0
+
+
+def observe_request(request, response, duration, queries, db_duration):
+    """
+    Record a handled request in the route metrics
+    """
+    match = getattr(request, 'resolver_match', None)
+    route = match.url_name if match and match.url_name else 'unmatched'
+    status = str(response.status_code)
+    REQUESTS.inc(route=route, method=request.method, status=status)
+    DURATION.observe(duration, route=route, method=request.method)
+    QUERIES.inc(queries, route=route)
+    DB_DURATION.inc(db_duration, route=route)
+    if response.status_code >= 400:
+        ERRORS.inc(route=route, status=status)
+    elif hasattr(response, 'data'):
+        ROWS.inc(count_rows(response.data), route=route)
@@ -0,0 +1,182 @@
+import asyncio
+import json
+import logging
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from django.conf import settings
+
+from funds.metrics import observe_request
+
+logger = logging.getLogger('funds.timing')
+
+# Recorder of the request being handled, copied into the threads sync_to_async runs code in
+current_recorder = ContextVar('funds_query_recorder', default=None)
+
+
+class QueryRecorder:
+    """
+    Count and time the queries of one request
+
+    Queries are grouped by their SQL with placeholders, so the same query run
+    with different parameters, the usual N+1 pattern, counts as a duplicate.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+
+    def record(self, sql, duration):
+        self.duration += duration
+        self.count += 1
+        self.statements[sql] += 1
+
+    def duplicates(self, threshold):
+        return [
+            (sql, count) for sql, count in self.statements.items() if count > threshold
+        ]
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Database execute wrapper adding every query to the current request's recorder
+
+    Installed on each connection when it is opened, so it sees the queries of
+    whichever thread handles the request.
+    """
+    recorder = current_recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        recorder.record(sql, time.perf_counter() - started)
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class TimingMiddleware:
+    """
+    Record the query count, database, serialization, render and total time of each request
+
+    The timings are sent back in a Server-Timing header, logged as one JSON
+    line on the funds.timing logger and added to the metrics in
+    funds.metrics. Serialization is the time spent in the view outside the
+    database, render is turning the response data into bytes. Any SQL
+    statement run more than FUNDS_TIMING_DUPLICATE_THRESHOLD times in a
+    request is logged as a warning.
+
+    Works in both sync (WSGI) and async (ASGI) middleware chains.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Tell Django this is an async middleware, and use the hooks that
+            # don't need a thread to run in
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+            self.process_view = self.process_view_async
+            self.process_template_response = self.process_template_response_async
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        recorder, token, started = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_recorder.reset(token)
+        return self.finish(request, response, recorder, started)
+
+    async def __acall__(self, request):
+        recorder, token, started = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_recorder.reset(token)
+        return self.finish(request, response, recorder, started)
+
+    def start(self, request):
+        recorder = QueryRecorder()
+        request._funds_timing = {'recorder': recorder}
+        token = current_recorder.set(recorder)
+        return recorder, token, time.perf_counter()
+
+    def finish(self, request, response, recorder, started):
+        timing = request._funds_timing
+        total = time.perf_counter() - started
+
+        metrics = [('db', recorder.duration, f'{recorder.count} queries')]
+        if 'view' in timing:
+            metrics.append(('serialize', timing['view'] - timing['view_db'], None))
+        if 'render' in timing:
+            metrics.append(('render', timing['render'], None))
+        metrics.append(('total', total, None))
+        if settings.FUNDS_SERVER_TIMING:
+            response['Server-Timing'] = ', '.join(
+                f'{name};dur={duration * 1000:.1f}' + (f';desc="{desc}"' if desc else '')
+                for name, duration, desc in metrics
+            )
+
+        duplicates = recorder.duplicates(settings.FUNDS_TIMING_DUPLICATE_THRESHOLD)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps({
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'queries': recorder.count,
+                'duplicate_queries': sum(count for _, count in duplicates),
+                **{
+                    f'{name}_ms': round(duration * 1000, 2)
+                    for name, duration, _ in metrics
+                },
+            }))
+        observe_request(request, response, total, recorder.count, recorder.duration)
+        for sql, count in duplicates:
+            logger.warning(
+                'Possible N+1: %s %s ran the same query %d times: %s',
+                request.method,
+                request.path,
+                count,
+                sql
+            )
+        return response
+
+    def view_started(self, request):
+        timing = request._funds_timing
+        timing['view_started'] = time.perf_counter()
+        timing['view_db_started'] = timing['recorder'].duration
+
+    def view_ended(self, request, response):
+        # DRF responses are rendered after this, so it marks the end of the view
+        timing = request._funds_timing
+        if 'view_started' in timing:
+            view_ended = time.perf_counter()
+            timing['view'] = view_ended - timing['view_started']
+            timing['view_db'] = timing['recorder'].duration - timing['view_db_started']
+
+            def rendered(response):
+                timing['render'] = time.perf_counter() - view_ended
+
+            response.add_post_render_callback(rendered)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        self.view_started(request)
+
+    def process_template_response(self, request, response):
+        return self.view_ended(request, response)
+
+    async def process_view_async(self, request, view_func, view_args, view_kwargs):
+        self.view_started(request)
+
+    async def process_template_response_async(self, request, response):
+        return self.view_ended(request, response)
@@ -0,0 +1,54 @@
+# Generated by Django 3.1.5 on 2026-10-18 19:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_balances(apps, schema_editor):
+    """
+    Build the running balance ledger from the existing transactions
+    """
+    Balances = apps.get_model('funds', 'Balances')
+    Transactions = apps.get_model('funds', 'Transactions')
+    totals = (
+        Transactions.objects.values_list('account_id', 'posting_num__date')
+        .annotate(total=models.Sum('amount'))
+        .order_by('account_id', 'posting_num__date')
+    )
+    balances = []
+    account = balance = None
+    for account_id, date, total in totals:
+        if account_id != account:
+            account, balance = account_id, 0
+        balance += total
+        balances.append(Balances(account_id_id=account_id, date=date, balance=balance))
+    Balances.objects.bulk_create(balances, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('funds', '0004_auto_20210113_2027'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='transactions',
+            name='posting_num',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='transactions', to='funds.postings'),
+        ),
+        migrations.CreateModel(
+            name='Balances',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('balance', models.DecimalField(decimal_places=4, max_digits=19)),
+                ('account_id', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='balances', to='funds.accounts')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='balances',
+            constraint=models.UniqueConstraint(fields=('account_id', 'date'), name='balances_account_date'),
+        ),
+        migrations.RunPython(populate_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 3.1.5 on 2026-10-18 19:42
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+
+def populate_rollups(apps, schema_editor):
+    """
+    Aggregate the existing transactions into monthly rollups
+    """
+    MonthlyRollups = apps.get_model('funds', 'MonthlyRollups')
+    Transactions = apps.get_model('funds', 'Transactions')
+    totals = (
+        Transactions.objects.annotate(
+            year=ExtractYear('posting_num__date'),
+            month=ExtractMonth('posting_num__date')
+        )
+        .values_list('categories_id', 'account_id', 'year', 'month')
+        .annotate(total=models.Sum('amount'), count=models.Count('id'))
+        .order_by()
+    )
+    MonthlyRollups.objects.bulk_create(
+        (
+            MonthlyRollups(
+                categories_id_id=categories_id,
+                account_id_id=account_id,
+                year=year,
+                month=month,
+                total=total,
+                count=count
+            )
+            for categories_id, account_id, year, month, total, count in totals
+        ),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('funds', '0005_balances'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyRollups',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.SmallIntegerField()),
+                ('month', models.SmallIntegerField()),
+                ('total', models.DecimalField(decimal_places=4, max_digits=19)),
+                ('count', models.PositiveIntegerField()),
+                ('account_id', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='funds.accounts')),
+                ('categories_id', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='funds.categories')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='monthlyrollups',
+            constraint=models.UniqueConstraint(fields=('year', 'month', 'categories_id', 'account_id'), name='monthlyrollups_month_category_account'),
+        ),
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 3.1.5 on 2026-10-18 19:43
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('funds', '0006_monthlyrollups'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='transactions',
+            name='account_id',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, to='funds.accounts'),
+        ),
+        migrations.AlterField(
+            model_name='transactions',
+            name='categories_id',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, to='funds.categories'),
+        ),
+        migrations.AddIndex(
+            model_name='postings',
+            index=models.Index(fields=['date', 'posting_num'], name='postings_date_num'),
+        ),
+        migrations.AddIndex(
+            model_name='postings',
+            index=models.Index(condition=models.Q(cleared=False), fields=['date'], name='postings_uncleared_date'),
+        ),
+        migrations.AddIndex(
+            model_name='transactions',
+            index=models.Index(fields=['account_id', 'posting_num'], name='transactions_account_posting'),
+        ),
+        migrations.AddIndex(
+            model_name='transactions',
+            index=models.Index(fields=['categories_id', 'posting_num'], name='transactions_category_posting'),
+        ),
+        migrations.AddConstraint(
+            model_name='budgets',
+            constraint=models.UniqueConstraint(fields=('year', 'month', 'categories_id'), name='budgets_month_category'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 3.1.5 on 2026-10-18 20:10
+
+from django.db import migrations, models
+import funds.models
+
+
+def create_sequence(apps, schema_editor):
+    """
+    Create the sequence posting numbers are allocated from, starting after the existing postings
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'CREATE SEQUENCE funds_postings_posting_num_seq OWNED BY funds_postings.posting_num'
+    )
+    schema_editor.execute(
+        "SELECT setval('funds_postings_posting_num_seq', "
+        'GREATEST(MAX(posting_num), 1), MAX(posting_num) IS NOT NULL) FROM funds_postings'
+    )
+
+
+def drop_sequence(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP SEQUENCE funds_postings_posting_num_seq')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('funds', '0007_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='postings',
+            name='posting_num',
+            field=models.PositiveIntegerField(default=funds.models.next_posting_num, primary_key=True, serialize=False),
+        ),
+        migrations.RunPython(create_sequence, drop_sequence),
+    ]
@@ -0,0 +1,37 @@
+from django.db import migrations
+
+
+def create_search_indexes(apps, schema_editor):
+    """
+    Create the indexes funds.search matches against, with the same expressions as its queries
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute(
+        'CREATE INDEX postings_search ON funds_postings USING gin (('
+        "setweight(to_tsvector('english', payee), 'A') || "
+        "setweight(to_tsvector('english', note), 'B')))"
+    )
+    schema_editor.execute(
+        "CREATE INDEX transactions_search ON funds_transactions USING gin ((to_tsvector('english', note)))"
+    )
+    schema_editor.execute(
+        'CREATE INDEX postings_payee_trgm ON funds_postings USING gin (payee gin_trgm_ops)'
+    )
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX postings_search, transactions_search, postings_payee_trgm')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('funds', '0008_posting_num_sequence'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
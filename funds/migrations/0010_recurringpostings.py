@@ -0,0 +1,47 @@
+# Generated by Django 3.1.5 on 2026-10-18 20:19
+
+import datetime
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('funds', '0009_search_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecurringPostings',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('posting_type', models.CharField(choices=[('standard', 'Standard'), ('income', 'Income'), ('transfer', 'Transfer')], default='standard', max_length=30)),
+                ('payee', models.CharField(blank=True, max_length=50)),
+                ('note', models.TextField(blank=True)),
+                ('frequency', models.CharField(choices=[('daily', 'Daily'), ('weekly', 'Weekly'), ('monthly', 'Monthly'), ('yearly', 'Yearly')], default='monthly', max_length=10)),
+                ('interval', models.PositiveSmallIntegerField(default=1, validators=[django.core.validators.MinValueValidator(1)])),
+                ('start_date', models.DateField(default=datetime.date.today)),
+                ('until', models.DateField(blank=True, null=True)),
+                ('count', models.PositiveIntegerField(blank=True, null=True)),
+                ('materialized', models.PositiveIntegerField(default=0)),
+                ('next_date', models.DateField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RecurringTransactions',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=4, max_digits=19)),
+                ('note', models.TextField(blank=True)),
+                ('account_id', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='funds.accounts')),
+                ('categories_id', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='funds.categories')),
+                ('recurring', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='transactions', to='funds.recurringpostings')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='recurringpostings',
+            index=models.Index(fields=['next_date'], name='recurringpostings_next_date'),
+        ),
+    ]
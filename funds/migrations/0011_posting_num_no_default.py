@@ -0,0 +1,18 @@
+# Generated by Django 3.1.5 on 2026-10-18 20:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('funds', '0010_recurringpostings'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='postings',
+            name='posting_num',
+            field=models.PositiveIntegerField(primary_key=True, serialize=False),
+        ),
+    ]
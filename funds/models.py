@@ -1,7 +1,35 @@
+import calendar
 import datetime
+import decimal
+import heapq
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from itertools import groupby
 
-from django.db import models
+from django.db import connections, models, transaction
+from django.db.models import (
+    Case, Count, DecimalField, Exists, F, Max, OuterRef, Q, Subquery, Sum, Value, When
+)
+from django.db.models.functions import Coalesce, ExtractMonth, ExtractYear, Trunc
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.dispatch import Signal
+
+from funds.cache import bump_versions
+from funds.metrics import TRANSACTIONS_INSERTED
+
+
+# Sent by Postings.objects.bulk_import once its rows are inserted,
+# as bulk inserts skip the post_save signals
+postings_imported = Signal()
+# Sent by Postings.save and delete with the stored payee before and after,
+# None where there is no posting, and the (categories_id, account_id, count)
+# of the posting's transactions, which move to the new payee with it
+posting_payee_changed = Signal()
+# Sent by Transactions.save and delete with the stored (payee, categories_id,
+# account_id) before and after, None where there is no transaction
+transaction_payee_changed = Signal()
 
 
 def get_month():
@@ -30,6 +58,73 @@ def get_year():
         return today.year
 
 
+def add_months(date, months):
+    """
+    Move date by a number of months, to the last day of the month if it has fewer days
+    """
+    month = date.month - 1 + months
+    year = date.year + month // 12
+    month = month % 12 + 1
+    day = min(date.day, calendar.monthrange(year, month)[1])
+    return date.replace(year=year, month=month, day=day)
+
+
+def next_posting_num():
+    """
+    Allocate one posting number
+
+    Only referenced by migration 0008, postings are numbered when saved.
+    """
+    return Postings.objects.allocate(1)[0]
+
+
+def record_change(account_id, categories_id, date, amount, count):
+    """
+    Update the balance ledger and monthly rollups for a change to the transactions
+    """
+    Balances.objects.apply(account_id, date, amount)
+    MonthlyRollups.objects.apply(categories_id, account_id, date, amount, count)
+
+
+def record_bulk_changes(rows):
+    """
+    Update the balance ledger and monthly rollups for rows of transaction changes
+
+    The rows are (account_id, categories_id, date, amount) tuples.
+
+    Used by bulk inserts, which skip Transactions.save. The rows are summed
+    per account and date, and per rollup key, before touching the database.
+    """
+    balances = defaultdict(decimal.Decimal)
+    rollups = defaultdict(lambda: [decimal.Decimal(0), 0])
+    for account_id, categories_id, date, amount in rows:
+        amount = decimal.Decimal(amount)
+        balances[(account_id, date)] += amount
+        rollup = rollups[(categories_id, account_id, date.year, date.month)]
+        rollup[0] += amount
+        rollup[1] += 1
+    Balances.objects.apply_many(balances)
+    MonthlyRollups.objects.apply_many(rollups)
+
+
+def unbalanced_transfers(postings, transactions):
+    """
+    Get the posting_nums of the transfers whose transactions don't net to zero
+
+    The transactions must reference the postings by posting_num_id.
+    """
+    transfers = {
+        posting.posting_num
+        for posting in postings
+        if posting.posting_type == Postings.TRANSFER
+    }
+    totals = defaultdict(decimal.Decimal)
+    for row in transactions:
+        if row.posting_num_id in transfers:
+            totals[row.posting_num_id] += decimal.Decimal(row.amount)
+    return sorted(posting_num for posting_num, total in totals.items() if total)
+
+
 class Accounts(models.Model):
     CHECKING = 'checking'
     SAVINGS = 'savings'
@@ -49,6 +144,9 @@ class Accounts(models.Model):
         (OTHER_LIABILITY, 'Other Liability or Loan'),
         (OTHER_ASSET, 'Other Asset'),
     ]
+    # What the balances of each type count toward in the net worth
+    ASSET_TYPES = [CHECKING, SAVINGS, CASH, INVESTMENT, OTHER_ASSET]
+    LIABILITY_TYPES = [CREDIT_CARD, LINE_OF_CREDIT, OTHER_LIABILITY]
     account_name = models.CharField(max_length=50, unique=True)
     created_date = models.DateField(auto_now_add=True)
     account_type = models.CharField(max_length=30, choices=ACCT_TYPES, default=CASH)
@@ -65,6 +163,179 @@ class Categories(models.Model):
         return self.category_name
 
 
+# Last posting number allocated by this process per database without a sequence
+allocated = {}
+allocated_lock = threading.Lock()
+
+
+class PostingsManager(models.Manager):
+    # Created by migration 0008 on PostgreSQL
+    sequence = 'funds_postings_posting_num_seq'
+
+    def allocate(self, count):
+        """
+        Reserve count posting numbers that are never handed out again, in order
+
+        On PostgreSQL they come from a sequence, so concurrent writers get
+        different numbers without locking or retrying. The numbers are only
+        contiguous if nobody else allocates at the same time, and numbers that
+        end up unused are skipped. Other databases number after the highest
+        posting or the last number this process allocated, which is only safe
+        with one writing process.
+        """
+        connection = connections[self.db]
+        if connection.vendor != 'postgresql':
+            with allocated_lock:
+                last = max(
+                    self.aggregate(last=Max('posting_num'))['last'] or 0,
+                    allocated.get(self.db, 0)
+                )
+                allocated[self.db] = last + count
+            return list(range(last + 1, last + count + 1))
+        with connection.cursor() as cursor, self.sequence_lock(cursor, shared=True):
+            cursor.execute(
+                'SELECT nextval(%s) FROM generate_series(1, %s)',
+                [self.sequence, count]
+            )
+            return sorted(row[0] for row in cursor.fetchall())
+
+    def advance_sequence(self, posting_num):
+        """
+        Move the sequence past a posting number chosen by a client, so it's never allocated
+        """
+        connection = connections[self.db]
+        if connection.vendor != 'postgresql':
+            return
+        with connection.cursor() as cursor, self.sequence_lock(cursor, shared=False):
+            # The last value hasn't been handed out yet when is_called is false
+            cursor.execute(
+                f'SELECT setval(%s, %s) FROM {self.sequence} '
+                f'WHERE last_value - CASE WHEN is_called THEN 0 ELSE 1 END < %s',
+                [self.sequence, posting_num, posting_num]
+            )
+
+    @contextmanager
+    def sequence_lock(self, cursor, shared):
+        """
+        Hold the advisory lock on the sequence
+
+        Allocations share it, advancing the sequence takes it exclusively.
+        Reading the sequence and moving it with setval are separate steps, so a
+        nextval in between would be undone and its numbers handed out again.
+        The lock is held by the session rather than the transaction and is
+        released as soon as the statement ran, so allocating and advancing in
+        the same long transaction, as imports do, can't deadlock.
+        """
+        kind = '_shared' if shared else ''
+        key = [self.sequence]
+        cursor.execute(f'SELECT pg_advisory_lock{kind}(hashtext(%s))', key)
+        try:
+            yield
+        finally:
+            cursor.execute(f'SELECT pg_advisory_unlock{kind}(hashtext(%s))', key)
+
+    def bulk_import(self, postings, transactions, batch_size=1000):
+        """
+        Insert new postings and their transactions with batched INSERTs in one transaction
+
+        The transactions must reference the postings by posting_num_id. The
+        balance ledger is updated once for the whole batch rather than per row.
+        """
+        unbalanced = unbalanced_transfers(postings, transactions)
+        if unbalanced:
+            raise ValidationError(
+                'Transfers must net to zero, these don\'t: %(posting_nums)s',
+                code='unbalanced',
+                params={'posting_nums': ', '.join(map(str, unbalanced))}
+            )
+        dates = {posting.posting_num: posting.date for posting in postings}
+        with transaction.atomic():
+            self.bulk_create(postings, batch_size=batch_size)
+            if postings:
+                self.advance_sequence(max(posting.posting_num for posting in postings))
+            Transactions.objects.bulk_create(transactions, batch_size=batch_size)
+            record_bulk_changes(
+                (
+                    row.account_id_id,
+                    row.categories_id_id,
+                    dates[row.posting_num_id],
+                    row.amount
+                )
+                for row in transactions
+            )
+            # bulk_create doesn't send the signals that normally invalidate the cache
+            bump_versions('postings', 'transactions')
+            postings_imported.send(
+                sender=self.model,
+                postings=postings,
+                transactions=transactions
+            )
+            transaction.on_commit(lambda: TRANSACTIONS_INSERTED.inc(len(transactions)))
+
+    def unbalanced(self):
+        """
+        Transfers whose transactions don't net to zero, with their total
+
+        One GROUP BY posting_num ... HAVING SUM(amount) <> 0 query.
+        """
+        return (
+            self.filter(posting_type=Postings.TRANSFER)
+            .values('posting_num', 'date', 'payee')
+            .annotate(total=Sum('transactions__amount'))
+            .exclude(total=0)
+            .order_by('posting_num')
+        )
+
+    def reconcile(self, account_id, statement_date, statement_balance, posting_nums):
+        """
+        Clear postings of an account if that makes its cleared balance the statement's
+
+        The cleared balance is the sum of the account's transactions in postings
+        dated up to the statement date that are cleared or being cleared. If it
+        matches the statement balance every posting is cleared by one UPDATE,
+        otherwise nothing is written. Posting numbers that aren't postings of the
+        account dated up to the statement date are returned as missing, and
+        nothing is written either.
+        """
+        posting_nums = set(posting_nums)
+        in_account = Exists(
+            Transactions.objects.filter(posting_num=OuterRef('pk'), account_id=account_id)
+        )
+        with transaction.atomic():
+            found = set(
+                self.filter(posting_num__in=posting_nums, date__lte=statement_date)
+                .filter(in_account)
+                .select_for_update()
+                .values_list('posting_num', flat=True)
+            )
+            cleared_balance = (
+                Transactions.objects.filter(
+                    Q(posting_num__cleared=True) | Q(posting_num__in=found),
+                    account_id=account_id,
+                    posting_num__date__lte=statement_date
+                )
+                .aggregate(total=Sum('amount'))['total']
+                or decimal.Decimal(0)
+            )
+            # SQLite sums decimals as floats, round back to the amounts' precision
+            cleared_balance = cleared_balance.quantize(decimal.Decimal('0.0001'))
+            result = {
+                'cleared_balance': cleared_balance,
+                'difference': statement_balance - cleared_balance,
+                'cleared': 0,
+                'missing': sorted(posting_nums - found),
+            }
+            if result['missing'] or result['difference']:
+                return result
+            result['cleared'] = (
+                self.filter(posting_num__in=found, cleared=False).update(cleared=True)
+            )
+            if result['cleared']:
+                # update() doesn't send the signals that normally invalidate the cache
+                bump_versions('postings')
+        return result
+
+
 class Postings(models.Model):
     STANDARD = 'standard'
     INCOME = 'income'
@@ -74,6 +345,7 @@ class Postings(models.Model):
         (INCOME, 'Income'),
         (TRANSFER, 'Transfer'),
     ]
+    # Numbered when saved without one, see save()
     posting_num = models.PositiveIntegerField(primary_key=True)
     date = models.DateField(default=datetime.date.today)
     posting_type = models.CharField(
@@ -85,9 +357,144 @@ class Postings(models.Model):
     cleared = models.BooleanField(default=False)
     note = models.TextField(blank=True)
 
+    objects = PostingsManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['date', 'posting_num'], name='postings_date_num'),
+            models.Index(
+                fields=['date'],
+                name='postings_uncleared_date',
+                condition=models.Q(cleared=False)
+            ),
+        ]
+
     def __str__(self):
         return f'{self.posting_num}: {self.date}: {self.payee}'
 
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            if self.posting_num is None:
+                self.posting_num = Postings.objects.allocate(1)[0]
+                previous = None
+            else:
+                # Locked so concurrent edits can't both move the amounts from the same date
+                previous = (
+                    Postings.objects.select_for_update()
+                    .filter(pk=self.pk)
+                    .values_list('date', 'payee')
+                    .first()
+                )
+                if self._state.adding:
+                    Postings.objects.advance_sequence(self.posting_num)
+            previous_date, previous_payee = previous or (None, None)
+            super().save(*args, **kwargs)
+            if previous_payee != self.payee:
+                usage = []
+                if previous is not None:
+                    usage = list(
+                        self.transactions.values('categories_id', 'account_id')
+                        .annotate(count=Count('id'))
+                        .values_list('categories_id', 'account_id', 'count')
+                    )
+                posting_payee_changed.send(
+                    sender=Postings,
+                    old=previous_payee,
+                    new=self.payee,
+                    usage=usage
+                )
+            if previous_date is not None and previous_date != self.date:
+                # Move this posting's amounts to the new date in the ledger and rollups
+                totals = (
+                    self.transactions.values('account_id', 'categories_id')
+                    .annotate(total=Sum('amount'), count=Count('id'))
+                    .values_list('account_id', 'categories_id', 'total', 'count')
+                )
+                for account_id, categories_id, total, count in totals:
+                    record_change(account_id, categories_id, previous_date, -total, -count)
+                    record_change(account_id, categories_id, self.date, total, count)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            # The instance may be stale, and the transactions protect the posting
+            previous_payee = (
+                Postings.objects.select_for_update()
+                .filter(pk=self.pk)
+                .values_list('payee', flat=True)
+                .first()
+            )
+            result = super().delete(*args, **kwargs)
+            if previous_payee is not None:
+                posting_payee_changed.send(
+                    sender=Postings,
+                    old=previous_payee,
+                    new=None,
+                    usage=[]
+                )
+            return result
+
+
+class TransactionsManager(models.Manager):
+
+    def net_worth(self, interval):
+        """
+        List (date, assets, liabilities) at the end of each day, week or month
+
+        Only the periods with transactions are listed, each dated with its
+        first day. Liabilities are what is owed, so the negated balance of the
+        liability accounts, and the net worth is assets minus liabilities. The
+        amounts are summed per period and the running totals taken with a
+        window function over those sums, all in one query.
+        """
+        amount = DecimalField(max_digits=19, decimal_places=4)
+        zero = Value(decimal.Decimal(0), output_field=amount)
+        if interval == 'day':
+            period = F('posting_num__date')
+        else:
+            period = Trunc('posting_num__date', interval, output_field=models.DateField())
+        periods = (
+            self.annotate(period=period)
+            .values('period')
+            .annotate(
+                assets=Sum(Case(
+                    When(account_id__account_type__in=Accounts.ASSET_TYPES, then='amount'),
+                    default=zero,
+                    output_field=amount
+                )),
+                liabilities=-Sum(Case(
+                    When(
+                        account_id__account_type__in=Accounts.LIABILITY_TYPES,
+                        then='amount'
+                    ),
+                    default=zero,
+                    output_field=amount
+                ))
+            )
+            .order_by()
+        )
+        # The ORM can't take a window over aggregates, so it goes around the grouped query
+        sql, params = periods.query.sql_with_params()
+        connection = connections[self.db]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT period, '
+                'SUM(assets) OVER (ORDER BY period), '
+                'SUM(liabilities) OVER (ORDER BY period) '
+                f'FROM ({sql}) periods ORDER BY period',
+                params
+            )
+            rows = cursor.fetchall()
+        date_field = models.DateField()
+        cent = decimal.Decimal('0.0001')
+        return [
+            (
+                date_field.to_python(period),
+                decimal.Decimal(str(assets)).quantize(cent),
+                decimal.Decimal(str(liabilities)).quantize(cent)
+            )
+            for period, assets, liabilities in rows
+        ]
+
 
 class Transactions(models.Model):
     posting_num = models.ForeignKey(
@@ -95,14 +502,142 @@ class Transactions(models.Model):
         related_name='transactions',
         on_delete=models.PROTECT
     )
-    account_id = models.ForeignKey(Accounts, on_delete=models.PROTECT)
-    categories_id = models.ForeignKey(Categories, on_delete=models.PROTECT)
+    # Indexed by the composite indexes in Meta, which lead with these columns
+    account_id = models.ForeignKey(Accounts, on_delete=models.PROTECT, db_index=False)
+    categories_id = models.ForeignKey(Categories, on_delete=models.PROTECT, db_index=False)
     amount = models.DecimalField(max_digits=19, decimal_places=4)
     note = models.TextField(blank=True)
 
+    objects = TransactionsManager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['account_id', 'posting_num'],
+                name='transactions_account_posting'
+            ),
+            models.Index(
+                fields=['categories_id', 'posting_num'],
+                name='transactions_category_posting'
+            ),
+        ]
+
     def __str__(self):
         return f'{self.posting_num}: {self.account_id}: {self.amount}'
 
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            previous = self.stored() if self.pk is not None else None
+            # The posting's date and payee as stored, locked until this is recorded
+            posting_date, posting_payee = (
+                Postings.objects.select_for_update()
+                .filter(pk=self.posting_num_id)
+                .values_list('date', 'payee')
+                .get()
+            )
+            super().save(*args, **kwargs)
+            if previous is not None:
+                account_id, categories_id, date, amount, payee = previous
+                record_change(account_id, categories_id, date, -amount, -1)
+            record_change(
+                self.account_id_id,
+                self.categories_id_id,
+                posting_date,
+                self.amount,
+                1
+            )
+            transaction_payee_changed.send(
+                sender=Transactions,
+                old=(payee, categories_id, account_id) if previous is not None else None,
+                new=(posting_payee, self.categories_id_id, self.account_id_id)
+            )
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            # The instance may be stale, reverse what is actually stored
+            previous = self.stored()
+            if previous is not None:
+                account_id, categories_id, date, amount, payee = previous
+                record_change(account_id, categories_id, date, -amount, -1)
+                transaction_payee_changed.send(
+                    sender=Transactions,
+                    old=(payee, categories_id, account_id),
+                    new=None
+                )
+            return super().delete(*args, **kwargs)
+
+    def stored(self):
+        """
+        Lock this transaction's row and get its stored values, or None if it's gone
+
+        Returns (account_id, categories_id, date, amount, payee). The posting's
+        row is locked too, so its date can't move until this transaction is
+        written.
+        """
+        return (
+            # Without OF, FOR UPDATE locks the rows of every joined table
+            Transactions.objects.select_for_update()
+            .filter(pk=self.pk)
+            .values_list(
+                'account_id',
+                'categories_id',
+                'posting_num__date',
+                'amount',
+                'posting_num__payee'
+            )
+            .first()
+        )
+
+
+class BudgetsManager(models.Manager):
+
+    def report(self, year, month=None):
+        """
+        Budgeted, spent and remaining amounts per category for a month, or a whole year
+
+        Spending is recorded as negative transaction amounts, so spent is the
+        negated sum of the category's transactions dated in the period. Both
+        sums are correlated subqueries so the whole report is one query.
+        """
+        if month is None:
+            start = datetime.date(year, 1, 1)
+            end = datetime.date(year + 1, 1, 1)
+        else:
+            start = datetime.date(year, month, 1)
+            end = datetime.date(year + month // 12, month % 12 + 1, 1)
+        amount = DecimalField(max_digits=19, decimal_places=4)
+        zero = Value(decimal.Decimal(0), output_field=amount)
+
+        budgets = self.filter(categories_id=OuterRef('pk'), year=year)
+        if month is not None:
+            budgets = budgets.filter(month=month)
+        budgeted = (
+            budgets.order_by()
+            .values('categories_id')
+            .annotate(total=Sum('amount'))
+            .values('total')
+        )
+        spent = (
+            Transactions.objects.filter(
+                categories_id=OuterRef('pk'),
+                posting_num__date__gte=start,
+                posting_num__date__lt=end
+            )
+            .order_by()
+            .values('categories_id')
+            .annotate(total=-Sum('amount'))
+            .values('total')
+        )
+        return (
+            Categories.objects.annotate(
+                budgeted=Coalesce(Subquery(budgeted, output_field=amount), zero),
+                spent=Coalesce(Subquery(spent, output_field=amount), zero),
+            )
+            .annotate(remaining=F('budgeted') - F('spent'))
+            .order_by('category_name')
+            .values('id', 'category_name', 'budgeted', 'spent', 'remaining')
+        )
+
 
 class Budgets(models.Model):
     month = models.SmallIntegerField(
@@ -113,5 +648,507 @@ class Budgets(models.Model):
     categories_id = models.ForeignKey(Categories, on_delete=models.PROTECT)
     amount = models.DecimalField(max_digits=19, decimal_places=4)
 
+    objects = BudgetsManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['year', 'month', 'categories_id'],
+                name='budgets_month_category'
+            )
+        ]
+
     def __str__(self):
         return f'{self.month}/{self.year}: {self.categories_id}'
+
+
+class BalancesManager(models.Manager):
+
+    def apply(self, account_id, date, amount):
+        """
+        Add amount to the running balance of an account from date onwards
+
+        Must be called inside the transaction that changed the underlying
+        Transactions rows. Bulk writes and queryset update/delete bypass this,
+        so callers doing those have to use rebuild instead.
+        """
+        if not amount:
+            return
+        with transaction.atomic(savepoint=False):
+            # Writers of the same account queue on its row, so none of them
+            # copies a previous balance another one is about to change
+            Accounts.objects.select_for_update().get(pk=account_id)
+            if not self.filter(account_id=account_id, date=date).exists():
+                previous = (
+                    self.filter(account_id=account_id, date__lt=date)
+                    .order_by('-date')
+                    .values_list('balance', flat=True)
+                    .first()
+                )
+                self.create(account_id_id=account_id, date=date, balance=previous or 0)
+            self.filter(account_id=account_id, date__gte=date).update(
+                balance=F('balance') + amount
+            )
+
+    def apply_many(self, deltas):
+        """
+        Apply a dict of (account_id, date) to amount to the ledger
+
+        Each account's rows from its earliest changed date onwards are read,
+        merged with the changes and written back, a few queries per account
+        rather than one apply per date when importing many rows. The accounts are locked
+        first, like apply does.
+        """
+        changes_by_account = defaultdict(dict)
+        for (account_id, date), amount in deltas.items():
+            if amount:
+                changes_by_account[account_id][date] = amount
+        with transaction.atomic():
+            # In primary key order so concurrent imports lock them in the same order
+            list(
+                Accounts.objects.select_for_update()
+                .filter(pk__in=changes_by_account)
+                .order_by('pk')
+                .values_list('pk', flat=True)
+            )
+            for account_id, changes in changes_by_account.items():
+                start = min(changes)
+                existing = self.filter(account_id=account_id, date__gte=start)
+                stored = dict(existing.values_list('date', 'balance'))
+                day_before = start - datetime.timedelta(days=1)
+                previous = running = self.as_of(account_id, day_before)
+                rows = []
+                for date in sorted(stored.keys() | changes.keys()):
+                    if date in stored:
+                        running += stored[date] - previous
+                        previous = stored[date]
+                    running += changes.get(date, 0)
+                    rows.append(
+                        Balances(account_id_id=account_id, date=date, balance=running)
+                    )
+                existing.delete()
+                self.bulk_create(rows)
+
+    def as_of(self, account_id, date=None):
+        """
+        Get the balance of an account at the end of date, or including all dates if None
+        """
+        balances = self.filter(account_id=account_id)
+        if date is not None:
+            balances = balances.filter(date__lte=date)
+        balance = balances.order_by('-date').values_list('balance', flat=True).first()
+        return balance if balance is not None else decimal.Decimal(0)
+
+    def recompute(self, account_ids=None):
+        """
+        Compute the ledger rows from scratch as a dict of (account_id, date) to balance
+        """
+        totals = Transactions.objects.all()
+        if account_ids is not None:
+            totals = totals.filter(account_id__in=account_ids)
+        totals = (
+            totals.values_list('account_id', 'posting_num__date')
+            .annotate(total=Sum('amount'))
+            .order_by('account_id', 'posting_num__date')
+        )
+        balances = {}
+        for account_id, rows in groupby(totals, key=lambda row: row[0]):
+            balance = decimal.Decimal(0)
+            for _, date, total in rows:
+                balance += total
+                balances[(account_id, date)] = balance
+        return balances
+
+    def rebuild(self, account_ids=None, batch_size=1000):
+        """
+        Replace the ledger rows of the accounts, or all accounts, with a recomputation
+        """
+        balances = self.recompute(account_ids)
+        with transaction.atomic():
+            existing = self.all()
+            if account_ids is not None:
+                existing = existing.filter(account_id__in=account_ids)
+            existing.delete()
+            self.bulk_create(
+                (
+                    Balances(account_id_id=account_id, date=date, balance=balance)
+                    for (account_id, date), balance in balances.items()
+                ),
+                batch_size=batch_size
+            )
+            # Bulk writes don't send the signals that normally invalidate the cache
+            bump_versions('balances')
+        return len(balances)
+
+    def verify(self, account_ids=None):
+        """
+        Compare the stored ledger with a full recomputation
+
+        Rows left behind on dates whose transactions were all removed are
+        valid as long as they hold the running balance as of that date.
+        Returns a list of (account_id, date, stored, expected) for every
+        row that is wrong or missing.
+        """
+        expected = self.recompute(account_ids)
+        stored = self.all()
+        if account_ids is not None:
+            stored = stored.filter(account_id__in=account_ids)
+        stored = (
+            stored.order_by('account_id', 'date')
+            .values_list('account_id', 'date', 'balance')
+        )
+
+        mismatches = []
+        seen = set()
+        by_account = {}
+        for (account_id, date), balance in expected.items():
+            by_account.setdefault(account_id, []).append((date, balance))
+        for account_id, rows in groupby(stored, key=lambda row: row[0]):
+            expected_rows = by_account.get(account_id, [])
+            position = 0
+            running = decimal.Decimal(0)
+            for _, date, balance in rows:
+                while position < len(expected_rows) and expected_rows[position][0] <= date:
+                    running = expected_rows[position][1]
+                    position += 1
+                seen.add((account_id, date))
+                if balance != running:
+                    mismatches.append((account_id, date, balance, running))
+        for (account_id, date), balance in expected.items():
+            if (account_id, date) not in seen:
+                mismatches.append((account_id, date, None, balance))
+        return mismatches
+
+
+class Balances(models.Model):
+    """
+    Running balance of an account at the end of each date it has transactions
+
+    Maintained incrementally whenever a Transactions row is written, so the
+    balance as of any date is a single index lookup instead of a sum over
+    the account's history.
+    """
+    account_id = models.ForeignKey(
+        Accounts,
+        related_name='balances',
+        on_delete=models.CASCADE
+    )
+    date = models.DateField()
+    balance = models.DecimalField(max_digits=19, decimal_places=4)
+
+    objects = BalancesManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['account_id', 'date'],
+                name='balances_account_date'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.account_id}: {self.date}: {self.balance}'
+
+
+class MonthlyRollupsManager(models.Manager):
+
+    def apply(self, categories_id, account_id, date, amount, count):
+        """
+        Add amount and count to the rollup row for the category, account and month of date
+        """
+        key = {
+            'categories_id_id': categories_id,
+            'account_id_id': account_id,
+            'year': date.year,
+            'month': date.month,
+        }
+        updated = self.filter(**key).update(
+            total=F('total') + amount,
+            count=F('count') + count
+        )
+        if not updated:
+            rollup, created = self.get_or_create(
+                **key,
+                defaults={'total': amount, 'count': count}
+            )
+            if not created:
+                self.filter(pk=rollup.pk).update(
+                    total=F('total') + amount,
+                    count=F('count') + count
+                )
+
+    def apply_many(self, deltas):
+        """
+        Apply a dict of (categories_id, account_id, year, month) to (amount, count)
+
+        On PostgreSQL and SQLite the rows are upserted with INSERT ... ON
+        CONFLICT DO UPDATE, a statement per batch of keys rather than per
+        key. It only locks the rows of the keys, and a row another
+        transaction creates first is added to instead of failing. Other
+        databases apply the keys one at a time.
+        """
+        connection = connections[self.db]
+        if connection.vendor not in ('postgresql', 'sqlite'):
+            for key, (amount, count) in deltas.items():
+                categories_id, account_id, year, month = key
+                date = datetime.date(year, month, 1)
+                self.apply(categories_id, account_id, date, amount, count)
+            return
+        opts = self.model._meta
+        fields = [
+            opts.get_field(name)
+            for name in ('categories_id', 'account_id', 'year', 'month', 'total', 'count')
+        ]
+        qn = connection.ops.quote_name
+        table = qn(opts.db_table)
+        columns = [qn(field.column) for field in fields]
+        total, count = columns[-2:]
+        # Sorted so concurrent imports lock the rows in the same order
+        rows = [key + tuple(delta) for key, delta in sorted(deltas.items())]
+        batch_size = connection.ops.bulk_batch_size(fields, rows)
+        with connection.cursor() as cursor:
+            for start in range(0, len(rows), batch_size):
+                batch = rows[start:start + batch_size]
+                row_values = '(' + ', '.join(['%s'] * len(fields)) + ')'
+                values = ', '.join([row_values] * len(batch))
+                cursor.execute(
+                    f'INSERT INTO {table} ({", ".join(columns)}) VALUES {values} '
+                    f'ON CONFLICT ({", ".join(columns[:4])}) DO UPDATE SET '
+                    f'{total} = {table}.{total} + EXCLUDED.{total}, '
+                    f'{count} = {table}.{count} + EXCLUDED.{count}',
+                    [
+                        field.get_db_prep_save(value, connection)
+                        for row in batch
+                        for field, value in zip(fields, row)
+                    ]
+                )
+
+    def recompute(self):
+        """
+        Aggregate the transactions into rollup rows from scratch
+        """
+        return (
+            Transactions.objects.annotate(
+                year=ExtractYear('posting_num__date'),
+                month=ExtractMonth('posting_num__date')
+            )
+            .values_list('categories_id', 'account_id', 'year', 'month')
+            .annotate(total=Sum('amount'), count=Count('id'))
+            .order_by()
+        )
+
+    def rebuild(self, batch_size=1000):
+        """
+        Replace every rollup row with a full recomputation
+        """
+        rows = [
+            MonthlyRollups(
+                categories_id_id=categories_id,
+                account_id_id=account_id,
+                year=year,
+                month=month,
+                total=total,
+                count=count
+            )
+            for categories_id, account_id, year, month, total, count in self.recompute()
+        ]
+        with transaction.atomic():
+            self.all().delete()
+            self.bulk_create(rows, batch_size=batch_size)
+            bump_versions('monthlyrollups')
+        return len(rows)
+
+
+class MonthlyRollups(models.Model):
+    """
+    Sum and count of transactions per category, account and month of the posting date
+
+    Maintained incrementally alongside the balance ledger so spending
+    analytics read a few rows per month instead of scanning transactions.
+    """
+    categories_id = models.ForeignKey(Categories, on_delete=models.CASCADE)
+    account_id = models.ForeignKey(Accounts, on_delete=models.CASCADE)
+    year = models.SmallIntegerField()
+    month = models.SmallIntegerField()
+    total = models.DecimalField(max_digits=19, decimal_places=4)
+    count = models.PositiveIntegerField()
+
+    objects = MonthlyRollupsManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['year', 'month', 'categories_id', 'account_id'],
+                name='monthlyrollups_month_category_account'
+            )
+        ]
+
+    def __str__(self):
+        return (
+            f'{self.month}/{self.year}: {self.categories_id}: '
+            f'{self.account_id}: {self.total}'
+        )
+
+
+class RecurringPostingsManager(models.Manager):
+
+    def materialize(self, until):
+        """
+        Create the postings of every template's occurrences due by until
+
+        The templates due are locked and their occurrences taken from a heap
+        ordered by date, so the postings are numbered in date order across
+        templates, and written with one bulk_import. Each template's next_date
+        is moved past the occurrences created in the same transaction, so
+        running it again for the same date creates nothing. Returns how many
+        postings were created.
+        """
+        with transaction.atomic():
+            templates = list(
+                self.select_for_update()
+                .filter(next_date__lte=until)
+                .order_by('pk')
+                .prefetch_related('transactions')
+            )
+            lines = {
+                template.pk: list(template.transactions.all())
+                for template in templates
+            }
+            heap = [(template.next_date, template.pk, template) for template in templates]
+            heapq.heapify(heap)
+            occurrences = []
+            while heap:
+                date, _, template = heapq.heappop(heap)
+                occurrences.append((date, template))
+                template.materialized += 1
+                template.next_date = template.occurrence(template.materialized)
+                if template.next_date is not None and template.next_date <= until:
+                    heapq.heappush(heap, (template.next_date, template.pk, template))
+
+            postings = []
+            transactions = []
+            posting_nums = Postings.objects.allocate(len(occurrences))
+            for posting_num, (date, template) in zip(posting_nums, occurrences):
+                postings.append(Postings(
+                    posting_num=posting_num,
+                    date=date,
+                    posting_type=template.posting_type,
+                    payee=template.payee,
+                    note=template.note
+                ))
+                transactions.extend(
+                    Transactions(
+                        posting_num_id=posting_num,
+                        account_id_id=line.account_id_id,
+                        categories_id_id=line.categories_id_id,
+                        amount=line.amount,
+                        note=line.note
+                    )
+                    for line in lines[template.pk]
+                )
+            if postings:
+                Postings.objects.bulk_import(postings, transactions)
+            # Templates on the same schedule end up in the same state,
+            # so one UPDATE covers them
+            states = defaultdict(list)
+            for template in templates:
+                states[(template.next_date, template.materialized)].append(template.pk)
+            for (next_date, materialized), pks in states.items():
+                self.filter(pk__in=pks).update(
+                    next_date=next_date,
+                    materialized=materialized
+                )
+        return len(postings)
+
+
+class RecurringPostings(models.Model):
+    """
+    Template of a posting that repeats on a schedule, like rent or a salary
+
+    The schedule follows an RRULE with FREQ, INTERVAL and either UNTIL or
+    COUNT. Occurrences are counted from start_date, and monthly or yearly
+    ones on a day the month doesn't have fall on its last day instead.
+    """
+    DAILY = 'daily'
+    WEEKLY = 'weekly'
+    MONTHLY = 'monthly'
+    YEARLY = 'yearly'
+    FREQUENCIES = [
+        (DAILY, 'Daily'),
+        (WEEKLY, 'Weekly'),
+        (MONTHLY, 'Monthly'),
+        (YEARLY, 'Yearly'),
+    ]
+    posting_type = models.CharField(
+        max_length=30,
+        choices=Postings.POST_TYPES,
+        default=Postings.STANDARD
+    )
+    payee = models.CharField(max_length=50, blank=True)
+    note = models.TextField(blank=True)
+    frequency = models.CharField(max_length=10, choices=FREQUENCIES, default=MONTHLY)
+    interval = models.PositiveSmallIntegerField(
+        default=1,
+        validators=[MinValueValidator(1)]
+    )
+    start_date = models.DateField(default=datetime.date.today)
+    until = models.DateField(null=True, blank=True)
+    count = models.PositiveIntegerField(null=True, blank=True)
+    # Number of occurrences turned into postings, and the date of the next one
+    materialized = models.PositiveIntegerField(default=0)
+    next_date = models.DateField(null=True, blank=True)
+
+    objects = RecurringPostingsManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['next_date'], name='recurringpostings_next_date'),
+        ]
+
+    def __str__(self):
+        return f'{self.payee}: every {self.interval} {self.frequency}'
+
+    def save(self, *args, **kwargs):
+        # Follow changes to the schedule
+        self.next_date = self.occurrence(self.materialized)
+        super().save(*args, **kwargs)
+
+    def occurrence(self, index):
+        """
+        Get the date of the occurrence at index, counting from 0
+
+        Returns None if the schedule ends before it.
+        """
+        if self.count is not None and index >= self.count:
+            return None
+        step = index * self.interval
+        try:
+            if self.frequency == self.DAILY:
+                date = self.start_date + datetime.timedelta(days=step)
+            elif self.frequency == self.WEEKLY:
+                date = self.start_date + datetime.timedelta(weeks=step)
+            elif self.frequency == self.MONTHLY:
+                date = add_months(self.start_date, step)
+            else:
+                date = add_months(self.start_date, 12 * step)
+        except (OverflowError, ValueError):
+            # Past the last date there is
+            return None
+        if self.until is not None and date > self.until:
+            return None
+        return date
+
+
+class RecurringTransactions(models.Model):
+    recurring = models.ForeignKey(
+        RecurringPostings,
+        related_name='transactions',
+        on_delete=models.CASCADE
+    )
+    account_id = models.ForeignKey(Accounts, on_delete=models.PROTECT)
+    categories_id = models.ForeignKey(Categories, on_delete=models.PROTECT)
+    amount = models.DecimalField(max_digits=19, decimal_places=4)
+    note = models.TextField(blank=True)
+
+    def __str__(self):
+        return f'{self.recurring}: {self.account_id}: {self.amount}'
@@ -0,0 +1,137 @@
+import json
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination keyed on every field of the ordering, not just the first
+
+    DRF's CursorPagination filters on the first ordering field and skips rows
+    sharing that value with an offset. Encoding the whole ordering tuple in
+    the cursor instead means every page is a single indexed range query, so
+    the cost of a page does not depend on how deep the client has scrolled.
+    The ordering must end with a unique field.
+    """
+    ordering = ('id',)
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            reverse, current_position = False, None
+        else:
+            reverse, current_position = self.cursor.reverse, self.cursor.position
+
+        if reverse:
+            queryset = queryset.order_by(*self._reverse_ordering())
+        else:
+            queryset = queryset.order_by(*self.ordering)
+
+        if current_position is not None:
+            queryset = queryset.filter(self._get_keyset_filter(current_position, reverse))
+
+        # Always fetch an extra row to find out if there is a following page
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+
+        if len(results) > len(self.page):
+            has_following_position = True
+            following_position = self._get_position_from_instance(
+                results[-1],
+                self.ordering
+            )
+        else:
+            has_following_position = False
+            following_position = None
+
+        if reverse:
+            self.page = list(reversed(self.page))
+            self.has_next = current_position is not None
+            self.has_previous = has_following_position
+            if self.has_next:
+                self.next_position = current_position
+            if self.has_previous:
+                self.previous_position = following_position
+        else:
+            self.has_next = has_following_position
+            self.has_previous = current_position is not None
+            if self.has_next:
+                self.next_position = following_position
+            if self.has_previous:
+                self.previous_position = current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+    def decode_cursor(self, request):
+        cursor = super().decode_cursor(request)
+        if cursor is None or cursor.position is None:
+            return cursor
+        try:
+            values = json.loads(cursor.position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return cursor
+
+    def _reverse_ordering(self):
+        return tuple(
+            order[1:] if order.startswith('-') else '-' + order
+            for order in self.ordering
+        )
+
+    def _get_keyset_filter(self, position, reverse):
+        """
+        Build the row comparison `(a, b, c) > (x, y, z)` as nested OR/AND conditions
+        """
+        values = json.loads(position)
+        keyset = Q()
+        equal = Q()
+        for order, value in zip(self.ordering, values):
+            field = order.lstrip('-')
+            lookup = '__lt' if reverse != order.startswith('-') else '__gt'
+            keyset |= equal & Q(**{field + lookup: value})
+            equal &= Q(**{field: value})
+        return keyset
+
+    def _get_position_from_instance(self, instance, ordering):
+        values = []
+        for order in ordering:
+            field_name = order.lstrip('-')
+            if isinstance(instance, dict):
+                attr = instance[field_name]
+            elif hasattr(instance, '_meta'):
+                # Read foreign keys by their column so the related row isn't fetched
+                attr = getattr(instance, instance._meta.get_field(field_name).attname)
+            else:
+                attr = getattr(instance, field_name)
+            values.append(str(attr))
+        return json.dumps(values)
+
+
+class PostingsPagination(KeysetPagination):
+    """
+    Keyset pagination over postings in date order
+    """
+    ordering = ('date', 'posting_num')
+
+
+class MonthlyRollupsPagination(KeysetPagination):
+    """
+    Keyset pagination over rollups in month order
+    """
+    ordering = ('year', 'month', 'categories_id', 'account_id')
@@ -0,0 +1,189 @@
+"""
+In-memory prefix index of the payees of past postings for autocomplete
+
+Every distinct payee is kept with the number of postings it appears on and
+how often its transactions used each category and account, so a new
+posting can be pre-filled with the most likely ones. Suggestions are
+answered from a sorted list of the lowercased payees with bisect, without
+querying the database.
+
+The index is loaded on first use and updated as postings and transactions
+are created, edited and deleted in this process, by taking the counts of the
+old payee, category and account away and adding those of the new ones. It's
+loaded again on the next suggestion after FUNDS_PAYEE_INDEX_MAX_AGE, so writes
+of other processes are picked up.
+"""
+import bisect
+import heapq
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db.models import Count
+
+from funds.models import Postings, Transactions
+
+
+class PayeeIndex:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.loaded_at = None
+        # Sorted lowercased payees, and their statistics by lowercased payee
+        self.keys = []
+        self.payees = {}
+
+    def load(self):
+        self.loaded_at = None
+        self.payees = {}
+        payees = (
+            Postings.objects.exclude(payee='')
+            .values_list('payee')
+            .annotate(count=Count('pk'))
+            .order_by()
+        )
+        for payee, count in payees:
+            self._add_posting(payee, count)
+        usage = (
+            Transactions.objects.exclude(posting_num__payee='')
+            .values_list('posting_num__payee', 'categories_id', 'account_id')
+            .annotate(count=Count('pk'))
+            .order_by()
+        )
+        for payee, categories_id, account_id, count in usage:
+            self._add_transaction(payee, categories_id, account_id, count)
+        self.keys = sorted(self.payees)
+        self.loaded_at = time.monotonic()
+
+    def _load_if_stale(self):
+        if (self.loaded_at is None
+                or time.monotonic() - self.loaded_at > settings.FUNDS_PAYEE_INDEX_MAX_AGE):
+            self.load()
+
+    def _get_stats(self, payee):
+        key = payee.lower()
+        stats = self.payees.get(key)
+        if stats is None:
+            stats = self.payees[key] = {
+                # Seeded with this spelling in case only transactions of it are seen
+                'spellings': Counter({payee: 0}),
+                'count': 0,
+                'categories': Counter(),
+                'accounts': Counter(),
+            }
+            if self.loaded_at is not None:
+                bisect.insort(self.keys, key)
+        return stats
+
+    def _add_posting(self, payee, count=1):
+        stats = self._get_stats(payee)
+        stats['spellings'][payee] += count
+        stats['count'] += count
+
+    def _add_transaction(self, payee, categories_id, account_id, count=1):
+        stats = self._get_stats(payee)
+        stats['categories'][categories_id] += count
+        stats['accounts'][account_id] += count
+
+    def _remove_if_unused(self, payee):
+        key = payee.lower()
+        stats = self.payees[key]
+        for name in ('categories', 'accounts'):
+            stats[name] = +stats[name]
+        # A payee keeps a spelling as long as it has any
+        stats['spellings'] = +stats['spellings'] or stats['spellings']
+        if stats['count'] <= 0 and not stats['categories']:
+            del self.payees[key]
+            del self.keys[bisect.bisect_left(self.keys, key)]
+
+    def add_posting(self, payee):
+        """
+        Count a new posting of the payee, if the index is loaded
+        """
+        if payee:
+            with self.lock:
+                if self.loaded_at is not None:
+                    self._add_posting(payee)
+
+    def add_transaction(self, payee, categories_id, account_id):
+        """
+        Count the category and account of a new transaction of the payee
+
+        Nothing is counted until the index is loaded.
+        """
+        if payee:
+            with self.lock:
+                if self.loaded_at is not None:
+                    self._add_transaction(payee, categories_id, account_id)
+
+    def change_posting(self, old, new, usage):
+        """
+        Move a posting and the usage of its transactions from the old payee to the new one
+
+        The usage is a (categories_id, account_id, count) per category and account.
+        Either payee is None if the posting was created or deleted.
+        """
+        with self.lock:
+            if self.loaded_at is None:
+                return
+            if old:
+                self._add_posting(old, -1)
+                for categories_id, account_id, count in usage:
+                    self._add_transaction(old, categories_id, account_id, -count)
+                self._remove_if_unused(old)
+            if new:
+                self._add_posting(new)
+                for categories_id, account_id, count in usage:
+                    self._add_transaction(new, categories_id, account_id, count)
+
+    def change_transaction(self, old, new):
+        """
+        Replace the (payee, categories_id, account_id) of a transaction
+
+        Either is None if the transaction was created or deleted.
+        """
+        with self.lock:
+            if self.loaded_at is None:
+                return
+            if old and old[0]:
+                self._add_transaction(*old, -1)
+                self._remove_if_unused(old[0])
+            if new and new[0]:
+                self._add_transaction(*new)
+
+    def invalidate(self):
+        with self.lock:
+            self.loaded_at = None
+
+    def suggest(self, prefix, limit=10):
+        """
+        List the most used payees starting with prefix, ignoring case
+
+        Each comes with its most used category and account.
+        """
+        prefix = prefix.lower()
+        with self.lock:
+            self._load_if_stale()
+            start = bisect.bisect_left(self.keys, prefix)
+            end = bisect.bisect_left(self.keys, prefix[:-1] + chr(ord(prefix[-1]) + 1))
+            keys = heapq.nsmallest(
+                limit,
+                self.keys[start:end],
+                key=lambda key: (-self.payees[key]['count'], key)
+            )
+            return [self._suggestion(self.payees[key]) for key in keys]
+
+    @staticmethod
+    def _suggestion(stats):
+        categories = stats['categories'].most_common(1)
+        accounts = stats['accounts'].most_common(1)
+        return {
+            'payee': stats['spellings'].most_common(1)[0][0],
+            'count': stats['count'],
+            'categories_id': categories[0][0] if categories else None,
+            'account_id': accounts[0][0] if accounts else None,
+        }
+
+
+payee_index = PayeeIndex()
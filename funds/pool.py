@@ -0,0 +1,115 @@
+"""
+Thread safe pool of database connections
+
+Used by the funds.backends.postgresql database backend when the database
+settings have a POOL. Connections are handed out to whichever thread needs
+one and put back when Django closes them, so a process needs no more
+connections than it has requests running at once, up to MAX_SIZE.
+"""
+import os
+import threading
+from collections import deque
+
+from django.db import OperationalError
+
+
+class PoolTimeout(OperationalError):
+    """
+    No connection became free before the timeout
+    """
+
+
+class ConnectionPool:
+    """
+    Pool of at most max_size connections
+
+    Idle connections are checked with check before they are handed out,
+    connections failing it are closed and replaced.
+    """
+
+    def __init__(self, max_size=10, timeout=30, check=None):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.check = check
+        self.idle = deque()
+        self.lock = threading.Lock()
+        self.slots = threading.BoundedSemaphore(max_size)
+        self.pid = os.getpid()
+        self.closed = False
+        self.stats = {'opened': 0, 'reused': 0, 'discarded': 0}
+
+    def acquire(self, connect):
+        """
+        Get an idle connection, or one opened by calling connect if there are none
+        """
+        if not self.slots.acquire(timeout=self.timeout):
+            raise PoolTimeout(
+                f'No database connection free in the pool of {self.max_size} '
+                f'after {self.timeout} seconds'
+            )
+        try:
+            while True:
+                with self.lock:
+                    connection = self.idle.pop() if self.idle else None
+                if connection is None:
+                    connection = connect()
+                    with self.lock:
+                        self.stats['opened'] += 1
+                    return connection
+                if self.check is None or self.check(connection):
+                    with self.lock:
+                        self.stats['reused'] += 1
+                    return connection
+                self.discard(connection)
+        except BaseException:
+            self.slots.release()
+            raise
+
+    def release(self, connection, discard=False):
+        try:
+            with self.lock:
+                keep = not (discard or self.closed)
+                if keep:
+                    self.idle.append(connection)
+            if not keep:
+                self.discard(connection)
+        finally:
+            self.slots.release()
+
+    def discard(self, connection):
+        with self.lock:
+            self.stats['discarded'] += 1
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def close(self):
+        """
+        Close the idle connections, connections in use are closed when released
+        """
+        with self.lock:
+            self.closed = True
+            idle, self.idle = self.idle, deque()
+        for connection in idle:
+            connection.close()
+
+
+# Pool of each database alias in this process
+pools = {}
+pools_lock = threading.Lock()
+
+
+def get_pool(alias, **options):
+    """
+    Get the pool of a database alias, creating it on first use
+
+    A process forked after the pool was created, such as a WSGI server
+    worker, gets a pool of its own instead of sharing the parent's sockets.
+    A closed pool is replaced too.
+    """
+    with pools_lock:
+        pool = pools.get(alias)
+        if pool is None or pool.closed or pool.pid != os.getpid():
+            pool = pools[alias] = ConnectionPool(**options)
+        return pool
@@ -0,0 +1,219 @@
+"""
+Ranked search of postings by their payee and note and the notes of their transactions
+
+On PostgreSQL the words of the query are matched with full-text search and
+the payee also by trigram word similarity, so a misspelled payee is still
+found. Every match is answered from one of the GIN indexes created by
+migration 0009, whose expressions must stay the same as the ones below.
+
+Other databases, SQLite in the tests, search an inverted index built in
+memory from every posting and transaction. It is kept per process until a
+write bumps the cache version of postings or transactions.
+"""
+import re
+import threading
+from collections import defaultdict
+
+from django.db import connections
+
+from funds.cache import get_versions
+from funds.models import Postings, Transactions
+
+# The expressions of the postings_search and transactions_search indexes
+POSTING_DOCUMENT = (
+    "setweight(to_tsvector('english', payee), 'A') || "
+    "setweight(to_tsvector('english', note), 'B')"
+)
+TRANSACTION_DOCUMENT = "to_tsvector('english', note)"
+
+SEARCH_SQL = f"""
+    SELECT p.posting_num, p.date, p.payee, p.note, m.rank
+    FROM (
+        SELECT posting_num, SUM(rank) AS rank
+        FROM (
+            SELECT posting_num, ts_rank({POSTING_DOCUMENT}, query) AS rank
+            FROM funds_postings, websearch_to_tsquery('english', %(q)s) query
+            WHERE {POSTING_DOCUMENT} @@ query
+            UNION ALL
+            SELECT posting_num_id, ts_rank({TRANSACTION_DOCUMENT}, query)
+            FROM funds_transactions, websearch_to_tsquery('english', %(q)s) query
+            WHERE {TRANSACTION_DOCUMENT} @@ query
+            UNION ALL
+            SELECT posting_num, word_similarity(%(q)s, payee)
+            FROM funds_postings
+            WHERE %(q)s <%% payee
+        ) matches
+        GROUP BY posting_num
+        ORDER BY rank DESC, posting_num
+        LIMIT %(limit)s OFFSET %(offset)s
+    ) m
+    JOIN funds_postings p ON p.posting_num = m.posting_num
+    ORDER BY m.rank DESC, m.posting_num
+"""
+
+# The default weights ts_rank gives to the A, B and D labels of a document
+PAYEE_WEIGHT = 1.0
+NOTE_WEIGHT = 0.4
+TRANSACTION_NOTE_WEIGHT = 0.1
+# The default pg_trgm.word_similarity_threshold
+WORD_SIMILARITY_THRESHOLD = 0.6
+
+# The inverted index of this process and the versions it was built at
+index = {}
+index_lock = threading.Lock()
+
+
+def search(q, offset=0, limit=100):
+    """
+    Get the postings matching the query as dicts, best match first
+
+    Each dict has the posting_num, date, payee and note of the posting and
+    the rank of the match.
+    """
+    connection = connections[Postings.objects.db]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(SEARCH_SQL, {'q': q, 'offset': offset, 'limit': limit})
+            columns = [column[0] for column in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    ranks = get_index().rank(q)[offset:offset + limit]
+    postings = Postings.objects.in_bulk([posting_num for posting_num, _ in ranks])
+    return [
+        {
+            'posting_num': posting_num,
+            'date': postings[posting_num].date,
+            'payee': postings[posting_num].payee,
+            'note': postings[posting_num].note,
+            'rank': rank,
+        }
+        for posting_num, rank in ranks
+        if posting_num in postings
+    ]
+
+
+def get_index():
+    """
+    Get the inverted index of the current postings and transactions
+
+    It is built again once either of them changed.
+    """
+    versions = get_versions(['postings', 'transactions'])
+    with index_lock:
+        if index.get('versions') != versions:
+            index['index'] = InvertedIndex.build()
+            index['versions'] = versions
+        return index['index']
+
+
+def tokenize(text):
+    return re.findall(r'\w+', text.lower())
+
+
+def trigrams(text):
+    """
+    List the trigrams of every word of text in order, padded the way pg_trgm does
+    """
+    result = []
+    for word in tokenize(text):
+        padded = f'  {word} '
+        result.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+    return result
+
+
+def word_similarity(query, text):
+    """
+    Compute pg_trgm's word_similarity of the query to the best matching extent of text
+
+    An extent that scores best always starts and ends with a trigram of the
+    query, so only those are tried.
+    """
+    query_trigrams = set(trigrams(query))
+    if not query_trigrams:
+        return 0.0
+    text_trigrams = trigrams(text)
+    shared = [i for i, trigram in enumerate(text_trigrams) if trigram in query_trigrams]
+    best = 0.0
+    for start_index, start in enumerate(shared):
+        for end in shared[start_index:]:
+            extent = set(text_trigrams[start:end + 1])
+            common = len(extent & query_trigrams)
+            best = max(best, common / len(extent | query_trigrams))
+    return best
+
+
+class InvertedIndex:
+    """
+    Map words and payee trigrams to the postings they appear in
+
+    A document, a posting's payee and note or a transaction's note, matches
+    when it contains every word of the query, like websearch_to_tsquery
+    without stemming or stop words. Its rank adds up the weights of the
+    fields the words are found in.
+    """
+
+    def __init__(self):
+        # word -> {document: weight}
+        self.words = defaultdict(dict)
+        # document -> posting_num
+        self.documents = {}
+        # trigram -> payees, and payee -> posting_nums
+        self.trigrams = defaultdict(set)
+        self.payees = defaultdict(set)
+
+    @classmethod
+    def build(cls):
+        inverted_index = cls()
+        postings = Postings.objects.values_list('posting_num', 'payee', 'note')
+        for posting_num, payee, note in postings:
+            document = ('postings', posting_num)
+            inverted_index.add(document, posting_num, payee, PAYEE_WEIGHT)
+            inverted_index.add(document, posting_num, note, NOTE_WEIGHT)
+            if payee:
+                inverted_index.payees[payee].add(posting_num)
+                for trigram in trigrams(payee):
+                    inverted_index.trigrams[trigram].add(payee)
+        transactions = Transactions.objects.values_list('id', 'posting_num', 'note')
+        for id, posting_num, note in transactions:
+            inverted_index.add(
+                ('transactions', id),
+                posting_num,
+                note,
+                TRANSACTION_NOTE_WEIGHT
+            )
+        return inverted_index
+
+    def add(self, document, posting_num, text, weight):
+        self.documents[document] = posting_num
+        for word in tokenize(text):
+            documents = self.words[word]
+            documents[document] = max(documents.get(document, 0.0), weight)
+
+    def rank(self, q):
+        """
+        List (posting_num, rank) of every posting matching the query, best match first
+        """
+        ranks = defaultdict(float)
+        words = tokenize(q)
+        if words:
+            documents = set(self.words.get(words[0], ()))
+            for word in words[1:]:
+                documents &= set(self.words.get(word, ()))
+            for document in documents:
+                rank = sum(self.words[word][document] for word in words)
+                ranks[self.documents[document]] += rank
+
+        # A payee sharing fewer trigrams with the query can't reach the threshold
+        query_trigrams = set(trigrams(q))
+        shared = defaultdict(int)
+        for trigram in query_trigrams:
+            for payee in self.trigrams.get(trigram, ()):
+                shared[payee] += 1
+        minimum = WORD_SIMILARITY_THRESHOLD * len(query_trigrams)
+        for payee in (payee for payee, count in shared.items() if count >= minimum):
+            similarity = word_similarity(q, payee)
+            if similarity >= WORD_SIMILARITY_THRESHOLD:
+                for posting_num in self.payees[payee]:
+                    ranks[posting_num] += similarity
+
+        return sorted(ranks.items(), key=lambda item: (-item[1], item[0]))
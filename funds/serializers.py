@@ -1,12 +1,94 @@
+import datetime
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum
 from rest_framework import serializers
+from rest_framework.settings import api_settings
+
+from funds.cache import get_representations
+from funds.models import (
+    Accounts,
+    Balances,
+    Categories,
+    MonthlyRollups,
+    Postings,
+    RecurringPostings,
+    RecurringTransactions,
+    Transactions,
+    Budgets
+)
+from funds.pagination import KeysetPagination
+
+# Largest value of the integer primary key columns, beyond which PostgreSQL errors
+MAX_ID = 2147483647
+
+
+def existing_values(queryset, field, values, chunk_size=1000):
+    """
+    Get which of the values are in field of the queryset's rows
+
+    The values are looked up in chunks, to keep the IN lists within the
+    database's parameter limits.
+    """
+    values = list(values)
+    existing = set()
+    for start in range(0, len(values), chunk_size):
+        existing.update(
+            queryset.filter(**{f'{field}__in': values[start:start + chunk_size]})
+            .values_list(field, flat=True)
+        )
+    return existing
+
+
+class CachedNestedField(serializers.Field):
+    """
+    Read-only nested representation of a reference row, served from the cache
+
+    Reads the foreign key column so the related row is never loaded, then
+    looks its representation up in the table cached by funds.cache.
+    """
+
+    def __init__(self, serializer_class, **kwargs):
+        self.serializer_class = serializer_class
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def get_attribute(self, instance):
+        return getattr(instance, instance._meta.get_field(self.source).attname)
 
-from funds.models import Accounts, Categories, Postings, Transactions, Budgets
+    def to_representation(self, value):
+        request = self.context['request']
+        representations = get_representations(self.serializer_class, request)
+        if value in representations:
+            return representations[value]
+        # Created since the cache was filled by a process that didn't see the write
+        instance = self.serializer_class.Meta.model.objects.get(pk=value)
+        return self.serializer_class(instance, context=self.context).data
 
 
 class AccountSerializer(serializers.HyperlinkedModelSerializer):
+    balance = serializers.SerializerMethodField()
 
     class Meta:
         model = Accounts
+        fields = ['url', 'id', 'account_name', 'created_date', 'account_type', 'balance']
+
+    def get_balance(self, obj):
+        # AccountsViewset annotates the balance, nested serializers look it up
+        if hasattr(obj, 'current_balance'):
+            balance = obj.current_balance
+        else:
+            balance = Balances.objects.as_of(obj.pk)
+        return BalanceSerializer().fields['balance'].to_representation(balance)
+
+
+class NestedAccountSerializer(AccountSerializer):
+    """
+    Account nested in transaction rows, without the balance lookup per row
+    """
+
+    class Meta(AccountSerializer.Meta):
         fields = ['url', 'id', 'account_name', 'created_date', 'account_type']
 
 
@@ -18,8 +100,8 @@ class CategorySerializer(serializers.HyperlinkedModelSerializer):
 
 
 class TransactionSerializer(serializers.HyperlinkedModelSerializer):
-    account_id = AccountSerializer(many=False, read_only=True)
-    categories_id = CategorySerializer(many=False, read_only=True)
+    account_id = CachedNestedField(NestedAccountSerializer)
+    categories_id = CachedNestedField(CategorySerializer)
 
     class Meta:
         model = Transactions
@@ -38,11 +120,349 @@ class PostingSerializer(serializers.HyperlinkedModelSerializer):
             'url', 'posting_num', 'date', 'posting_type',
             'payee', 'cleared', 'note', 'transactions'
         ]
+        # Postings created without one are numbered when saved
+        extra_kwargs = {'posting_num': {'required': False}}
+
+    def validate_posting_type(self, value):
+        # A new posting has no transactions yet, they are added one at a time
+        if value == Postings.TRANSFER and self.instance is not None:
+            total = self.instance.transactions.aggregate(total=Sum('amount'))['total']
+            if total:
+                raise serializers.ValidationError(
+                    f'Transfer transactions must net to zero, they net to {total}.'
+                )
+        return value
 
 
 class BudgetSerializer(serializers.HyperlinkedModelSerializer):
-    categories_id = CategorySerializer(many=False, read_only=True)
+    categories_id = CachedNestedField(CategorySerializer)
 
     class Meta:
         model = Budgets
         fields = ['url', 'id', 'month', 'year', 'categories_id', 'amount']
+
+
+class RecurringTransactionSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = RecurringTransactions
+        fields = ['account_id', 'categories_id', 'amount', 'note']
+
+
+class RecurringPostingSerializer(serializers.HyperlinkedModelSerializer):
+    transactions = RecurringTransactionSerializer(many=True)
+
+    class Meta:
+        model = RecurringPostings
+        fields = [
+            'url', 'id', 'posting_type', 'payee', 'note', 'frequency', 'interval',
+            'start_date', 'until', 'count', 'materialized', 'next_date', 'transactions'
+        ]
+        read_only_fields = ['materialized', 'next_date']
+
+    def validate(self, data):
+        start_date = data.get('start_date', getattr(self.instance, 'start_date', None))
+        until = data.get('until', getattr(self.instance, 'until', None))
+        if start_date and until and until < start_date:
+            raise serializers.ValidationError({'until': 'Must not be before start_date.'})
+        posting_type = data.get(
+            'posting_type',
+            getattr(self.instance, 'posting_type', None)
+        )
+        if posting_type == Postings.TRANSFER:
+            if 'transactions' in data:
+                total = sum(row['amount'] for row in data['transactions'])
+            else:
+                total = self.instance.transactions.aggregate(total=Sum('amount'))['total']
+            if total:
+                raise serializers.ValidationError(
+                    f'Transfer transactions must net to zero, they net to {total}.'
+                )
+        return data
+
+    def create(self, validated_data):
+        transactions = validated_data.pop('transactions')
+        with transaction.atomic():
+            recurring = RecurringPostings.objects.create(**validated_data)
+            RecurringTransactions.objects.bulk_create(
+                RecurringTransactions(recurring=recurring, **row) for row in transactions
+            )
+        return recurring
+
+    def update(self, instance, validated_data):
+        # The transactions given replace all of the template's transactions
+        transactions = validated_data.pop('transactions', None)
+        with transaction.atomic():
+            # materialize may have moved the template on since it was read
+            instance = RecurringPostings.objects.select_for_update().get(pk=instance.pk)
+            instance = super().update(instance, validated_data)
+            if transactions is not None:
+                instance.transactions.all().delete()
+                RecurringTransactions.objects.bulk_create(
+                    RecurringTransactions(recurring=instance, **row)
+                    for row in transactions
+                )
+        return instance
+
+
+class BalanceSerializer(serializers.Serializer):
+    as_of = serializers.DateField(required=False)
+    balance = serializers.DecimalField(max_digits=19, decimal_places=4, read_only=True)
+
+
+class ForecastSerializer(serializers.Serializer):
+    days = serializers.IntegerField(
+        min_value=0,
+        max_value=settings.FUNDS_FORECAST_MAX_DAYS,
+        default=365
+    )
+
+
+class ReconcileSerializer(serializers.Serializer):
+    statement_date = serializers.DateField()
+    statement_balance = serializers.DecimalField(max_digits=19, decimal_places=4)
+    posting_nums = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        write_only=True
+    )
+    cleared_balance = serializers.DecimalField(
+        max_digits=19,
+        decimal_places=4,
+        read_only=True
+    )
+    difference = serializers.DecimalField(max_digits=19, decimal_places=4, read_only=True)
+    cleared = serializers.IntegerField(read_only=True)
+
+
+class UnbalancedPostingSerializer(serializers.Serializer):
+    posting_num = serializers.IntegerField()
+    date = serializers.DateField()
+    payee = serializers.CharField()
+    total = serializers.DecimalField(max_digits=19, decimal_places=4)
+
+
+class SearchSerializer(serializers.Serializer):
+    q = serializers.CharField(max_length=200)
+    page = serializers.IntegerField(min_value=1, default=1)
+    page_size = serializers.IntegerField(
+        min_value=1,
+        max_value=KeysetPagination.max_page_size,
+        default=api_settings.PAGE_SIZE
+    )
+
+
+class SearchResultSerializer(serializers.Serializer):
+    posting_num = serializers.IntegerField()
+    date = serializers.DateField()
+    payee = serializers.CharField()
+    note = serializers.CharField()
+    rank = serializers.FloatField()
+
+
+class PayeeSuggestSerializer(serializers.Serializer):
+    prefix = serializers.CharField(max_length=50, trim_whitespace=False)
+    limit = serializers.IntegerField(min_value=1, max_value=100, default=10)
+
+
+class PayeeSuggestionSerializer(serializers.Serializer):
+    payee = serializers.CharField()
+    count = serializers.IntegerField()
+    categories_id = serializers.IntegerField(allow_null=True)
+    account_id = serializers.IntegerField(allow_null=True)
+
+
+class NetWorthSerializer(serializers.Serializer):
+    interval = serializers.ChoiceField(choices=['day', 'week', 'month'], default='month')
+
+
+class BudgetReportSerializer(serializers.Serializer):
+    # The report ends on the first day of the next year or month,
+    # which must still be a date
+    year = serializers.IntegerField(min_value=1, max_value=9998)
+    month = serializers.IntegerField(min_value=1, max_value=12, required=False)
+
+
+class BudgetReportRowSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    category_name = serializers.CharField()
+    budgeted = serializers.DecimalField(max_digits=19, decimal_places=4)
+    spent = serializers.DecimalField(max_digits=19, decimal_places=4)
+    remaining = serializers.DecimalField(max_digits=19, decimal_places=4)
+
+
+class BulkTransactionSerializer(serializers.Serializer):
+    account_id = serializers.IntegerField(min_value=1, max_value=MAX_ID)
+    categories_id = serializers.IntegerField(min_value=1, max_value=MAX_ID)
+    amount = serializers.DecimalField(max_digits=19, decimal_places=4)
+    note = serializers.CharField(allow_blank=True, default='')
+
+
+class BulkPostingListSerializer(serializers.ListSerializer):
+    """
+    Validates a whole batch of postings with one query per related table
+    """
+
+    def to_internal_value(self, data):
+        attrs = super().to_internal_value(data)
+        posting_nums = {
+            posting['posting_num'] for posting in attrs if 'posting_num' in posting
+        }
+        existing = existing_values(Postings.objects.all(), 'posting_num', posting_nums)
+        rows = [row for posting in attrs for row in posting['transactions']]
+        account_ids = {row['account_id'] for row in rows}
+        category_ids = {row['categories_id'] for row in rows}
+        account_ids -= existing_values(Accounts.objects.all(), 'id', account_ids)
+        category_ids -= existing_values(Categories.objects.all(), 'id', category_ids)
+
+        errors = []
+        seen = set()
+        for posting in attrs:
+            error = {}
+            posting_num = posting.get('posting_num')
+            if posting_num in existing or posting_num in seen:
+                error['posting_num'] = ['postings with this posting num already exists.']
+            if posting_num is not None:
+                seen.add(posting_num)
+            missing_ids = (('account_id', account_ids), ('categories_id', category_ids))
+            transaction_errors = [
+                {
+                    field: [f'Invalid pk "{row[field]}" - object does not exist.']
+                    for field, missing in missing_ids
+                    if row[field] in missing
+                }
+                for row in posting['transactions']
+            ]
+            if any(transaction_errors):
+                error['transactions'] = transaction_errors
+            if posting['posting_type'] == Postings.TRANSFER:
+                total = sum(row['amount'] for row in posting['transactions'])
+                if total:
+                    error[api_settings.NON_FIELD_ERRORS_KEY] = [
+                        f'Transfer transactions must net to zero, they net to {total}.'
+                    ]
+            errors.append(error)
+        if any(errors):
+            raise serializers.ValidationError(errors)
+
+        # Numbered only once the whole batch is valid, so failed requests use up none
+        unnumbered = [posting for posting in attrs if 'posting_num' not in posting]
+        if unnumbered:
+            posting_nums = Postings.objects.allocate(len(unnumbered))
+            for posting, posting_num in zip(unnumbered, posting_nums):
+                posting['posting_num'] = posting_num
+        return attrs
+
+    def create(self, validated_data):
+        batch_size = self.context.get('batch_size') or settings.FUNDS_BULK_BATCH_SIZE
+        postings = []
+        transactions = []
+        for data in validated_data:
+            rows = data.pop('transactions')
+            postings.append(Postings(**data))
+            transactions.extend(
+                Transactions(
+                    posting_num_id=data['posting_num'],
+                    account_id_id=row['account_id'],
+                    categories_id_id=row['categories_id'],
+                    amount=row['amount'],
+                    note=row['note']
+                )
+                for row in rows
+            )
+        Postings.objects.bulk_import(postings, transactions, batch_size)
+        return postings
+
+
+class BulkPostingSerializer(serializers.Serializer):
+    """
+    Posting with nested transactions for the bulk import endpoint
+
+    Related ids are plain integers and are checked for all rows at once by
+    BulkPostingListSerializer, rather than with a query per row. Postings
+    without a posting_num are numbered by the server.
+    """
+    posting_num = serializers.IntegerField(min_value=1, max_value=MAX_ID, required=False)
+    date = serializers.DateField(default=datetime.date.today)
+    posting_type = serializers.ChoiceField(
+        choices=Postings.POST_TYPES,
+        default=Postings.STANDARD
+    )
+    payee = serializers.CharField(max_length=50, allow_blank=True, default='')
+    cleared = serializers.BooleanField(default=False)
+    note = serializers.CharField(allow_blank=True, default='')
+    transactions = BulkTransactionSerializer(many=True)
+
+    class Meta:
+        list_serializer_class = BulkPostingListSerializer
+
+
+class BulkImportSerializer(serializers.Serializer):
+    batch_size = serializers.IntegerField(min_value=1, max_value=10000, required=False)
+
+
+class ReserveSerializer(serializers.Serializer):
+    count = serializers.IntegerField(min_value=1, max_value=10000)
+    ranges = serializers.ListField(child=serializers.DictField(), read_only=True)
+
+
+class ExportSerializer(serializers.Serializer):
+    start = serializers.DateField(required=False)
+    to = serializers.DateField(required=False)
+
+    def get_fields(self):
+        # 'from' is a keyword so it can't be declared as a class attribute
+        fields = super().get_fields()
+        fields['from'] = fields.pop('start')
+        return fields
+
+
+class MonthlyRollupSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = MonthlyRollups
+        fields = ['year', 'month', 'categories_id', 'account_id', 'total', 'count']
+
+
+class MonthlyRollupFilterSerializer(serializers.Serializer):
+    year__gte = serializers.IntegerField(required=False)
+    year__lte = serializers.IntegerField(required=False)
+    categories_id = serializers.IntegerField(required=False)
+    account_id = serializers.IntegerField(required=False)
+
+
+class LongPollSerializer(serializers.Serializer):
+    wait = serializers.IntegerField(
+        min_value=0,
+        max_value=settings.FUNDS_LONG_POLL_MAX_WAIT,
+        default=0
+    )
+
+
+class AsyncListSerializer(LongPollSerializer):
+    after = serializers.IntegerField(required=False)
+    page_size = serializers.IntegerField(
+        min_value=1,
+        max_value=KeysetPagination.max_page_size,
+        default=api_settings.PAGE_SIZE
+    )
+
+
+class PostingFilterSerializer(serializers.Serializer):
+    date__gte = serializers.DateField(required=False)
+    date__lte = serializers.DateField(required=False)
+    payee = serializers.CharField(max_length=50, required=False)
+    cleared = serializers.BooleanField(required=False)
+    posting_type = serializers.ChoiceField(choices=Postings.POST_TYPES, required=False)
+
+
+class TransactionFilterSerializer(serializers.Serializer):
+    account_id = serializers.IntegerField(required=False)
+    categories_id = serializers.IntegerField(required=False)
+    amount__gte = serializers.DecimalField(max_digits=19, decimal_places=4, required=False)
+    amount__lte = serializers.DecimalField(max_digits=19, decimal_places=4, required=False)
+
+
+class BudgetFilterSerializer(serializers.Serializer):
+    year = serializers.IntegerField(required=False)
+    month = serializers.IntegerField(min_value=1, max_value=12, required=False)
@@ -0,0 +1,74 @@
+from django.db.backends.signals import connection_created
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from funds.cache import bump_versions
+from funds.metrics import TRANSACTIONS_INSERTED
+from funds.middleware import install_query_recorder
+from funds.models import (
+    Accounts,
+    Budgets,
+    Categories,
+    Postings,
+    Transactions,
+    posting_payee_changed,
+    postings_imported,
+    transaction_payee_changed,
+)
+from funds.payees import payee_index
+
+
+@receiver(post_save, sender=Accounts)
+@receiver(post_delete, sender=Accounts)
+@receiver(post_save, sender=Categories)
+@receiver(post_delete, sender=Categories)
+@receiver(post_save, sender=Postings)
+@receiver(post_delete, sender=Postings)
+@receiver(post_save, sender=Transactions)
+@receiver(post_delete, sender=Transactions)
+@receiver(post_save, sender=Budgets)
+@receiver(post_delete, sender=Budgets)
+def invalidate_cache(sender, **kwargs):
+    """
+    Invalidate cached representations and list ETags that depend on the written model
+    """
+    bump_versions(sender._meta.model_name)
+
+
+@receiver(post_save, sender=Transactions)
+def count_inserted_transactions(sender, created, **kwargs):
+    # Rolled back inserts aren't counted
+    if created:
+        transaction.on_commit(TRANSACTIONS_INSERTED.inc)
+
+
+@receiver(posting_payee_changed)
+def index_posting_payee(sender, old, new, usage, **kwargs):
+    transaction.on_commit(lambda: payee_index.change_posting(old, new, usage))
+
+
+@receiver(transaction_payee_changed)
+def index_transaction_payee(sender, old, new, **kwargs):
+    transaction.on_commit(lambda: payee_index.change_transaction(old, new))
+
+
+@receiver(postings_imported)
+def index_imported_payees(sender, postings, transactions, **kwargs):
+    def index():
+        payees = {}
+        for posting in postings:
+            payees[posting.posting_num] = posting.payee
+            payee_index.add_posting(posting.payee)
+        for row in transactions:
+            payee_index.add_transaction(
+                payees[row.posting_num_id],
+                row.categories_id_id,
+                row.account_id_id
+            )
+
+    transaction.on_commit(index)
+
+
+# Every connection reports its queries to the request being timed
+connection_created.connect(install_query_recorder)
@@ -0,0 +1,162 @@
+import datetime
+import decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from rest_framework import status
+
+from funds.models import Accounts, Categories, MonthlyRollups, Postings, Transactions
+
+
+class MonthlyRollupsAPITest(APITestCase):
+
+    def setUp(self):
+        self.account = Accounts.objects.create(account_name='Test Checking')
+        self.groceries = Categories.objects.create(category_name='Groceries')
+        self.rent = Categories.objects.create(category_name='Rent')
+        self.january = Postings.objects.create(
+            posting_num=1,
+            date=datetime.date(2021, 1, 15)
+        )
+        self.february = Postings.objects.create(
+            posting_num=2,
+            date=datetime.date(2021, 2, 15)
+        )
+        self.food = self.create_transaction(self.january, self.groceries, '-50')
+        self.create_transaction(self.january, self.groceries, '-25')
+        self.create_transaction(self.february, self.rent, '-1000')
+
+    def create_transaction(self, posting, category, amount):
+        return Transactions.objects.create(
+            posting_num=posting,
+            account_id=self.account,
+            categories_id=category,
+            amount=decimal.Decimal(amount)
+        )
+
+    def assertRollupsCurrent(self):
+        stored = set(
+            MonthlyRollups.objects.exclude(count=0)
+            .values_list('categories_id', 'account_id', 'year', 'month', 'total', 'count')
+        )
+        self.assertEqual(stored, set(MonthlyRollups.objects.recompute()))
+
+    def get_rollups(self, data=None):
+        response = self.client.get(reverse('analytics-monthly-list'), data)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [
+            (
+                row['year'],
+                row['month'],
+                row['categories_id'],
+                decimal.Decimal(row['total']),
+                row['count']
+            )
+            for row in response.data['results']
+        ]
+
+    def test_list_rollups(self):
+        """
+        Verify the rollups sum each category's transactions per month
+        """
+        self.assertEqual(
+            self.get_rollups(),
+            [
+                (2021, 1, self.groceries.id, -75, 2),
+                (2021, 2, self.rent.id, -1000, 1),
+            ]
+        )
+
+    def test_filter_rollups(self):
+        """
+        Verify rollups can be filtered by category and year
+        """
+        self.assertEqual(
+            self.get_rollups({'categories_id': self.rent.id, 'year__gte': 2021}),
+            [(2021, 2, self.rent.id, -1000, 1)]
+        )
+        self.assertEqual(self.get_rollups({'year__lte': 2020}), [])
+
+    def test_update_transaction(self):
+        """
+        Verify changing a transaction's category and amount moves it between rollups
+        """
+        self.food.categories_id = self.rent
+        self.food.amount = decimal.Decimal('-60')
+        self.food.save()
+        self.assertRollupsCurrent()
+
+    def test_delete_transaction(self):
+        """
+        Verify deleting a transaction removes it from its rollup
+        """
+        self.food.delete()
+        self.assertRollupsCurrent()
+
+    def test_update_posting_date(self):
+        """
+        Verify moving a posting to another month moves its transactions between rollups
+        """
+        self.january.date = datetime.date(2021, 2, 1)
+        self.january.save()
+        self.assertRollupsCurrent()
+        self.assertEqual(
+            self.get_rollups({'categories_id': self.groceries.id}),
+            [(2021, 1, self.groceries.id, 0, 0), (2021, 2, self.groceries.id, -75, 2)]
+        )
+
+    def test_bulk_import(self):
+        """
+        Verify bulk imported transactions are added to the rollups
+        """
+        postings = [Postings(posting_num=3, date=datetime.date(2021, 2, 20))]
+        transactions = [
+            Transactions(
+                posting_num_id=3,
+                account_id_id=self.account.id,
+                categories_id_id=self.rent.id,
+                amount=-10
+            )
+        ]
+        Postings.objects.bulk_import(postings, transactions)
+        self.assertRollupsCurrent()
+
+    def test_apply_many_query_count(self):
+        """
+        Verify rollups are upserted with the same number of queries for any number of keys
+        """
+        def apply_many(months):
+            deltas = {
+                (category.id, self.account.id, 2021, month): (decimal.Decimal('-1.5'), 1)
+                for category in (self.groceries, self.rent)
+                for month in months
+            }
+            with CaptureQueriesContext(connection) as queries:
+                MonthlyRollups.objects.apply_many(deltas)
+            return len(queries)
+
+        self.assertEqual(apply_many([1]), apply_many(range(1, 13)))
+        self.assertEqual(
+            MonthlyRollups.objects.get(
+                categories_id=self.groceries,
+                year=2021,
+                month=1
+            ).total,
+            decimal.Decimal('-78')
+        )
+        self.assertEqual(
+            MonthlyRollups.objects.get(categories_id=self.rent, year=2021, month=12).count,
+            1
+        )
+
+    def test_rebuild_command(self):
+        """
+        Verify the rebuild command restores rollups from the transactions
+        """
+        MonthlyRollups.objects.all().delete()
+        call_command('rebuild_rollups', stdout=StringIO())
+        self.assertRollupsCurrent()
@@ -0,0 +1,152 @@
+import asyncio
+import datetime
+import json
+import time
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.test import AsyncClient, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from funds.models import Accounts, Categories, Postings, Transactions
+
+
+@override_settings(FUNDS_LONG_POLL_INTERVAL=0.05)
+class AsyncViewsTest(TransactionTestCase):
+    # The Django 3.1 AsyncClient ignores data for GET requests and takes
+    # headers by their HTTP name, so query strings are put in the paths.
+    # The queries run on other threads, which only see committed rows.
+
+    def setUp(self):
+        self.client = AsyncClient()
+        self.account = Accounts.objects.create(account_name='Test Checking')
+        self.category = Categories.objects.create(category_name='Test Category')
+        for num in range(1, 6):
+            self.create_posting(num, cleared=num % 2 == 0)
+
+    def create_posting(self, num, cleared=False):
+        posting = Postings.objects.create(
+            posting_num=num,
+            date=datetime.date(2021, 1, num),
+            cleared=cleared
+        )
+        Transactions.objects.create(
+            posting_num=posting,
+            account_id=self.account,
+            categories_id=self.category,
+            amount=10
+        )
+
+    async def test_list_pages(self):
+        """
+        Verify async lists are rows of the compact fields paged by ?after=
+        """
+        response = await self.client.get(reverse('async-postings') + '?page_size=2')
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content)
+        self.assertEqual(data['columns'][0], 'posting_num')
+        self.assertEqual([row[0] for row in data['results']], [1, 2])
+        self.assertTrue(data['next'].endswith('?page_size=2&after=2'))
+
+        response = await self.client.get(
+            reverse('async-postings') + '?page_size=2&after=4'
+        )
+        data = json.loads(response.content)
+        self.assertEqual([row[0] for row in data['results']], [5])
+        self.assertIsNone(data['next'])
+
+    async def test_list_filters(self):
+        """
+        Verify async lists take the filters of the sync lists
+        """
+        response = await self.client.get(reverse('async-postings') + '?cleared=true')
+        data = json.loads(response.content)
+        self.assertEqual([row[0] for row in data['results']], [2, 4])
+
+        response = await self.client.get(
+            reverse('async-transactions') + f'?account_id={self.account.id + 1}'
+        )
+        self.assertEqual(json.loads(response.content)['results'], [])
+
+    async def test_bad_params(self):
+        """
+        Verify invalid parameters and methods are rejected
+        """
+        response = await self.client.get(
+            reverse('async-postings') + '?page_size=0&cleared=maybe'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(json.loads(response.content)), {'page_size', 'cleared'})
+        response = await self.client.get(reverse('async-transactions') + '?wait=3600')
+        self.assertEqual(response.status_code, 400)
+        response = await self.client.post(reverse('async-transactions'))
+        self.assertEqual(response.status_code, 405)
+
+    async def test_balance(self):
+        """
+        Verify the async balance of an account, and 404 for a missing account
+        """
+        response = await self.client.get(
+            reverse('async-accounts-balance', args=[self.account.id]) + '?as_of=2021-01-03'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            json.loads(response.content),
+            {'as_of': '2021-01-03', 'balance': '30.0000'}
+        )
+        response = await self.client.get(
+            reverse('async-accounts-balance', args=[self.account.id + 1])
+        )
+        self.assertEqual(response.status_code, 404)
+
+    async def test_long_poll_timeout(self):
+        """
+        Verify a long poll with a current ETag gets a 304 once the wait runs out
+        """
+        path = reverse('async-transactions') + '?wait=1'
+        etag = (await self.client.get(path))['ETag']
+        started = time.monotonic()
+        response = await self.client.get(path, **{'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertGreaterEqual(time.monotonic() - started, 1)
+
+    async def test_long_poll_write(self):
+        """
+        Verify a long poll returns as soon as a write changes the ETag
+        """
+        path = reverse('async-postings') + '?wait=30'
+        etag = (await self.client.get(path))['ETag']
+        started = time.monotonic()
+        poll = asyncio.ensure_future(self.client.get(path, **{'If-None-Match': etag}))
+        await asyncio.sleep(0.1)
+        self.assertFalse(poll.done())
+        await sync_to_async(self.create_posting)(6)
+        response = await poll
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(json.loads(response.content)['results'][-1][0], 6)
+        self.assertLess(time.monotonic() - started, 5)
+
+    async def test_long_poll_off_event_loop(self):
+        """
+        Verify the cache versions are read without blocking the event loop
+        """
+        def slow_etag(request, names):
+            time.sleep(0.5)
+            return '"slow"'
+
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.05)
+                ticks += 1
+
+        ticker = asyncio.ensure_future(tick())
+        with mock.patch('funds.async_views.get_list_etag', slow_etag):
+            response = await self.client.get(reverse('async-postings'))
+        ticker.cancel()
+        self.assertEqual(response['ETag'], '"slow"')
+        self.assertGreaterEqual(ticks, 5)
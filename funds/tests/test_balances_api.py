@@ -0,0 +1,167 @@
+import datetime
+import decimal
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+from unittest import skipUnless
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection, connections
+from django.test import TransactionTestCase
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from rest_framework import status
+
+from funds.models import Accounts, Balances, Categories, Postings, Transactions
+
+
+class BalancesAPITest(APITestCase):
+
+    def setUp(self):
+        self.checking = Accounts.objects.create(
+            account_name='Test Checking',
+            account_type=Accounts.CHECKING
+        )
+        self.savings = Accounts.objects.create(
+            account_name='Test Savings',
+            account_type=Accounts.SAVINGS
+        )
+        self.category = Categories.objects.create(category_name='Test Category')
+        self.first = Postings.objects.create(posting_num=1, date=datetime.date(2021, 1, 1))
+        self.second = Postings.objects.create(
+            posting_num=2,
+            date=datetime.date(2021, 1, 10)
+        )
+        self.deposit = self.create_transaction(self.first, self.checking, '100.00')
+        self.withdrawal = self.create_transaction(self.second, self.checking, '-30.00')
+        self.transfer = self.create_transaction(self.second, self.savings, '30.00')
+
+    def create_transaction(self, posting, account, amount):
+        return Transactions.objects.create(
+            posting_num=posting,
+            account_id=account,
+            categories_id=self.category,
+            amount=decimal.Decimal(amount)
+        )
+
+    def get_balance(self, account, as_of=None):
+        url = reverse('accounts-balance', args=[account.id])
+        data = {'as_of': as_of} if as_of else {}
+        response = self.client.get(url, data)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return decimal.Decimal(response.data['balance'])
+
+    def test_balance_field(self):
+        """
+        Verify accounts include their current balance
+        """
+        url = reverse('accounts-detail', args=[self.checking.id])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(decimal.Decimal(response.data['balance']), decimal.Decimal('70'))
+
+        response = self.client.get(reverse('accounts-list'))
+        balances = {
+            account['id']: decimal.Decimal(account['balance'])
+            for account in response.data['results']
+        }
+        self.assertEqual(balances, {self.checking.id: 70, self.savings.id: 30})
+
+    def test_balance_as_of(self):
+        """
+        Verify the balance endpoint only includes transactions up to the as_of date
+        """
+        self.assertEqual(self.get_balance(self.checking), 70)
+        self.assertEqual(self.get_balance(self.checking, '2020-12-31'), 0)
+        self.assertEqual(self.get_balance(self.checking, '2021-01-05'), 100)
+        self.assertEqual(self.get_balance(self.checking, '2021-01-10'), 70)
+
+    def test_balance_as_of_invalid(self):
+        """
+        Verify an invalid as_of date gets a 400 error
+        """
+        url = reverse('accounts-balance', args=[self.checking.id])
+        response = self.client.get(url, {'as_of': 'yesterday'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_update_transaction(self):
+        """
+        Verify changing a transaction's amount and account moves the balance
+        """
+        self.withdrawal.amount = decimal.Decimal('-50.00')
+        self.withdrawal.account_id = self.savings
+        self.withdrawal.save()
+        self.assertEqual(self.get_balance(self.checking), 100)
+        self.assertEqual(self.get_balance(self.savings), -20)
+        self.assertEqual(Balances.objects.verify(), [])
+
+    def test_delete_transaction(self):
+        """
+        Verify deleting a transaction removes it from the balance
+        """
+        self.deposit.delete()
+        self.assertEqual(self.get_balance(self.checking), -30)
+        self.assertEqual(self.get_balance(self.checking, '2021-01-05'), 0)
+        self.assertEqual(Balances.objects.verify(), [])
+
+    def test_update_posting_date(self):
+        """
+        Verify moving a posting to another date moves its transactions in the ledger
+        """
+        url = reverse('postings-detail', args=[self.second.posting_num])
+        response = self.client.patch(url, {'date': '2020-12-25'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.get_balance(self.checking, '2020-12-31'), -30)
+        self.assertEqual(self.get_balance(self.savings, '2020-12-31'), 30)
+        self.assertEqual(self.get_balance(self.checking), 70)
+        self.assertEqual(Balances.objects.verify(), [])
+
+    def test_rebuild_command(self):
+        """
+        Verify the rebuild command repairs a ledger that has drifted
+        """
+        Balances.objects.filter(account_id=self.checking).update(balance=0)
+        with self.assertRaises(CommandError):
+            call_command(
+                'rebuild_balances',
+                '--check',
+                stdout=StringIO(),
+                stderr=StringIO()
+            )
+        out = StringIO()
+        call_command('rebuild_balances', stdout=out)
+        self.assertIn('matches', out.getvalue())
+        self.assertEqual(self.get_balance(self.checking), 70)
+
+
+@skipUnless(
+    connection.vendor == 'postgresql',
+    'SQLite runs one write transaction at a time'
+)
+class ConcurrentPostingDateTest(TransactionTestCase):
+
+    def test_concurrent_date_moves(self):
+        """
+        Verify concurrent moves of the same posting's date each move its amounts once
+        """
+        account = Accounts.objects.create(account_name='Test Checking')
+        category = Categories.objects.create(category_name='Test Category')
+        posting = Postings.objects.create(posting_num=1, date=datetime.date(2021, 1, 1))
+        Transactions.objects.create(
+            posting_num=posting,
+            account_id=account,
+            categories_id=category,
+            amount=decimal.Decimal('-10.00')
+        )
+
+        def move(day):
+            try:
+                stale = Postings.objects.get(pk=1)
+                stale.date = datetime.date(2021, 2, day)
+                stale.save()
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            list(executor.map(move, range(1, 9)))
+        self.assertEqual(Balances.objects.verify(), [])
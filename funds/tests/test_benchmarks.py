@@ -0,0 +1,201 @@
+import json
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from django.core.management import call_command
+from django.db.models import Sum
+from django.test import TestCase, TransactionTestCase
+
+from funds.benchmarks import CONCURRENCY_SCENARIOS, SCENARIOS, memory_tracer, percentile
+from funds.models import Accounts, Balances, MonthlyRollups, Postings, Transactions
+
+
+class SeedLedgerTest(TestCase):
+
+    def seed(self, *args):
+        call_command(
+            'seed_ledger',
+            '--accounts=3',
+            '--categories=5',
+            '--postings=300',
+            '--years=1',
+            '--batch-size=100',
+            *args,
+            stdout=StringIO()
+        )
+
+    def test_seed_ledger(self):
+        """
+        Verify seeding creates the postings with a consistent ledger and rollups
+        """
+        self.seed()
+        self.assertEqual(Accounts.objects.count(), 3)
+        self.assertEqual(Postings.objects.count(), 300)
+        self.assertGreaterEqual(Transactions.objects.count(), 300)
+        transfers = Transactions.objects.filter(
+            posting_num__posting_type=Postings.TRANSFER
+        )
+        self.assertEqual(transfers.aggregate(total=Sum('amount'))['total'] or 0, 0)
+        for account in Accounts.objects.all():
+            total = account.transactions_set.aggregate(total=Sum('amount'))['total']
+            self.assertAlmostEqual(Balances.objects.as_of(account.pk), total, places=2)
+        rollups = MonthlyRollups.objects.aggregate(count=Sum('count'))
+        self.assertEqual(rollups['count'], Transactions.objects.count())
+
+    def test_seed_ledger_again(self):
+        """
+        Verify seeding again reuses the accounts and appends new postings
+        """
+        self.seed()
+        self.seed()
+        self.assertEqual(Accounts.objects.count(), 3)
+        self.assertEqual(Postings.objects.count(), 600)
+
+
+class BenchmarkTest(TestCase):
+
+    def test_percentile(self):
+        """
+        Verify percentiles interpolate between the closest ranks
+        """
+        self.assertEqual(percentile([4, 1, 3, 2], 0.5), 2.5)
+        self.assertEqual(percentile([1, 2, 3, 4, 5], 0.95), 4.8)
+        self.assertEqual(percentile([7], 0.95), 7)
+
+    def test_memory_tracer(self):
+        """
+        Verify the peak memory only counts what is allocated inside the block
+        """
+        with memory_tracer({}) as large:
+            temporary = bytearray(2 << 20)
+            del temporary
+        with memory_tracer({}) as small:
+            temporary = bytearray(64 << 10)
+            del temporary
+        self.assertGreaterEqual(large['peak_memory_kb'], 2 << 10)
+        self.assertLess(small['peak_memory_kb'], 1 << 10)
+
+    def test_benchmark(self):
+        """
+        Verify every scenario runs without errors and the results are written as JSON
+        """
+        call_command(
+            'seed_ledger',
+            '--accounts=2',
+            '--categories=3',
+            '--postings=50',
+            '--years=1',
+            stdout=StringIO()
+        )
+        postings = Postings.objects.count()
+        with tempfile.TemporaryDirectory() as directory:
+            output = Path(directory) / 'results.json'
+            call_command(
+                'benchmark',
+                '--host=testserver',
+                '--requests=2',
+                '--warmup=1',
+                f'--output={output}',
+                stdout=StringIO()
+            )
+            results = json.loads(output.read_text())
+            # Comparing against its own results shows no change
+            out = StringIO()
+            call_command(
+                'benchmark',
+                '--host=testserver',
+                '--requests=2',
+                '--warmup=0',
+                '--scenario=postings-list',
+                f'--output={output}',
+                f'--compare={output}',
+                stdout=out
+            )
+            self.assertIn('p50', out.getvalue())
+
+        self.assertEqual(results['postings'], postings)
+        self.assertEqual(set(results['scenarios']), set(SCENARIOS))
+        for name, result in results['scenarios'].items():
+            self.assertEqual(result['errors'], 0, name)
+            self.assertGreater(result['latency_ms']['p95'], 0)
+            self.assertGreater(result['peak_memory_kb'], 0)
+            # Payee suggestions are answered from memory once the index is loaded
+            if name != 'payees-suggest':
+                self.assertGreaterEqual(result['queries']['max'], 1)
+        # The write scenarios are rolled back
+        self.assertEqual(Postings.objects.count(), postings)
+
+
+class BenchmarkASGITest(TransactionTestCase):
+    # Committed, the WSGI handler reads the ledger from other threads
+
+    def test_benchmark_asgi(self):
+        """
+        Verify the sync and async views are benchmarked without errors
+
+        The long polls all get a 304.
+        """
+        call_command(
+            'seed_ledger',
+            '--accounts=2',
+            '--categories=3',
+            '--postings=50',
+            '--years=1',
+            stdout=StringIO()
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            output = Path(directory) / 'results.json'
+            call_command(
+                'benchmark_asgi',
+                '--host=testserver',
+                '--clients=3',
+                '--requests=2',
+                '--threads=2',
+                '--long-poll-clients=5',
+                '--wait=1',
+                f'--output={output}',
+                stdout=StringIO()
+            )
+            results = json.loads(output.read_text())
+
+        self.assertEqual(set(results['scenarios']), set(CONCURRENCY_SCENARIOS))
+        for name, result in results['scenarios'].items():
+            for server in ('wsgi', 'asgi'):
+                self.assertEqual(result[server]['requests'], 6)
+                self.assertEqual(result[server]['errors'], 0, f'{name} {server}')
+        self.assertEqual(results['long_poll']['not_modified'], 5)
+        self.assertGreaterEqual(results['long_poll']['elapsed_sec'], 1)
+
+    def test_benchmark_connections(self):
+        """
+        Verify persistent connections are opened once per thread, not once per request
+        """
+        call_command(
+            'seed_ledger',
+            '--accounts=2',
+            '--categories=3',
+            '--postings=20',
+            '--years=1',
+            stdout=StringIO()
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            output = Path(directory) / 'results.json'
+            call_command(
+                'benchmark_connections',
+                '--host=testserver',
+                '--threads=2',
+                '--requests=5',
+                f'--output={output}',
+                stdout=StringIO()
+            )
+            results = json.loads(output.read_text())
+
+        for mode, result in results['modes'].items():
+            self.assertEqual(result['requests'], 10)
+            self.assertEqual(result['errors'], 0, mode)
+        self.assertLessEqual(results['modes']['persistent']['opened'], 2)
+        self.assertLessEqual(
+            results['modes']['persistent']['opened'],
+            results['modes']['per-request']['opened']
+        )
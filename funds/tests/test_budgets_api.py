@@ -0,0 +1,104 @@
+import datetime
+import decimal
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from rest_framework import status
+
+from funds.models import Accounts, Budgets, Categories, Postings, Transactions
+
+
+class BudgetReportAPITest(APITestCase):
+
+    def setUp(self):
+        account = Accounts.objects.create(account_name='Test Checking')
+        self.groceries = Categories.objects.create(category_name='Groceries')
+        self.rent = Categories.objects.create(category_name='Rent')
+        Budgets.objects.create(
+            year=2021,
+            month=1,
+            categories_id=self.groceries,
+            amount=400
+        )
+        Budgets.objects.create(
+            year=2021,
+            month=2,
+            categories_id=self.groceries,
+            amount=300
+        )
+        Budgets.objects.create(year=2021, month=1, categories_id=self.rent, amount=1000)
+        dates = [
+            datetime.date(2020, 12, 31),
+            datetime.date(2021, 1, 1),
+            datetime.date(2021, 1, 31),
+            datetime.date(2021, 2, 1),
+        ]
+        for num, date in enumerate(dates, start=1):
+            posting = Postings.objects.create(posting_num=num, date=date)
+            Transactions.objects.create(
+                posting_num=posting,
+                account_id=account,
+                categories_id=self.groceries,
+                amount=-100 * num
+            )
+
+    def get_report(self, data):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('budgets-report'), data)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(context.captured_queries), 1)
+        return {
+            row['category_name']: (
+                decimal.Decimal(row['budgeted']),
+                decimal.Decimal(row['spent']),
+                decimal.Decimal(row['remaining'])
+            )
+            for row in response.data['results']
+        }
+
+    def test_month_report(self):
+        """
+        Verify the report only counts budgets and transactions in the month
+        """
+        report = self.get_report({'year': 2021, 'month': 1})
+        self.assertEqual(report['Groceries'], (400, 500, -100))
+        self.assertEqual(report['Rent'], (1000, 0, 1000))
+
+    def test_year_report(self):
+        """
+        Verify leaving out the month reports on the whole year
+        """
+        report = self.get_report({'year': 2021})
+        self.assertEqual(report['Groceries'], (700, 900, -200))
+        self.assertEqual(report['Rent'], (1000, 0, 1000))
+
+    def test_december_report(self):
+        """
+        Verify a December report ends at the new year
+        """
+        report = self.get_report({'year': 2020, 'month': 12})
+        self.assertEqual(report['Groceries'], (0, 100, -100))
+
+    def test_report_invalid_month(self):
+        """
+        Verify an out of range month gets a 400 error
+        """
+        response = self.client.get(reverse('budgets-report'), {'year': 2021, 'month': 13})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_report_invalid_year(self):
+        """
+        Verify a year without dates for the whole report gets a 400 error
+        """
+        for params in [{'year': 0}, {'year': 10000}, {'year': 9999, 'month': 12}]:
+            response = self.client.get(reverse('budgets-report'), params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_report_missing_year(self):
+        """
+        Verify the year is required
+        """
+        response = self.client.get(reverse('budgets-report'))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,130 @@
+import datetime
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import SimpleTestCase
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from rest_framework import status
+
+from funds.checks import check_shared_cache
+from funds.models import Accounts, Categories, Postings, Transactions
+
+
+class CacheAPITest(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.account = Accounts.objects.create(account_name='Test Checking')
+        self.category = Categories.objects.create(category_name='Test Category')
+        posting = Postings.objects.create(posting_num=1, date=datetime.date(2021, 1, 1))
+        Transactions.objects.create(
+            posting_num=posting,
+            account_id=self.account,
+            categories_id=self.category,
+            amount=10
+        )
+
+    def test_not_modified(self):
+        """
+        Verify a list request with a current ETag gets a 304 without querying the database
+        """
+        url = reverse('postings-list')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_etag_depends_on_query(self):
+        """
+        Verify different query parameters get different ETags
+        """
+        url = reverse('postings-list')
+        first = self.client.get(url)
+        second = self.client.get(url, {'payee': 'Store'})
+        self.assertNotEqual(first['ETag'], second['ETag'])
+
+    def test_write_changes_etag(self):
+        """
+        Verify writing a row the list depends on changes its ETag
+        """
+        url = reverse('transactions-list')
+        etag = self.client.get(url)['ETag']
+        self.client.patch(
+            reverse('categories-detail', args=[self.category.id]),
+            {'category_name': 'Groceries'},
+            format='json'
+        )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_bulk_import_changes_etag(self):
+        """
+        Verify bulk imports, which skip model signals, change the ETag
+        """
+        url = reverse('postings-list')
+        etag = self.client.get(url)['ETag']
+        Postings.objects.bulk_import([Postings(posting_num=2)], [])
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_nested_rows_served_from_cache(self):
+        """
+        Verify nested accounts and categories aren't queried once cached
+        """
+        url = reverse('transactions-list')
+        self.client.get(url)
+        # One query for the page of transactions only
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        transaction = response.data['results'][0]
+        self.assertEqual(transaction['account_id']['account_name'], 'Test Checking')
+        self.assertEqual(transaction['categories_id']['category_name'], 'Test Category')
+
+    def test_nested_rows_invalidated(self):
+        """
+        Verify renaming an account updates the nested representation
+        """
+        url = reverse('transactions-list')
+        self.client.get(url)
+        self.account.account_name = 'Renamed'
+        self.account.save()
+        response = self.client.get(url)
+        account = response.data['results'][0]['account_id']
+        self.assertEqual(account['account_name'], 'Renamed')
+
+    def test_rebuild_changes_etag(self):
+        """
+        Verify rebuilding the balances and rollups changes the ETags
+
+        The rebuilds skip the model signals that normally change them.
+        """
+        for url, command in [
+            (reverse('accounts-list'), 'rebuild_balances'),
+            (reverse('analytics-monthly-list'), 'rebuild_rollups'),
+        ]:
+            etag = self.client.get(url)['ETag']
+            call_command(command, stdout=StringIO())
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class SharedCacheCheckTest(SimpleTestCase):
+
+    def test_process_local_cache(self):
+        """
+        Verify the deploy checks require a cache shared by the worker processes
+        """
+        backends = 'django.core.cache.backends'
+        local = {'default': {'BACKEND': f'{backends}.locmem.LocMemCache'}}
+        shared = {'default': {'BACKEND': f'{backends}.memcached.PyLibMCCache'}}
+        with self.settings(CACHES=local):
+            errors = check_shared_cache(None)
+            self.assertEqual([error.id for error in errors], ['funds.E001'])
+        with self.settings(CACHES=shared):
+            self.assertEqual(check_shared_cache(None), [])
@@ -0,0 +1,121 @@
+import datetime
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from rest_framework import status
+
+from funds.models import Accounts, Categories, Postings, Transactions
+
+
+class CompactAPITest(APITestCase):
+
+    def setUp(self):
+        self.account = Accounts.objects.create(account_name='Test Checking')
+        self.category = Categories.objects.create(category_name='Test Category')
+        postings = Postings.objects.bulk_create(
+            Postings(posting_num=num, date=datetime.date(2021, 1, 1), payee='Store')
+            for num in range(1, 101)
+        )
+        Transactions.objects.bulk_create(
+            Transactions(
+                posting_num=posting,
+                account_id=self.account,
+                categories_id=self.category,
+                amount=amount
+            )
+            for posting in postings
+            for amount in ('12.50', '-12.50')
+        )
+
+    def test_compact_query_param(self):
+        """
+        Verify ?view=compact returns rows of values with integer foreign keys
+        """
+        response = self.client.get(
+            reverse('transactions-list'),
+            {'view': 'compact', 'page_size': 2}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/vnd.funds.compact+json')
+        data = response.json()
+        self.assertEqual(
+            data['columns'],
+            ['id', 'posting_num', 'account_id', 'categories_id', 'amount', 'note']
+        )
+        first = Transactions.objects.order_by('id').first()
+        self.assertEqual(
+            data['results'][0],
+            [first.id, 1, self.account.id, self.category.id, '12.5000', '']
+        )
+        self.assertIsNotNone(data['next'])
+
+    def test_compact_accept_header(self):
+        """
+        Verify the compact media type in the Accept header selects the compact rows
+        """
+        response = self.client.get(
+            reverse('postings-list'),
+            HTTP_ACCEPT='application/vnd.funds.compact+json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual(data['columns'][-1], 'transactions')
+        self.assertEqual(data['nested_columns'], {
+            'transactions': ['id', 'account_id', 'categories_id', 'amount', 'note']
+        })
+        first, second = Transactions.objects.filter(posting_num=1).order_by('id')
+        self.assertEqual(data['results'][0], [
+            1, '2021-01-01', Postings.STANDARD, 'Store', False, '',
+            [
+                [first.id, self.account.id, self.category.id, '12.5000', ''],
+                [second.id, self.account.id, self.category.id, '-12.5000', ''],
+            ]
+        ])
+
+    def test_compact_only_lists(self):
+        """
+        Verify only list endpoints offer the compact media type
+        """
+        response = self.client.get(
+            reverse('postings-detail', args=[1]),
+            HTTP_ACCEPT='application/vnd.funds.compact+json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_406_NOT_ACCEPTABLE)
+        response = self.client.get(reverse('postings-detail', args=[1]))
+        self.assertEqual(response['Content-Type'], 'application/json')
+
+    def test_compact_pages_and_filters(self):
+        """
+        Verify compact lists are filtered and paged like the full representation
+        """
+        url = reverse('postings-list') + '?view=compact&page_size=30&date__gte=2021-01-01'
+        posting_nums = []
+        while url:
+            data = self.client.get(url).json()
+            posting_nums.extend(row[0] for row in data['results'])
+            url = data['next']
+        self.assertEqual(posting_nums, list(range(1, 101)))
+
+    def test_compact_payload_size(self):
+        """
+        Verify the compact representation is at least five times smaller
+        """
+        url = reverse('transactions-list') + '?page_size=200'
+        full = self.client.get(url)
+        compact = self.client.get(url + '&view=compact')
+        self.assertGreaterEqual(len(full.content), 5 * len(compact.content))
+
+    def test_compact_query_count(self):
+        """
+        Verify a compact page of postings takes the same queries however many it lists
+        """
+        url = reverse('postings-list') + '?view=compact&page_size='
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(url + '5')
+        with CaptureQueriesContext(connection) as large:
+            self.client.get(url + '100')
+        # The page, then the transactions of all its postings in one query
+        self.assertEqual(len(large), len(small))
+        self.assertEqual(len(large), 2)
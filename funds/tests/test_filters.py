@@ -0,0 +1,125 @@
+import datetime
+
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from rest_framework import status
+
+from funds.models import Accounts, Budgets, Categories, Postings, Transactions
+
+
+class FilterAPITest(APITestCase):
+
+    def setUp(self):
+        self.checking = Accounts.objects.create(account_name='Test Checking')
+        self.savings = Accounts.objects.create(account_name='Test Savings')
+        self.groceries = Categories.objects.create(category_name='Groceries')
+        self.rent = Categories.objects.create(category_name='Rent')
+        rows = [
+            (1, 'Grocer', False, Postings.STANDARD, self.checking, self.groceries, -40),
+            (2, 'Landlord', True, Postings.STANDARD, self.checking, self.rent, -900),
+            (3, 'Bank', True, Postings.TRANSFER, self.savings, self.rent, 200),
+            (4, 'Grocer', True, Postings.STANDARD, self.savings, self.groceries, -60),
+        ]
+        for num, payee, cleared, posting_type, account, category, amount in rows:
+            # Posting n is dated January n
+            posting = Postings.objects.create(
+                posting_num=num,
+                date=datetime.date(2021, 1, num),
+                payee=payee,
+                cleared=cleared,
+                posting_type=posting_type
+            )
+            Transactions.objects.create(
+                posting_num=posting,
+                account_id=account,
+                categories_id=category,
+                amount=amount
+            )
+        for month in (1, 2):
+            Budgets.objects.create(
+                year=2021,
+                month=month,
+                categories_id=self.groceries,
+                amount=100
+            )
+
+    def get_results(self, name, data):
+        response = self.client.get(reverse(name), data)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data['results']
+
+    def get_posting_nums(self, data):
+        postings = self.get_results('postings-list', data)
+        return [posting['posting_num'] for posting in postings]
+
+    def test_filter_postings_by_date(self):
+        """
+        Verify postings can be filtered by a date range
+        """
+        self.assertEqual(
+            self.get_posting_nums({'date__gte': '2021-01-02', 'date__lte': '2021-01-03'}),
+            [2, 3]
+        )
+
+    def test_filter_postings_by_fields(self):
+        """
+        Verify postings can be filtered by payee, cleared and posting_type
+        """
+        self.assertEqual(self.get_posting_nums({'payee': 'Grocer'}), [1, 4])
+        self.assertEqual(self.get_posting_nums({'cleared': 'false'}), [1])
+        self.assertEqual(self.get_posting_nums({'cleared': 'true'}), [2, 3, 4])
+        self.assertEqual(self.get_posting_nums({'posting_type': Postings.TRANSFER}), [3])
+
+    def test_filter_postings_invalid(self):
+        """
+        Verify an invalid filter value gets a 400 error
+        """
+        response = self.client.get(reverse('postings-list'), {'date__gte': 'soon'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(reverse('postings-list'), {'posting_type': 'Invalid'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_order_postings(self):
+        """
+        Verify postings can be ordered by a whitelisted field and paged through
+        """
+        url = reverse('postings-list') + '?ordering=-payee&page_size=1'
+        posting_nums = []
+        while url:
+            response = self.client.get(url)
+            posting_nums.extend(
+                posting['posting_num'] for posting in response.data['results']
+            )
+            url = response.data['next']
+        self.assertEqual(posting_nums, [2, 4, 1, 3])
+
+    def test_order_postings_not_whitelisted(self):
+        """
+        Verify ordering by a field that isn't whitelisted keeps the default order
+        """
+        self.assertEqual(self.get_posting_nums({'ordering': 'note'}), [1, 2, 3, 4])
+
+    def test_filter_transactions(self):
+        """
+        Verify transactions can be filtered by account, category and amount range
+        """
+        def amounts(data):
+            return [
+                float(transaction['amount'])
+                for transaction in self.get_results('transactions-list', data)
+            ]
+
+        self.assertEqual(amounts({'account_id': self.savings.id}), [200, -60])
+        self.assertEqual(amounts({'categories_id': self.rent.id}), [-900, 200])
+        self.assertEqual(amounts({'amount__gte': -100, 'amount__lte': 0}), [-40, -60])
+        self.assertEqual(amounts({'ordering': 'amount'}), [-900, -60, -40, 200])
+
+    def test_filter_budgets(self):
+        """
+        Verify budgets can be filtered by year and month
+        """
+        budgets = self.get_results('budgets-list', {'year': 2021, 'month': 2})
+        self.assertEqual(
+            [(budget['year'], budget['month']) for budget in budgets],
+            [(2021, 2)]
+        )
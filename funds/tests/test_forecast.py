@@ -0,0 +1,129 @@
+import datetime
+import decimal
+
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from rest_framework import status
+
+from funds.forecast import forecast
+from funds.models import (
+    Accounts,
+    Budgets,
+    Categories,
+    Postings,
+    RecurringPostings,
+    RecurringTransactions,
+    Transactions
+)
+
+
+class ForecastTest(APITestCase):
+
+    def setUp(self):
+        self.checking = Accounts.objects.create(account_name='Test Checking')
+        self.card = Accounts.objects.create(account_name='Test Card')
+        self.salary = Categories.objects.create(category_name='Salary')
+        self.groceries = Categories.objects.create(category_name='Groceries')
+        self.rent = Categories.objects.create(category_name='Rent')
+        self.create_posting(
+            1, datetime.date(2021, 1, 5), self.checking, self.salary, '3000.00'
+        )
+        self.create_posting(
+            2, datetime.date(2021, 2, 10), self.checking, self.groceries, '-300.00'
+        )
+        self.create_posting(
+            3, datetime.date(2021, 2, 12), self.card, self.groceries, '-100.00'
+        )
+        # Dated after the forecast starts
+        self.create_posting(
+            4, datetime.date(2021, 3, 5), self.checking, self.groceries, '-50.00'
+        )
+        Budgets.objects.create(
+            year=2021,
+            month=3,
+            categories_id=self.groceries,
+            amount=400
+        )
+        rent = RecurringPostings.objects.create(
+            payee='Landlord',
+            start_date=datetime.date(2021, 3, 15)
+        )
+        RecurringTransactions.objects.create(
+            recurring=rent,
+            account_id=self.checking,
+            categories_id=self.rent,
+            amount=decimal.Decimal('-1000.00')
+        )
+
+    def create_posting(self, num, date, account, category, amount):
+        posting = Postings.objects.create(posting_num=num, date=date)
+        Transactions.objects.create(
+            posting_num=posting,
+            account_id=account,
+            categories_id=category,
+            amount=decimal.Decimal(amount)
+        )
+
+    def test_forecast(self):
+        """
+        Verify scheduled, recurring and budgeted amounts are projected onto their days
+        """
+        points = dict(forecast(self.checking.id, 45, start=datetime.date(2021, 3, 1)))
+        self.assertEqual(len(points), 46)
+        self.assertEqual(points[datetime.date(2021, 3, 1)], decimal.Decimal('2700.00'))
+        # 3/4 of the groceries budget is spent from checking over the 30 days left in
+        # March, less the 50 already scheduled
+        march = decimal.Decimal('300.00') * 30 / 31 - 50
+        self.assertAlmostEqual(
+            points[datetime.date(2021, 3, 4)],
+            decimal.Decimal('2700.00') - march * 3 / 30,
+            places=3
+        )
+        self.assertAlmostEqual(
+            points[datetime.date(2021, 3, 31)],
+            decimal.Decimal('2700.00') - 50 - 1000 - march,
+            places=3
+        )
+        # April has no budget and uses the average one, rent recurs on the 15th
+        self.assertAlmostEqual(
+            points[datetime.date(2021, 4, 14)],
+            points[datetime.date(2021, 3, 31)] - 140,
+            places=3
+        )
+        self.assertAlmostEqual(
+            points[datetime.date(2021, 4, 15)],
+            points[datetime.date(2021, 3, 31)] - 150 - 1000,
+            places=3
+        )
+
+    def test_forecast_inflows(self):
+        """
+        Verify a scheduled refund is added without reducing the budgeted spending
+        """
+        self.create_posting(
+            5, datetime.date(2021, 3, 6), self.checking, self.groceries, '20.00'
+        )
+        points = dict(forecast(self.checking.id, 45, start=datetime.date(2021, 3, 1)))
+        march = decimal.Decimal('300.00') * 30 / 31 - 50
+        self.assertAlmostEqual(
+            points[datetime.date(2021, 3, 31)],
+            decimal.Decimal('2700.00') - 50 + 20 - 1000 - march,
+            places=3
+        )
+
+    def test_forecast_api(self):
+        """
+        Verify the forecast endpoint returns a point per day from today
+        """
+        url = reverse('accounts-forecast', args=[self.card.id])
+        response = self.client.get(url, {'days': 30})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 31)
+        self.assertEqual(response.data['results'][0], {
+            'date': datetime.date.today().isoformat(),
+            'balance': '-100.0000'
+        })
+        response = self.client.get(url, {'days': 100000})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(reverse('accounts-forecast', args=[self.rent.id + 100]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
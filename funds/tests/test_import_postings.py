@@ -0,0 +1,150 @@
+import datetime
+import tempfile
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from funds.models import Accounts, Balances, Categories, Postings, Transactions
+
+CSV = '''date,payee,amount,account,category,note
+2021-01-01,Employer,"1,000.00",Checking,Salary,January
+2021-01-02,Grocer,-55.25,Checking,Groceries,
+2021-01-03,Grocer,-20.00,Checking,Groceries,
+'''
+
+OFX = '''OFXHEADER:100
+DATA:OFXSGML
+
+<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>
+<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20210105120000<TRNAMT>-12.50<FITID>1
+<NAME>Coffee Shop<MEMO>Latte
+</STMTTRN>
+<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20210106<TRNAMT>-7.25<FITID>2<NAME>Bakery
+</STMTTRN>
+</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>
+'''
+
+
+class ImportPostingsTest(TestCase):
+
+    def setUp(self):
+        self.account = Accounts.objects.create(account_name='Checking')
+        Categories.objects.create(category_name='Salary')
+        Categories.objects.create(category_name='Groceries')
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+
+    def write(self, name, content):
+        path = self.directory / name
+        path.write_text(content)
+        return str(path)
+
+    def run_import(self, *args):
+        out = StringIO()
+        call_command('import_postings', *args, stdout=out)
+        return out.getvalue()
+
+    def test_import_csv(self):
+        """
+        Verify every CSV row becomes a posting with one transaction
+        """
+        output = self.run_import(self.write('bank.csv', CSV), '--batch-size', '2')
+        self.assertIn('Imported 3 rows', output)
+        self.assertEqual(Postings.objects.count(), 3)
+        salary = Transactions.objects.get(posting_num__payee='Employer')
+        self.assertEqual(salary.amount, 1000)
+        self.assertEqual(salary.categories_id.category_name, 'Salary')
+        self.assertEqual(salary.posting_num.date, datetime.date(2021, 1, 1))
+        self.assertEqual(Balances.objects.as_of(self.account.id), 924.75)
+        self.assertEqual(Balances.objects.verify(), [])
+
+    def test_dry_run(self):
+        """
+        Verify a dry run parses the file without writing anything
+        """
+        output = self.run_import(self.write('bank.csv', CSV), '--dry-run')
+        self.assertIn('Checked 3 rows', output)
+        self.assertEqual(Postings.objects.count(), 0)
+        # No posting numbers were used up
+        with mock.patch.object(Postings.objects, 'allocate') as allocate:
+            self.run_import(self.write('bank.csv', CSV), '--dry-run')
+        allocate.assert_not_called()
+
+    def test_resume_from_offset(self):
+        """
+        Verify importing from a reported offset only imports the rows after it
+        """
+        path = self.write('bank.csv', CSV)
+        output = self.run_import(path, '--batch-size', '2', '--dry-run')
+        offset = output.split('through byte offset ')[1].split()[0]
+        self.run_import(path, '--offset', offset)
+        self.assertEqual(
+            list(Postings.objects.values_list('payee', 'note')),
+            [('Grocer', '')]
+        )
+
+    def test_unknown_category(self):
+        """
+        Verify a row with an unknown category stops the import
+        """
+        path = self.write('bank.csv', CSV.replace('Salary', 'Bonus'))
+        with self.assertRaises(CommandError):
+            self.run_import(path)
+        self.assertEqual(Postings.objects.count(), 0)
+
+    def test_invalid_amount(self):
+        """
+        Verify amounts that aren't finite or don't fit the column stop the import
+        """
+        for amount in ('NaN', 'Infinity', '1e20', '0.00001'):
+            path = self.write('bank.csv', CSV.replace('-20.00', amount))
+            with self.assertRaisesMessage(CommandError, f'Invalid amount {amount!r}'):
+                self.run_import(path)
+        self.assertEqual(Postings.objects.count(), 0)
+
+    def test_invalid_posting_num(self):
+        """
+        Verify posting numbers that aren't numbers or are already used stop the import
+        """
+        header, first, second, third = CSV.splitlines()
+        rows = [first + ',1', second + ',2', third + ',x']
+        path = self.write('bank.csv', '\n'.join([header + ',posting_num'] + rows))
+        with self.assertRaisesMessage(CommandError, 'Invalid posting number'):
+            self.run_import(path)
+        rows = rows[:2] + [third + ',1']
+        path = self.write('bank.csv', '\n'.join([header + ',posting_num'] + rows))
+        with self.assertRaisesMessage(CommandError, 'Posting number 1 already exists'):
+            self.run_import(path)
+        self.assertEqual(Postings.objects.count(), 0)
+        # Also found once an earlier batch has been committed
+        with self.assertRaisesMessage(CommandError, 'Posting number 1 already exists'):
+            self.run_import(path, '--batch-size', '2')
+        self.assertEqual(Postings.objects.count(), 2)
+
+    def test_import_ofx(self):
+        """
+        Verify every OFX statement transaction becomes a cleared posting
+        """
+        path = self.write('bank.ofx', OFX)
+        self.run_import(path, '--account', 'Checking', '--category', 'Groceries')
+        postings = Postings.objects.order_by('date')
+        self.assertEqual(
+            [(posting.date, posting.payee, posting.cleared) for posting in postings],
+            [
+                (datetime.date(2021, 1, 5), 'Coffee Shop', True),
+                (datetime.date(2021, 1, 6), 'Bakery', True),
+            ]
+        )
+        self.assertEqual(Balances.objects.as_of(self.account.id), -19.75)
+
+    def test_import_ofx_needs_account(self):
+        """
+        Verify an OFX import without a default account is rejected
+        """
+        with self.assertRaises(CommandError):
+            self.run_import(self.write('bank.ofx', OFX))
@@ -0,0 +1,86 @@
+import datetime
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import TestCase
+
+from funds.models import Accounts, Budgets, Categories, Postings, Transactions
+
+
+class IndexUsageTest(TestCase):
+    """
+    Check the query plans of the hot access paths use their indexes
+
+    Postgres prefers a sequential scan on tables this small, so it is
+    switched off for the test transaction to see which index would be used.
+    """
+
+    def setUp(self):
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        account = Accounts.objects.create(account_name='Test Checking')
+        category = Categories.objects.create(category_name='Test Category')
+        self.account_id = account.id
+        self.category_id = category.id
+        for num in range(1, 20):
+            posting = Postings.objects.create(
+                posting_num=num,
+                date=datetime.date(2021, 1, num),
+                cleared=num % 2 == 0
+            )
+            Transactions.objects.create(
+                posting_num=posting,
+                account_id=account,
+                categories_id=category,
+                amount=num
+            )
+
+    def assertUsesIndex(self, queryset, index):
+        plan = queryset.explain()
+        self.assertIn(index, plan)
+
+    def test_postings_date_range(self):
+        """
+        Verify filtering postings by date range uses the date index
+        """
+        postings = Postings.objects.filter(
+            date__gte=datetime.date(2021, 1, 5),
+            date__lte=datetime.date(2021, 1, 10)
+        ).order_by('date', 'posting_num')
+        self.assertUsesIndex(postings, 'postings_date_num')
+
+    def test_uncleared_postings(self):
+        """
+        Verify filtering uncleared postings uses the partial index
+        """
+        postings = Postings.objects.filter(
+            cleared=False,
+            date__gte=datetime.date(2021, 1, 5)
+        )
+        self.assertUsesIndex(postings, 'postings_uncleared_date')
+
+    def test_transactions_by_account(self):
+        """
+        Verify filtering transactions by account and posting uses the composite index
+        """
+        transactions = Transactions.objects.filter(
+            account_id=self.account_id,
+            posting_num=5
+        )
+        self.assertUsesIndex(transactions, 'transactions_account_posting')
+
+    @skipUnless(
+        connection.vendor == 'postgresql',
+        'SQLite names unique constraint indexes itself'
+    )
+    def test_budgets_by_month_and_category(self):
+        """
+        Verify filtering budgets by month and category uses the unique constraint index
+        """
+        budgets = Budgets.objects.filter(
+            year=2021,
+            month=1,
+            categories_id=self.category_id
+        )
+        self.assertUsesIndex(budgets, 'budgets_month_category')
@@ -0,0 +1,162 @@
+import datetime
+import json
+import os
+import tempfile
+from pathlib import Path
+
+from django.db import transaction
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APITestCase, APITransactionTestCase
+from rest_framework import status
+
+from funds.metrics import registry
+from funds.models import Accounts, Categories, Postings, Transactions
+
+
+class MetricsSetupMixin:
+
+    def setUp(self):
+        self.account = Accounts.objects.create(account_name='Test Checking')
+        self.category = Categories.objects.create(category_name='Test Category')
+        for num in range(1, 4):
+            posting = Postings.objects.create(
+                posting_num=num,
+                date=datetime.date(2021, 1, num),
+                cleared=num == 1
+            )
+            Transactions.objects.create(
+                posting_num=posting,
+                account_id=self.account,
+                categories_id=self.category,
+                amount=10
+            )
+
+    def get_metrics(self):
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        samples = {}
+        for line in response.content.decode().splitlines():
+            if not line.startswith('#'):
+                sample, value = line.rsplit(' ', 1)
+                samples[sample] = float(value)
+        return samples
+
+    def import_posting(self, posting_num):
+        posting = Postings(posting_num=posting_num, date=datetime.date(2021, 1, 4))
+        Postings.objects.bulk_import([posting], [
+            Transactions(
+                posting_num_id=posting_num,
+                account_id_id=self.account.id,
+                categories_id_id=self.category.id,
+                amount=amount
+            )
+            for amount in (5, -5)
+        ])
+
+
+@override_settings(FUNDS_METRICS_GAUGE_MAX_AGE=0)
+class MetricsAPITest(MetricsSetupMixin, APITestCase):
+
+    def test_request_metrics(self):
+        """
+        Verify requests, errors, queries and rows are counted per route
+        """
+        before = self.get_metrics()
+        self.client.get(reverse('postings-list'))
+        self.client.get(reverse('postings-detail', args=[99]))
+        after = self.get_metrics()
+
+        def change(sample):
+            return after.get(sample, 0) - before.get(sample, 0)
+
+        self.assertEqual(
+            change(
+                'funds_http_requests_total'
+                '{route="postings-list",method="GET",status="200"}'
+            ),
+            1
+        )
+        self.assertEqual(
+            change('funds_http_errors_total{route="postings-detail",status="404"}'),
+            1
+        )
+        self.assertEqual(change('funds_rows_returned_total{route="postings-list"}'), 3)
+        self.assertGreaterEqual(change('funds_db_queries_total{route="postings-list"}'), 2)
+        self.assertEqual(
+            change(
+                'funds_http_request_duration_seconds_count'
+                '{route="postings-list",method="GET"}'
+            ),
+            1
+        )
+        self.assertEqual(
+            change(
+                'funds_http_request_duration_seconds_bucket'
+                '{route="postings-list",method="GET",le="+Inf"}'
+            ),
+            1
+        )
+
+    def test_ledger_metrics(self):
+        """
+        Verify the posting gauges
+        """
+        before = self.get_metrics()
+        self.assertEqual(before['funds_postings'], 3)
+        self.assertEqual(before['funds_postings_uncleared'], 2)
+        self.import_posting(4)
+        after = self.get_metrics()
+        self.assertEqual(after['funds_postings'], 4)
+        self.assertEqual(after['funds_postings_uncleared'], 3)
+
+    def test_gauges_reused(self):
+        """
+        Verify the gauges are only counted again once they are older than the max age
+        """
+        registry.gauge_values.clear()
+        with self.settings(FUNDS_METRICS_GAUGE_MAX_AGE=3600):
+            self.assertEqual(self.get_metrics()['funds_postings'], 3)
+            self.import_posting(4)
+            with self.assertNumQueries(0):
+                self.assertEqual(self.get_metrics()['funds_postings'], 3)
+        self.assertEqual(self.get_metrics()['funds_postings'], 4)
+
+    def test_multiprocess(self):
+        """
+        Verify the values written by other processes are added to this one's
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(FUNDS_METRICS_DIR=directory):
+                own = self.get_metrics()['funds_transactions_inserted_total']
+                other = Path(directory) / f'funds-{os.getpid() + 1}.json'
+                other.write_text(
+                    json.dumps({'funds_transactions_inserted_total': [[[], 7]]})
+                )
+                self.assertEqual(
+                    self.get_metrics()['funds_transactions_inserted_total'],
+                    own + 7
+                )
+                self.assertTrue((Path(directory) / f'funds-{os.getpid()}.json').exists())
+
+
+class MetricsCommitTest(MetricsSetupMixin, APITransactionTestCase):
+
+    def test_inserted_transactions(self):
+        """
+        Verify inserted transactions are counted once committed, and not if rolled back
+        """
+        before = self.get_metrics()['funds_transactions_inserted_total']
+        self.import_posting(4)
+        with transaction.atomic():
+            self.import_posting(5)
+            Transactions.objects.create(
+                posting_num_id=5,
+                account_id=self.account,
+                categories_id=self.category,
+                amount=1
+            )
+            transaction.set_rollback(True)
+        after = self.get_metrics()['funds_transactions_inserted_total']
+        self.assertEqual(after - before, 2)
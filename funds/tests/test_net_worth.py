@@ -0,0 +1,88 @@
+import datetime
+import decimal
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from rest_framework import status
+
+from funds.models import Accounts, Categories, Postings, Transactions
+
+
+class NetWorthAPITest(APITestCase):
+
+    def setUp(self):
+        self.checking = Accounts.objects.create(
+            account_name='Test Checking',
+            account_type=Accounts.CHECKING
+        )
+        self.savings = Accounts.objects.create(
+            account_name='Test Savings',
+            account_type=Accounts.SAVINGS
+        )
+        self.card = Accounts.objects.create(
+            account_name='Test Card',
+            account_type=Accounts.CREDIT_CARD
+        )
+        self.category = Categories.objects.create(category_name='Test Category')
+        self.url = reverse('reports-net-worth')
+        self.create_posting(1, datetime.date(2021, 1, 4), [(self.checking, '1000.00')])
+        self.create_posting(2, datetime.date(2021, 1, 5), [(self.card, '-200.00')])
+        self.create_posting(
+            3,
+            datetime.date(2021, 1, 12),
+            [(self.checking, '-300.00'), (self.savings, '300.00')]
+        )
+        self.create_posting(
+            4,
+            datetime.date(2021, 2, 1),
+            [(self.checking, '-150.00'), (self.card, '150.00')]
+        )
+
+    def create_posting(self, num, date, amounts):
+        posting = Postings.objects.create(posting_num=num, date=date)
+        for account, amount in amounts:
+            Transactions.objects.create(
+                posting_num=posting,
+                account_id=account,
+                categories_id=self.category,
+                amount=decimal.Decimal(amount)
+            )
+
+    def get_net_worth(self, interval):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, {'interval': interval})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(queries), 1)
+        return [
+            (row['date'], row['assets'], row['liabilities'], row['net_worth'])
+            for row in response.data['results']
+        ]
+
+    def test_daily(self):
+        """
+        Verify the running totals at the end of each day with transactions, in one query
+        """
+        self.assertEqual(self.get_net_worth('day'), [
+            ('2021-01-04', '1000.0000', '0.0000', '1000.0000'),
+            ('2021-01-05', '1000.0000', '200.0000', '800.0000'),
+            ('2021-01-12', '1000.0000', '200.0000', '800.0000'),
+            ('2021-02-01', '850.0000', '50.0000', '800.0000'),
+        ])
+
+    def test_intervals(self):
+        """
+        Verify weeks and months are dated with their first day
+        """
+        self.assertEqual(self.get_net_worth('week'), [
+            ('2021-01-04', '1000.0000', '200.0000', '800.0000'),
+            ('2021-01-11', '1000.0000', '200.0000', '800.0000'),
+            ('2021-02-01', '850.0000', '50.0000', '800.0000'),
+        ])
+        self.assertEqual(self.get_net_worth('month'), [
+            ('2021-01-01', '1000.0000', '200.0000', '800.0000'),
+            ('2021-02-01', '850.0000', '50.0000', '800.0000'),
+        ])
+        response = self.client.get(self.url, {'interval': 'hour'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
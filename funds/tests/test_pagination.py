@@ -0,0 +1,99 @@
+import datetime
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from rest_framework import status
+
+from funds.models import Accounts, Categories, Postings, Transactions
+
+
+class KeysetPaginationTest(APITestCase):
+
+    def setUp(self):
+        account = Accounts.objects.create(account_name='Test Checking')
+        category = Categories.objects.create(category_name='Test Category')
+        # Several postings share each date so pages have to split ties
+        postings = Postings.objects.bulk_create(
+            Postings(
+                posting_num=num,
+                date=datetime.date(2021, 1, 1) + datetime.timedelta(days=(25 - num) // 4)
+            )
+            for num in range(1, 26)
+        )
+        Transactions.objects.bulk_create(
+            Transactions(
+                posting_num=posting,
+                account_id=account,
+                categories_id=category,
+                amount=posting.posting_num
+            )
+            for posting in postings
+        )
+        self.expected = list(
+            Postings.objects.order_by('date', 'posting_num')
+            .values_list('posting_num', flat=True)
+        )
+
+    def walk(self, url, key):
+        """
+        Follow next links from url and return the key of every result
+        """
+        seen = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            seen.extend(result[key] for result in response.data['results'])
+            url = response.data['next']
+        return seen
+
+    def test_postings_ordered_by_date_and_posting_num(self):
+        """
+        Verify paging through postings returns each once in (date, posting_num) order
+        """
+        url = reverse('postings-list') + '?page_size=3'
+        self.assertEqual(self.walk(url, 'posting_num'), self.expected)
+
+    def test_transactions_ordered_by_id(self):
+        """
+        Verify paging through transactions returns every transaction once in id order
+        """
+        url = reverse('transactions-list') + '?page_size=4'
+        expected = list(Transactions.objects.order_by('id').values_list('id', flat=True))
+        self.assertEqual(self.walk(url, 'id'), expected)
+
+    def test_previous_link(self):
+        """
+        Verify the previous link returns the page before the current one
+        """
+        url = reverse('postings-list') + '?page_size=5'
+        first = self.client.get(url)
+        second = self.client.get(first.data['next'])
+        previous = self.client.get(second.data['previous'])
+        self.assertEqual(
+            [result['posting_num'] for result in previous.data['results']],
+            self.expected[:5]
+        )
+        self.assertIsNone(first.data['previous'])
+
+    def test_page_query_count_does_not_depend_on_depth(self):
+        """
+        Verify a deep page costs the same number of queries as the first page
+        """
+        url = reverse('postings-list') + '?page_size=2'
+        with CaptureQueriesContext(connection) as first_page:
+            response = self.client.get(url)
+        for _ in range(8):
+            response = self.client.get(response.data['next'])
+        with CaptureQueriesContext(connection) as deep_page:
+            self.client.get(response.data['next'])
+        self.assertEqual(len(first_page), len(deep_page))
+
+    def test_invalid_cursor(self):
+        """
+        Verify a malformed cursor returns a 404 error
+        """
+        url = reverse('postings-list') + '?cursor=cD1ub3Rqc29u'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,187 @@
+import datetime
+import decimal
+
+from django.test import TransactionTestCase
+from django.urls import reverse
+from rest_framework.test import APIClient, APITestCase
+from rest_framework import status
+
+from funds.models import Accounts, Categories, Postings, Transactions
+from funds.payees import payee_index
+
+
+class PayeeSuggestMixin:
+
+    def setUp(self):
+        payee_index.invalidate()
+        self.addCleanup(payee_index.invalidate)
+        self.checking = Accounts.objects.create(account_name='Test Checking')
+        self.card = Accounts.objects.create(account_name='Test Card')
+        self.coffee = Categories.objects.create(category_name='Coffee')
+        self.groceries = Categories.objects.create(category_name='Groceries')
+        self.url = reverse('payees-suggest')
+
+    def create_posting(self, num, payee, category, account):
+        posting = Postings.objects.create(
+            posting_num=num,
+            date=datetime.date(2021, 1, 1),
+            payee=payee
+        )
+        Transactions.objects.create(
+            posting_num=posting,
+            account_id=account,
+            categories_id=category,
+            amount=decimal.Decimal('-4.50')
+        )
+        return posting
+
+    def suggest(self, prefix, **params):
+        response = self.client.get(self.url, {'prefix': prefix, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data['results']
+
+
+class PayeeSuggestAPITest(PayeeSuggestMixin, APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.create_posting(1, 'Starbucks', self.coffee, self.card)
+        self.create_posting(2, 'Starbucks', self.coffee, self.card)
+        self.create_posting(3, 'STARBUCKS', self.groceries, self.checking)
+        self.create_posting(4, 'Stop & Shop', self.groceries, self.checking)
+        self.create_posting(5, 'Shell', self.groceries, self.checking)
+
+    def test_suggest(self):
+        """
+        Verify payees starting with the prefix are suggested, most used first
+
+        Each comes with the category and account it usually goes with.
+        """
+        self.assertEqual(self.suggest('st'), [
+            {
+                'payee': 'Starbucks',
+                'count': 3,
+                'categories_id': self.coffee.id,
+                'account_id': self.card.id,
+            },
+            {
+                'payee': 'Stop & Shop',
+                'count': 1,
+                'categories_id': self.groceries.id,
+                'account_id': self.checking.id,
+            },
+        ])
+        self.assertEqual(
+            [row['payee'] for row in self.suggest('S', limit=1)],
+            ['Starbucks']
+        )
+        self.assertEqual(self.suggest('target'), [])
+
+    def test_no_queries(self):
+        """
+        Verify suggestions don't query the database once the index is loaded
+        """
+        self.suggest('s')
+        with self.assertNumQueries(0):
+            self.assertEqual(len(self.suggest('sh')), 1)
+
+    def test_invalid(self):
+        """
+        Verify a prefix is required and the limit is bounded
+        """
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(self.url, {'prefix': 's', 'limit': 1000})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class PayeeIndexUpdateTest(PayeeSuggestMixin, TransactionTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.create_posting(1, 'Starbucks', self.coffee, self.card)
+
+    def test_created(self):
+        """
+        Verify created postings are added to a loaded index without reloading it
+        """
+        self.assertEqual(len(self.suggest('s')), 1)
+        self.create_posting(2, 'Shell', self.groceries, self.checking)
+        data = [{
+            'posting_num': 3,
+            'date': '2021-01-02',
+            'payee': 'starbucks',
+            'transactions': [{
+                'account_id': self.card.id,
+                'categories_id': self.coffee.id,
+                'amount': '-3.00'
+            }]
+        }]
+        response = self.client.post(reverse('postings-bulk'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        with self.assertNumQueries(0):
+            suggestions = self.suggest('s')
+        self.assertEqual(suggestions, [
+            {
+                'payee': 'Starbucks',
+                'count': 2,
+                'categories_id': self.coffee.id,
+                'account_id': self.card.id,
+            },
+            {
+                'payee': 'Shell',
+                'count': 1,
+                'categories_id': self.groceries.id,
+                'account_id': self.checking.id,
+            },
+        ])
+
+    def test_edited(self):
+        """
+        Verify a posting's edited payee moves its counts in the index without reloading it
+        """
+        self.assertEqual(len(self.suggest('s')), 1)
+        response = self.client.patch(
+            reverse('postings-detail', args=[1]),
+            {'payee': 'Peet\'s Coffee'},
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        transaction = Transactions.objects.get()
+        transaction.categories_id = self.groceries
+        transaction.save()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.suggest('s'), [])
+            self.assertEqual([dict(row) for row in self.suggest('peet')], [{
+                'payee': 'Peet\'s Coffee',
+                'count': 1,
+                'categories_id': self.groceries.id,
+                'account_id': self.card.id,
+            }])
+
+    def test_deleted(self):
+        """
+        Verify deleted transactions and postings are taken out of the index in place
+        """
+        self.create_posting(2, 'Starbucks', self.groceries, self.checking)
+        self.assertEqual(self.suggest('s')[0]['count'], 2)
+        transaction = Transactions.objects.get(posting_num=1)
+        response = self.client.delete(
+            reverse('transactions-detail', args=[transaction.id])
+        )
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        response = self.client.delete(reverse('postings-detail', args=[1]))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.suggest('s'), [{
+                'payee': 'Starbucks',
+                'count': 1,
+                'categories_id': self.groceries.id,
+                'account_id': self.checking.id,
+            }])
+        transaction = Transactions.objects.get(posting_num=2)
+        self.client.delete(reverse('transactions-detail', args=[transaction.id]))
+        self.client.delete(reverse('postings-detail', args=[2]))
+        with self.assertNumQueries(0):
+            self.assertEqual(self.suggest('s'), [])
@@ -0,0 +1,145 @@
+import sqlite3
+import threading
+from unittest import mock, skipUnless
+
+from django.db import connection
+from django.test import SimpleTestCase, TransactionTestCase
+
+from funds.pool import ConnectionPool, PoolTimeout, get_pool, pools
+
+
+def connect():
+    return sqlite3.connect(':memory:', check_same_thread=False)
+
+
+def is_usable(connection):
+    try:
+        connection.execute('SELECT 1')
+    except sqlite3.Error:
+        return False
+    return True
+
+
+class ConnectionPoolTest(SimpleTestCase):
+
+    def test_reuse(self):
+        """
+        Verify released connections are handed out again instead of opening new ones
+        """
+        pool = ConnectionPool(max_size=2, timeout=1)
+        first = pool.acquire(connect)
+        pool.release(first)
+        self.assertIs(pool.acquire(connect), first)
+        self.assertEqual(pool.stats, {'opened': 1, 'reused': 1, 'discarded': 0})
+
+    def test_timeout(self):
+        """
+        Verify acquiring waits for a free connection and times out when none is released
+        """
+        pool = ConnectionPool(max_size=1, timeout=0.05)
+        first = pool.acquire(connect)
+        with self.assertRaises(PoolTimeout):
+            pool.acquire(connect)
+
+        release = threading.Timer(0.05, pool.release, [first])
+        pool.timeout = 5
+        release.start()
+        self.assertIs(pool.acquire(connect), first)
+        release.join()
+
+    def test_check(self):
+        """
+        Verify connections failing the check and discarded connections are replaced
+        """
+        pool = ConnectionPool(max_size=1, timeout=1, check=is_usable)
+        first = pool.acquire(connect)
+        pool.release(first)
+        first.close()
+        second = pool.acquire(connect)
+        self.assertIsNot(second, first)
+        pool.release(second, discard=True)
+        self.assertIsNot(pool.acquire(connect), second)
+        self.assertEqual(pool.stats, {'opened': 3, 'reused': 0, 'discarded': 2})
+
+    def test_close(self):
+        """
+        Verify closing the pool closes the idle connections now
+
+        Connections in use are closed once they're released.
+        """
+        pool = ConnectionPool(max_size=2, timeout=1)
+        idle = pool.acquire(connect)
+        in_use = pool.acquire(connect)
+        pool.release(idle)
+        pool.close()
+        self.assertFalse(is_usable(idle))
+        pool.release(in_use)
+        self.assertFalse(is_usable(in_use))
+        self.assertEqual(len(pool.idle), 0)
+
+    def test_failed_connect(self):
+        """
+        Verify a connection that fails to open doesn't use up a slot
+        """
+        pool = ConnectionPool(max_size=1, timeout=0.05)
+
+        def fail():
+            raise sqlite3.OperationalError('unable to open database file')
+
+        with self.assertRaises(sqlite3.OperationalError):
+            pool.acquire(fail)
+        pool.acquire(connect)
+
+    def test_get_pool(self):
+        """
+        Verify each alias has one pool per process
+        """
+        self.addCleanup(pools.pop, 'test', None)
+        pool = get_pool('test', max_size=3)
+        self.assertIs(get_pool('test', max_size=3), pool)
+        self.assertEqual(pool.max_size, 3)
+        with mock.patch('funds.pool.os.getpid', return_value=pool.pid + 1):
+            self.assertIsNot(get_pool('test'), pool)
+
+
+@skipUnless(
+    hasattr(connection, 'close_if_health_check_failed'),
+    'Needs the funds.backends.postgresql backend'
+)
+class PostgresBackendTest(TransactionTestCase):
+
+    def test_health_check(self):
+        """
+        Verify a persistent connection closed by the server is reopened at its next use
+        """
+        settings = {'CONN_MAX_AGE': None, 'CONN_HEALTH_CHECKS': True, 'POOL': None}
+        with mock.patch.dict(connection.settings_dict, settings):
+            connection.close()
+            connection.ensure_connection()
+            connection.connection.close()
+            # What the request_started and request_finished signals do
+            connection.close_if_unusable_or_obsolete()
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+                self.assertEqual(cursor.fetchone(), (1,))
+        connection.close()
+
+    def test_pool(self):
+        """
+        Verify a connection closed by Django goes back to the pool and is reused
+        """
+        settings = {'CONN_MAX_AGE': 0, 'POOL': {'MAX_SIZE': 2, 'TIMEOUT': 1}}
+        self.addCleanup(pools.pop, connection.alias, None)
+        with mock.patch.dict(connection.settings_dict, settings):
+            connection.close()
+            pools.pop(connection.alias, None)
+            connection.ensure_connection()
+            first = connection.connection
+            connection.close()
+            self.assertFalse(first.closed)
+            connection.ensure_connection()
+            self.assertIs(connection.connection, first)
+            self.assertEqual(connection.get_pool().stats['reused'], 1)
+            connection.close()
+            connection.get_pool().close()
+        connection.close()
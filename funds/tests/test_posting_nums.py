@@ -0,0 +1,129 @@
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+from unittest import skipUnless
+
+from django.db import connection, connections
+from django.test import TransactionTestCase
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from rest_framework import status
+
+from funds.models import Accounts, Categories, Postings
+
+
+class PostingNumsAPITest(APITestCase):
+
+    def setUp(self):
+        self.account = Accounts.objects.create(account_name='Test Checking')
+        self.category = Categories.objects.create(category_name='Test Category')
+        Postings.objects.create(posting_num=100, date=datetime.date(2021, 1, 1))
+
+    def bulk_posting(self, posting_num=None):
+        posting = {
+            'date': '2021-02-01',
+            'transactions': [{
+                'account_id': self.account.id,
+                'categories_id': self.category.id,
+                'amount': '-1.00'
+            }]
+        }
+        if posting_num is not None:
+            posting['posting_num'] = posting_num
+        return posting
+
+    def test_create_without_posting_num(self):
+        """
+        Verify postings created without a posting_num are numbered after the existing ones
+        """
+        url = reverse('postings-list')
+        first = self.client.post(url, {'date': '2021-01-02'}, format='json')
+        second = self.client.post(url, {'date': '2021-01-03'}, format='json')
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertGreater(first.data['posting_num'], 100)
+        self.assertGreater(second.data['posting_num'], first.data['posting_num'])
+
+        # Numbers chosen by the client are still accepted
+        response = self.client.post(
+            url,
+            {'posting_num': 50, 'date': '2021-01-04'},
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['posting_num'], 50)
+
+    def test_unsaved_posting_not_numbered(self):
+        """
+        Verify a posting is only numbered when saved, not when built
+        """
+        with self.assertNumQueries(0):
+            posting = Postings(date=datetime.date(2021, 1, 2))
+        self.assertIsNone(posting.posting_num)
+        posting.save()
+        self.assertGreater(posting.posting_num, 100)
+
+    def test_bulk_without_posting_nums(self):
+        """
+        Verify bulk postings without a posting_num are numbered among client numbers
+        """
+        data = [self.bulk_posting(), self.bulk_posting(200), self.bulk_posting()]
+        response = self.client.post(reverse('postings-bulk'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        posting_nums = [result['posting_num'] for result in response.data['results']]
+        self.assertEqual(posting_nums[1], 200)
+        self.assertGreater(posting_nums[0], 100)
+        self.assertGreater(posting_nums[2], posting_nums[0])
+        self.assertEqual(Postings.objects.filter(posting_num__in=posting_nums).count(), 3)
+
+    def test_reserve(self):
+        """
+        Verify reserved blocks don't overlap each other or existing postings
+        """
+        url = reverse('postings-reserve')
+        reserved = []
+        for count in (5, 3):
+            response = self.client.post(url, {'count': count}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            self.assertEqual(response.data['count'], count)
+            for block in response.data['ranges']:
+                reserved.extend(range(block['first'], block['last'] + 1))
+        self.assertEqual(len(set(reserved)), 8)
+        self.assertGreater(min(reserved), 100)
+
+        response = self.client.post(
+            reverse('postings-bulk'),
+            [self.bulk_posting(posting_num) for posting_num in reserved],
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = self.client.post(url, {'count': 0}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@skipUnless(
+    connection.vendor == 'postgresql',
+    'Posting numbers only come from a sequence on PostgreSQL'
+)
+class PostingNumSequenceTest(TransactionTestCase):
+
+    def test_concurrent_allocations(self):
+        """
+        Verify concurrent allocations never hand out the same number
+        """
+        def allocate(_):
+            try:
+                return Postings.objects.allocate(100)
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            blocks = list(executor.map(allocate, range(8)))
+        posting_nums = [posting_num for block in blocks for posting_num in block]
+        self.assertEqual(len(set(posting_nums)), 800)
+
+    def test_client_posting_num(self):
+        """
+        Verify the sequence skips a number a client chose ahead of it
+        """
+        ahead = Postings.objects.allocate(1)[0] + 10
+        Postings.objects.create(posting_num=ahead)
+        self.assertGreater(Postings.objects.allocate(1)[0], ahead)
@@ -1,10 +1,16 @@
+import csv
 import datetime
+import io
+import json
 
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from rest_framework.settings import api_settings
 from rest_framework.test import APITestCase
 from rest_framework import status
 
-from funds.models import Postings
+from funds.models import Accounts, Balances, Categories, Postings, Transactions
 
 
 class PostingsAPITest(APITestCase):
@@ -314,3 +320,277 @@ class PostingsAPITest(APITestCase):
         data = {'cleared': 'a'}
         response = self.client.patch(url, data, format='json')
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class PostingsQueryCountTest(APITestCase):
+
+    def setUp(self):
+        self.account = Accounts.objects.create(
+            account_name='Test Checking',
+            account_type=Accounts.CHECKING
+        )
+        self.category = Categories.objects.create(category_name='Test Category')
+
+    def create_postings(self, count):
+        """
+        Create count postings, each with a debit and credit transaction
+        """
+        start = Postings.objects.count() + 1
+        postings = Postings.objects.bulk_create(
+            Postings(posting_num=num, payee='Store') for num in range(start, start + count)
+        )
+        Transactions.objects.bulk_create(
+            Transactions(
+                posting_num=posting,
+                account_id=self.account,
+                categories_id=self.category,
+                amount=amount
+            )
+            for posting in postings
+            for amount in (10, -10)
+        )
+
+    def count_queries(self, url):
+        """
+        Count the queries of a request once the cached accounts and categories are warm
+        """
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(context.captured_queries)
+
+    def test_list_postings_query_count(self):
+        """
+        Verify a full page of postings is listed with two queries
+
+        One query for the postings and one for their transactions.
+        """
+        url = reverse('postings-list')
+        self.create_postings(api_settings.PAGE_SIZE + 1)
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), api_settings.PAGE_SIZE)
+        self.assertEqual(len(context.captured_queries), 2)
+
+    def test_detail_posting_query_count_constant(self):
+        """
+        Verify retrieving a posting does not query per transaction
+        """
+        self.create_postings(1)
+        url = reverse('postings-detail', args=[1])
+        small = self.count_queries(url)
+        Transactions.objects.bulk_create(
+            Transactions(
+                posting_num_id=1,
+                account_id=self.account,
+                categories_id=self.category,
+                amount=1
+            )
+            for _ in range(50)
+        )
+        large = self.count_queries(url)
+        self.assertEqual(small, large)
+
+
+class PostingsBulkAPITest(APITestCase):
+
+    def setUp(self):
+        self.checking = Accounts.objects.create(account_name='Test Checking')
+        self.savings = Accounts.objects.create(account_name='Test Savings')
+        self.category = Categories.objects.create(category_name='Test Category')
+        posting = Postings.objects.create(posting_num=1, date=datetime.date(2021, 1, 5))
+        Transactions.objects.create(
+            posting_num=posting,
+            account_id=self.checking,
+            categories_id=self.category,
+            amount=100
+        )
+
+    def build_posting(self, posting_num, date, amount):
+        return {
+            'posting_num': posting_num,
+            'date': date,
+            'posting_type': Postings.TRANSFER,
+            'payee': 'Bank',
+            'transactions': [
+                {
+                    'account_id': self.checking.id,
+                    'categories_id': self.category.id,
+                    'amount': -amount
+                },
+                {
+                    'account_id': self.savings.id,
+                    'categories_id': self.category.id,
+                    'amount': amount
+                },
+            ]
+        }
+
+    def test_bulk_create(self):
+        """
+        Verify a list of postings and their transactions are all created
+        """
+        url = reverse('postings-bulk')
+        data = [
+            self.build_posting(2, '2021-01-01', 10),
+            self.build_posting(3, '2021-01-05', 20),
+            self.build_posting(4, '2021-01-09', 30),
+        ]
+        response = self.client.post(url + '?batch_size=2', data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            response.data['results'],
+            [
+                {'posting_num': 2, 'transactions': 2},
+                {'posting_num': 3, 'transactions': 2},
+                {'posting_num': 4, 'transactions': 2},
+            ]
+        )
+        self.assertEqual(Postings.objects.count(), 4)
+        self.assertEqual(Transactions.objects.count(), 7)
+        self.assertEqual(Balances.objects.as_of(self.checking.id), 40)
+        self.assertEqual(
+            Balances.objects.as_of(self.checking.id, datetime.date(2021, 1, 5)),
+            70
+        )
+        self.assertEqual(Balances.objects.as_of(self.savings.id), 60)
+        self.assertEqual(Balances.objects.verify(), [])
+
+    def test_bulk_create_query_count_constant(self):
+        """
+        Verify the number of queries does not grow with the number of postings in a batch
+        """
+        url = reverse('postings-bulk')
+        with CaptureQueriesContext(connection) as small:
+            self.client.post(url, [self.build_posting(2, '2021-01-01', 10)], format='json')
+        data = [self.build_posting(num, '2021-02-01', num) for num in range(3, 43)]
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(small), len(large))
+
+    def test_bulk_create_existing_posting_num(self):
+        """
+        Verify nothing is created if any posting_num already exists or is repeated
+        """
+        url = reverse('postings-bulk')
+        data = [
+            self.build_posting(2, '2021-01-01', 10),
+            self.build_posting(1, '2021-01-01', 10),
+            self.build_posting(2, '2021-01-01', 10),
+        ]
+        response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data[0], {})
+        self.assertIn('posting_num', response.data[1])
+        self.assertIn('posting_num', response.data[2])
+        self.assertEqual(Postings.objects.count(), 1)
+
+    def test_bulk_create_invalid_account(self):
+        """
+        Verify nothing is created if a transaction has an unknown account
+        """
+        url = reverse('postings-bulk')
+        posting = self.build_posting(2, '2021-01-01', 10)
+        posting['transactions'][1]['account_id'] = 999
+        response = self.client.post(url, [posting], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('account_id', response.data[0]['transactions'][1])
+        self.assertEqual(Postings.objects.count(), 1)
+        self.assertEqual(Transactions.objects.count(), 1)
+
+    def test_bulk_create_many_unknown_accounts(self):
+        """
+        Verify ids beyond one IN list and beyond the integer columns are rejected
+
+        They're validation errors rather than a 500.
+        """
+        url = reverse('postings-bulk')
+        data = []
+        for num in range(2, 1203):
+            posting = self.build_posting(num, '2021-01-01', 10)
+            posting['transactions'][1]['account_id'] = 1000 + num
+            data.append(posting)
+        response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('account_id', response.data[-1]['transactions'][1])
+        posting = self.build_posting(2147483648, '2021-01-01', 10)
+        response = self.client.post(url, [posting], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('posting_num', response.data[0])
+        self.assertEqual(Postings.objects.count(), 1)
+
+    def test_bulk_create_not_a_list(self):
+        """
+        Verify a single posting instead of a list gets a 400 error
+        """
+        url = reverse('postings-bulk')
+        response = self.client.post(
+            url,
+            self.build_posting(2, '2021-01-01', 10),
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class PostingsExportAPITest(APITestCase):
+
+    def setUp(self):
+        account = Accounts.objects.create(account_name='Test Checking')
+        category = Categories.objects.create(category_name='Test Category')
+        for num, day in ((1, 3), (2, 1), (3, 2)):
+            posting = Postings.objects.create(
+                posting_num=num,
+                date=datetime.date(2021, 1, day),
+                payee=f'Payee, {num}'
+            )
+            Transactions.objects.create(
+                posting_num=posting,
+                account_id=account,
+                categories_id=category,
+                amount=num
+            )
+
+    def export(self, data):
+        response = self.client.get(reverse('postings-export'), data)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_export_csv(self):
+        """
+        Verify the export streams a CSV row per transaction in date order
+        """
+        response, content = self.export({'format': 'csv'})
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.DictReader(io.StringIO(content)))
+        self.assertEqual([row['posting_num'] for row in rows], ['2', '3', '1'])
+        self.assertEqual(rows[0]['payee'], 'Payee, 2')
+        self.assertEqual(rows[0]['account_name'], 'Test Checking')
+        self.assertEqual(rows[0]['category_name'], 'Test Category')
+        self.assertEqual(rows[0]['amount'], '2.0000')
+
+    def test_export_ndjson_date_range(self):
+        """
+        Verify the NDJSON export only includes postings within from and to
+        """
+        response, content = self.export(
+            {'format': 'ndjson', 'from': '2021-01-02', 'to': '2021-01-03'}
+        )
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual([row['posting_num'] for row in rows], [3, 1])
+        self.assertEqual(rows[0]['date'], '2021-01-02')
+
+    def test_export_invalid_date(self):
+        """
+        Verify an invalid from date gets a 400 error
+        """
+        response = self.client.get(
+            reverse('postings-export'),
+            {'format': 'csv', 'from': 'x'}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
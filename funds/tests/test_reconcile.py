@@ -0,0 +1,144 @@
+import datetime
+import decimal
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from rest_framework import status
+
+from funds.models import Accounts, Categories, Postings, Transactions
+
+
+class ReconcileAPITest(APITestCase):
+
+    def setUp(self):
+        self.checking = Accounts.objects.create(account_name='Test Checking')
+        self.savings = Accounts.objects.create(account_name='Test Savings')
+        self.category = Categories.objects.create(category_name='Test Category')
+        self.url = reverse('accounts-reconcile', args=[self.checking.id])
+        # Cleared on an earlier statement
+        self.create_posting(1, datetime.date(2021, 1, 1), '100.00', cleared=True)
+        self.create_posting(2, datetime.date(2021, 2, 3), '-20.00')
+        self.create_posting(3, datetime.date(2021, 2, 10), '-5.50')
+        self.create_posting(4, datetime.date(2021, 3, 2), '-7.00')
+        self.create_posting(5, datetime.date(2021, 2, 5), '40.00', account=self.savings)
+
+    def create_posting(self, num, date, amount, account=None, cleared=False):
+        posting = Postings.objects.create(posting_num=num, date=date, cleared=cleared)
+        Transactions.objects.create(
+            posting_num=posting,
+            account_id=account or self.checking,
+            categories_id=self.category,
+            amount=decimal.Decimal(amount)
+        )
+        return posting
+
+    def test_reconcile(self):
+        """
+        Verify postings are cleared when the cleared balance matches the statement
+        """
+        data = {
+            'statement_date': '2021-02-28',
+            'statement_balance': '74.50',
+            'posting_nums': [2, 3, 1],
+        }
+        response = self.client.post(self.url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {
+            'statement_date': '2021-02-28',
+            'statement_balance': '74.5000',
+            'cleared_balance': '74.5000',
+            'difference': '0.0000',
+            'cleared': 2,
+        })
+        self.assertEqual(
+            list(
+                Postings.objects.filter(cleared=True).values_list('posting_num', flat=True)
+            ),
+            [1, 2, 3]
+        )
+
+    def test_reconcile_difference(self):
+        """
+        Verify a statement balance that doesn't match clears nothing
+
+        The difference from the cleared balance is returned instead.
+        """
+        data = {
+            'statement_date': '2021-02-28',
+            'statement_balance': '80.00',
+            'posting_nums': [2, 3],
+        }
+        response = self.client.post(self.url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data['cleared_balance'], '74.5000')
+        self.assertEqual(response.data['difference'], '5.5000')
+        self.assertEqual(response.data['cleared'], 0)
+        self.assertEqual(Postings.objects.filter(cleared=True).count(), 1)
+
+    def test_reconcile_invalid_postings(self):
+        """
+        Verify postings of other accounts, after the statement or missing are rejected
+        """
+        data = {
+            'statement_date': '2021-02-28',
+            'statement_balance': '74.50',
+            'posting_nums': [2, 3, 4, 5, 99],
+        }
+        response = self.client.post(self.url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('4, 5, 99', response.data['posting_nums'][0])
+        self.assertEqual(Postings.objects.filter(cleared=True).count(), 1)
+
+        response = self.client.post(
+            self.url,
+            {'statement_date': '2021-02-28'},
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(set(response.data), {'statement_balance', 'posting_nums'})
+
+    def test_reconcile_missing_account(self):
+        """
+        Verify reconciling an account that doesn't exist is not found
+        """
+        url = reverse('accounts-reconcile', args=[self.savings.id + 1])
+        data = {
+            'statement_date': '2021-02-28',
+            'statement_balance': '0',
+            'posting_nums': [1]
+        }
+        response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_reconcile_many(self):
+        """
+        Verify reconciling many postings takes the same number of queries as a few
+        """
+        for num in range(10, 2010):
+            Postings.objects.create(posting_num=num, date=datetime.date(2021, 4, 1))
+        Transactions.objects.bulk_create(
+            Transactions(
+                posting_num_id=num,
+                account_id=self.checking,
+                categories_id=self.category,
+                amount=decimal.Decimal('-0.01')
+            )
+            for num in range(10, 2010)
+        )
+        etag = self.client.get(reverse('postings-list'))['ETag']
+        data = {
+            'statement_date': '2021-04-30',
+            'statement_balance': '47.50',
+            'posting_nums': [2, 3, 4, *range(10, 2010)],
+        }
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['cleared'], 2003)
+        self.assertLessEqual(len(queries), 7)
+        self.assertEqual(Postings.objects.filter(cleared=False).count(), 1)
+        # The cached postings lists are invalidated
+        response = self.client.get(reverse('postings-list'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
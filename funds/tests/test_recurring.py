@@ -0,0 +1,243 @@
+import datetime
+import decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from rest_framework import status
+
+from funds.models import (
+    Accounts,
+    Balances,
+    Categories,
+    Postings,
+    RecurringPostings,
+    RecurringTransactions,
+    Transactions
+)
+from funds.serializers import RecurringPostingSerializer
+
+
+class RecurringSetupMixin:
+
+    def setUp(self):
+        self.checking = Accounts.objects.create(account_name='Test Checking')
+        self.savings = Accounts.objects.create(account_name='Test Savings')
+        self.category = Categories.objects.create(category_name='Test Category')
+
+    def create_template(self, payee, amounts, **schedule):
+        template = RecurringPostings.objects.create(payee=payee, **schedule)
+        for account, amount in zip([self.checking, self.savings], amounts):
+            RecurringTransactions.objects.create(
+                recurring=template,
+                account_id=account,
+                categories_id=self.category,
+                amount=decimal.Decimal(amount)
+            )
+        return template
+
+
+class RecurringScheduleTest(TestCase):
+
+    def test_occurrences(self):
+        """
+        Verify occurrences follow the frequency and interval and stop at until or count
+        """
+        template = RecurringPostings(
+            frequency=RecurringPostings.MONTHLY,
+            start_date=datetime.date(2021, 1, 31),
+            until=datetime.date(2021, 6, 1)
+        )
+        self.assertEqual(
+            [template.occurrence(index) for index in range(6)],
+            [
+                datetime.date(2021, 1, 31),
+                datetime.date(2021, 2, 28),
+                datetime.date(2021, 3, 31),
+                datetime.date(2021, 4, 30),
+                datetime.date(2021, 5, 31),
+                None,
+            ]
+        )
+        template = RecurringPostings(
+            frequency=RecurringPostings.WEEKLY,
+            interval=2,
+            start_date=datetime.date(2021, 1, 1),
+            count=2
+        )
+        self.assertEqual(template.occurrence(1), datetime.date(2021, 1, 15))
+        self.assertIsNone(template.occurrence(2))
+        template = RecurringPostings(
+            frequency=RecurringPostings.YEARLY,
+            start_date=datetime.date(2020, 2, 29)
+        )
+        self.assertEqual(template.occurrence(1), datetime.date(2021, 2, 28))
+        self.assertEqual(template.occurrence(4), datetime.date(2024, 2, 29))
+        # Schedules end at the last date there is
+        self.assertIsNone(template.occurrence(8000))
+        template.frequency = RecurringPostings.DAILY
+        self.assertIsNone(template.occurrence(10 ** 9))
+
+
+class MaterializeRecurringTest(RecurringSetupMixin, TestCase):
+
+    def materialize(self, until):
+        out = StringIO()
+        call_command('materialize_recurring', f'--until={until}', stdout=out)
+        return out.getvalue()
+
+    def test_materialize(self):
+        """
+        Verify due occurrences of every template become postings numbered in date order
+        """
+        rent = self.create_template(
+            'Landlord',
+            ['-1000.00'],
+            start_date=datetime.date(2021, 1, 1)
+        )
+        self.create_template(
+            'Savings',
+            ['-50.00', '50.00'],
+            posting_type=Postings.TRANSFER,
+            frequency=RecurringPostings.WEEKLY,
+            interval=2,
+            start_date=datetime.date(2021, 1, 10),
+            count=3
+        )
+        self.create_template('Future', ['-1.00'], start_date=datetime.date(2022, 1, 1))
+
+        self.assertIn('Created 6 postings', self.materialize('2021-03-15'))
+        postings = list(
+            Postings.objects.order_by('posting_num').values_list('date', 'payee')
+        )
+        self.assertEqual(postings, [
+            (datetime.date(2021, 1, 1), 'Landlord'),
+            (datetime.date(2021, 1, 10), 'Savings'),
+            (datetime.date(2021, 1, 24), 'Savings'),
+            (datetime.date(2021, 2, 1), 'Landlord'),
+            (datetime.date(2021, 2, 7), 'Savings'),
+            (datetime.date(2021, 3, 1), 'Landlord'),
+        ])
+        self.assertEqual(Transactions.objects.count(), 9)
+        self.assertEqual(
+            Balances.objects.as_of(self.checking.id),
+            decimal.Decimal('-3150.00')
+        )
+        rent.refresh_from_db()
+        self.assertEqual(rent.materialized, 3)
+        self.assertEqual(rent.next_date, datetime.date(2021, 4, 1))
+
+        # Running again for the same or an earlier date creates nothing
+        self.assertIn('Created 0 postings', self.materialize('2021-03-15'))
+        self.assertIn('Created 0 postings', self.materialize('2021-02-01'))
+        self.assertEqual(Postings.objects.count(), 6)
+        self.assertIn('Created 1 postings', self.materialize('2021-04-30'))
+
+    def test_many_templates(self):
+        """
+        Verify a year of many templates is materialized with batched queries
+        """
+        for number in range(50):
+            self.create_template(
+                f'Payee {number}',
+                ['-1.00'],
+                start_date=datetime.date(2021, 1, 1)
+            )
+        with CaptureQueriesContext(connection) as queries:
+            count = RecurringPostings.objects.materialize(datetime.date(2021, 12, 31))
+        self.assertEqual(count, 600)
+        # The inserts are batched, so far fewer queries than postings
+        self.assertLess(len(queries), 40)
+
+    def test_invalid_until(self):
+        """
+        Verify an invalid date is rejected
+        """
+        with self.assertRaises(CommandError):
+            self.materialize('2021-13-01')
+        with self.assertRaises(CommandError):
+            self.materialize('9999-12-31')
+
+
+class RecurringPostingsAPITest(RecurringSetupMixin, APITestCase):
+
+    def template(self, amounts, **fields):
+        return {
+            'payee': 'Landlord',
+            'start_date': '2021-01-01',
+            'transactions': [
+                {
+                    'account_id': account.id,
+                    'categories_id': self.category.id,
+                    'amount': amount
+                }
+                for account, amount in zip([self.checking, self.savings], amounts)
+            ],
+            **fields
+        }
+
+    def test_create(self):
+        """
+        Verify a template is created with its transactions and its first occurrence
+        """
+        response = self.client.post(
+            reverse('recurringpostings-list'),
+            self.template(['-1000.00'], frequency='monthly', interval=3),
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['next_date'], '2021-01-01')
+        self.assertEqual(len(response.data['transactions']), 1)
+
+        url = reverse('recurringpostings-detail', args=[response.data['id']])
+        response = self.client.patch(url, {'start_date': '2021-02-01'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['next_date'], '2021-02-01')
+        self.assertEqual(len(response.data['transactions']), 1)
+
+    def test_update_stale(self):
+        """
+        Verify an edit of a template read before it was materialized keeps its count
+
+        The occurrences materialized in between aren't created again.
+        """
+        template = self.create_template(
+            'Landlord',
+            ['-1000.00'],
+            start_date=datetime.date(2021, 1, 1)
+        )
+        stale = RecurringPostings.objects.get(pk=template.pk)
+        RecurringPostings.objects.materialize(datetime.date(2021, 3, 15))
+        serializer = RecurringPostingSerializer(stale, data={'note': 'Rent'}, partial=True)
+        self.assertTrue(serializer.is_valid())
+        template = serializer.save()
+        template.refresh_from_db()
+        self.assertEqual(template.note, 'Rent')
+        self.assertEqual(template.materialized, 3)
+        self.assertEqual(template.next_date, datetime.date(2021, 4, 1))
+
+    def test_invalid(self):
+        """
+        Verify unbalanced transfers and schedules ending before they start are rejected
+        """
+        url = reverse('recurringpostings-list')
+        response = self.client.post(
+            url,
+            self.template(['-50.00', '40.00'], posting_type=Postings.TRANSFER),
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('-10', response.data['non_field_errors'][0])
+        response = self.client.post(
+            url,
+            self.template(['-1.00'], until='2020-12-31'),
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('until', response.data)
+        self.assertFalse(RecurringPostings.objects.exists())
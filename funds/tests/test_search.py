@@ -0,0 +1,126 @@
+import datetime
+import decimal
+
+from django.test import SimpleTestCase
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from rest_framework import status
+
+from funds.models import Accounts, Categories, Postings, Transactions
+from funds.search import word_similarity
+
+
+class SearchAPITest(APITestCase):
+
+    def setUp(self):
+        self.account = Accounts.objects.create(account_name='Test Checking')
+        self.category = Categories.objects.create(category_name='Test Category')
+        self.url = reverse('search-list')
+        self.create_posting(1, 'Starbucks Coffee', 'Latte with Sam')
+        self.create_posting(2, 'Corner Grocery', 'Coffee beans and milk')
+        self.create_posting(
+            3,
+            'Hardware Store',
+            'Paint',
+            transaction_note='Brushes for the coffee table'
+        )
+        self.create_posting(4, 'Electric Company', 'January bill')
+
+    def create_posting(self, num, payee, note, transaction_note=''):
+        posting = Postings.objects.create(
+            posting_num=num,
+            date=datetime.date(2021, 1, num),
+            payee=payee,
+            note=note
+        )
+        Transactions.objects.create(
+            posting_num=posting,
+            account_id=self.account,
+            categories_id=self.category,
+            amount=decimal.Decimal('-10.00'),
+            note=transaction_note
+        )
+        return posting
+
+    def search(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response
+
+    def test_ranked(self):
+        """
+        Verify matches in the payee rank above the note, which rank above transaction notes
+        """
+        response = self.search(q='coffee')
+        self.assertEqual(
+            [result['posting_num'] for result in response.data['results']],
+            [1, 2, 3]
+        )
+        first, second = response.data['results'][:2]
+        self.assertEqual(first['payee'], 'Starbucks Coffee')
+        self.assertGreater(first['rank'], second['rank'])
+
+        # Every word has to match
+        response = self.search(q='coffee milk')
+        self.assertEqual(
+            [result['posting_num'] for result in response.data['results']],
+            [2]
+        )
+
+    def test_misspelled_payee(self):
+        """
+        Verify a misspelled payee is still found by trigram similarity
+        """
+        response = self.search(q='starbuks')
+        self.assertEqual(
+            [result['posting_num'] for result in response.data['results']],
+            [1]
+        )
+        response = self.search(q='xylophone')
+        self.assertEqual(response.data['results'], [])
+
+    def test_pages(self):
+        """
+        Verify results are paged with links to the next and previous pages
+        """
+        response = self.search(q='coffee', page_size=2)
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIsNone(response.data['previous'])
+        response = self.client.get(response.data['next'])
+        self.assertEqual(
+            [result['posting_num'] for result in response.data['results']],
+            [3]
+        )
+        self.assertIsNone(response.data['next'])
+        self.assertIsNotNone(response.data['previous'])
+
+    def test_new_postings(self):
+        """
+        Verify postings written after a search are found by the next one
+        """
+        self.assertEqual(self.search(q='plumber').data['results'], [])
+        self.create_posting(5, 'Plumber', '')
+        self.assertEqual(
+            [result['posting_num'] for result in self.search(q='plumber').data['results']],
+            [5]
+        )
+
+    def test_invalid(self):
+        """
+        Verify a query is required and the page size is limited
+        """
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(self.url, {'q': 'coffee', 'page_size': 100000})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class WordSimilarityTest(SimpleTestCase):
+
+    def test_word_similarity(self):
+        """
+        Verify word similarity matches pg_trgm's documented examples
+        """
+        self.assertAlmostEqual(word_similarity('word', 'two words'), 0.8)
+        self.assertEqual(word_similarity('word', 'word'), 1.0)
+        self.assertEqual(word_similarity('', 'word'), 0.0)
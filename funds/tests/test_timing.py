@@ -0,0 +1,78 @@
+import datetime
+import json
+
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from rest_framework import status
+
+from funds.models import Accounts, Categories, Postings, Transactions
+
+
+class TimingMiddlewareTest(APITestCase):
+
+    def setUp(self):
+        account = Accounts.objects.create(account_name='Test Checking')
+        category = Categories.objects.create(category_name='Test Category')
+        posting = Postings.objects.create(posting_num=1, date=datetime.date(2021, 1, 1))
+        Transactions.objects.create(
+            posting_num=posting,
+            account_id=account,
+            categories_id=category,
+            amount=10
+        )
+
+    def get_timings(self, response):
+        timings = {}
+        for metric in response['Server-Timing'].split(', '):
+            name, *params = metric.split(';')
+            timings[name] = dict(param.split('=', 1) for param in params)
+        return timings
+
+    def test_server_timing(self):
+        """
+        Verify responses have a Server-Timing header with the query count and timings
+        """
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('postings-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        timings = self.get_timings(response)
+        self.assertEqual(list(timings), ['db', 'serialize', 'render', 'total'])
+        self.assertEqual(timings['db']['desc'], f'"{len(queries)} queries"')
+        self.assertGreaterEqual(
+            float(timings['total']['dur']),
+            float(timings['db']['dur'])
+        )
+
+    def test_log_line(self):
+        """
+        Verify each request is logged as a JSON line
+        """
+        with self.assertLogs('funds.timing', 'INFO') as logs:
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(reverse('postings-detail', args=[1]))
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual(line['path'], reverse('postings-detail', args=[1]))
+        self.assertEqual(line['status'], 200)
+        self.assertEqual(line['queries'], len(queries))
+        self.assertEqual(line['duplicate_queries'], 0)
+        self.assertIn('serialize_ms', line)
+
+    @override_settings(FUNDS_TIMING_DUPLICATE_THRESHOLD=0)
+    def test_duplicate_queries(self):
+        """
+        Verify statements repeated more than the threshold are logged as warnings
+        """
+        with self.assertLogs('funds.timing', 'WARNING') as logs:
+            self.client.get(reverse('postings-detail', args=[1]))
+        self.assertIn('Possible N+1', logs.records[0].getMessage())
+
+    @override_settings(FUNDS_SERVER_TIMING=False)
+    def test_server_timing_disabled(self):
+        """
+        Verify the Server-Timing header can be turned off
+        """
+        response = self.client.get(reverse('postings-list'))
+        self.assertNotIn('Server-Timing', response)
@@ -0,0 +1,137 @@
+import datetime
+import decimal
+
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from rest_framework import status
+
+from funds.models import Accounts, Categories, Postings, Transactions
+
+
+class TransfersAPITest(APITestCase):
+
+    def setUp(self):
+        self.checking = Accounts.objects.create(account_name='Test Checking')
+        self.savings = Accounts.objects.create(account_name='Test Savings')
+        self.category = Categories.objects.create(category_name='Test Category')
+
+    def create_posting(self, num, amounts, posting_type=Postings.TRANSFER):
+        posting = Postings.objects.create(
+            posting_num=num,
+            date=datetime.date(2021, 1, num),
+            posting_type=posting_type,
+            payee=f'Payee {num}'
+        )
+        for account, amount in zip([self.checking, self.savings], amounts):
+            Transactions.objects.create(
+                posting_num=posting,
+                account_id=account,
+                categories_id=self.category,
+                amount=decimal.Decimal(amount)
+            )
+        return posting
+
+    def bulk_posting(self, num, amounts, posting_type=Postings.TRANSFER):
+        return {
+            'posting_num': num,
+            'date': '2021-02-01',
+            'posting_type': posting_type,
+            'transactions': [
+                {
+                    'account_id': account.id,
+                    'categories_id': self.category.id,
+                    'amount': amount
+                }
+                for account, amount in zip([self.checking, self.savings], amounts)
+            ]
+        }
+
+    def test_unbalanced(self):
+        """
+        Verify the audit lists only the transfers that don't net to zero, in one query
+        """
+        self.create_posting(1, ['-50.00', '50.00'])
+        self.create_posting(2, ['-50.00', '45.00'])
+        self.create_posting(3, ['-20.00'], posting_type=Postings.STANDARD)
+        self.create_posting(4, ['10.00'])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('postings-unbalanced'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'], [
+            {
+                'posting_num': 2,
+                'date': '2021-01-02',
+                'payee': 'Payee 2',
+                'total': '-5.0000'
+            },
+            {
+                'posting_num': 4,
+                'date': '2021-01-04',
+                'payee': 'Payee 4',
+                'total': '10.0000'
+            },
+        ])
+        self.assertEqual(len(queries), 1)
+
+    def test_bulk_unbalanced(self):
+        """
+        Verify bulk creating an unbalanced transfer fails without writing anything
+        """
+        url = reverse('postings-bulk')
+        data = [
+            self.bulk_posting(1, ['-50.00', '50.00']),
+            self.bulk_posting(2, ['-50.00', '40.00']),
+            self.bulk_posting(3, ['-50.00', '40.00'], posting_type=Postings.STANDARD),
+        ]
+        response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data[0], {})
+        self.assertIn('-10', response.data[1]['non_field_errors'][0])
+        self.assertEqual(response.data[2], {})
+        self.assertFalse(Postings.objects.exists())
+
+        response = self.client.post(url, [data[0], data[2]], format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_bulk_import_unbalanced(self):
+        """
+        Verify bulk_import refuses unbalanced transfers
+        """
+        postings = [Postings(posting_num=1, posting_type=Postings.TRANSFER)]
+        transactions = [
+            Transactions(
+                posting_num_id=1,
+                account_id_id=self.checking.id,
+                categories_id_id=self.category.id,
+                amount=decimal.Decimal('-5')
+            )
+        ]
+        with self.assertRaises(ValidationError):
+            Postings.objects.bulk_import(postings, transactions)
+        self.assertFalse(Postings.objects.exists())
+
+    def test_update_to_transfer(self):
+        """
+        Verify a posting can only become a transfer if its transactions net to zero
+        """
+        standard = Postings.STANDARD
+        unbalanced = self.create_posting(1, ['-50.00', '45.00'], posting_type=standard)
+        balanced = self.create_posting(2, ['-50.00', '50.00'], posting_type=standard)
+        data = {'posting_type': Postings.TRANSFER}
+        response = self.client.patch(
+            reverse('postings-detail', args=[unbalanced.posting_num]),
+            data,
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('posting_type', response.data)
+        response = self.client.patch(
+            reverse('postings-detail', args=[balanced.posting_num]),
+            data,
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Postings.objects.get(pk=2).posting_type, Postings.TRANSFER)
@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from funds import views
+from funds import async_views, views
 
 # Create a router and register our viewsets with it.
 router = DefaultRouter()
@@ -8,9 +8,30 @@ router.register(r'accounts', views.AccountsViewset)
 router.register(r'categories', views.CategoriesViewset)
 router.register(r'postings', views.PostingsViewset)
 router.register(r'transactions', views.TransactionsViewset)
+router.register(r'recurring-postings', views.RecurringPostingsViewset)
 router.register(r'budgets', views.BudgetsViewset)
+router.register(
+    r'analytics/monthly',
+    views.MonthlyRollupsViewset,
+    basename='analytics-monthly'
+)
+router.register(r'payees', views.PayeesViewset, basename='payees')
+router.register(r'reports', views.ReportsViewset, basename='reports')
+router.register(r'search', views.SearchViewset, basename='search')
 
 # The API URLs are now determined automatically by the router.
 urlpatterns = [
     path('api/v1/', include(router.urls)),
+    path('api/v1/async/postings/', async_views.postings, name='async-postings'),
+    path(
+        'api/v1/async/transactions/',
+        async_views.transactions,
+        name='async-transactions'
+    ),
+    path(
+        'api/v1/async/accounts/<int:pk>/balance/',
+        async_views.account_balance,
+        name='async-accounts-balance'
+    ),
+    path('metrics', views.metrics, name='metrics'),
 ]
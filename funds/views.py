@@ -1,50 +1,505 @@
-from rest_framework import viewsets
+import decimal
+from collections import defaultdict
 
-from funds.models import Accounts, Categories, Postings, Transactions, Budgets
+from django.conf import settings
+from django.db.models import DecimalField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.http import HttpResponse, StreamingHttpResponse
+from rest_framework import mixins, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from funds.cache import get_list_etag
+from funds.exports import export_rows, stream_csv, stream_ndjson
+from funds.filters import KeysetOrderingFilter, QueryParamFilterBackend
+from funds.forecast import forecast
+from funds.metrics import registry
+from funds.models import (
+    Accounts,
+    Balances,
+    Categories,
+    MonthlyRollups,
+    Postings,
+    RecurringPostings,
+    Transactions,
+    Budgets
+)
+from funds.pagination import MonthlyRollupsPagination, PostingsPagination
+from funds.payees import payee_index
+from funds.renderers import CompactJSONRenderer, CSVRenderer, NDJSONRenderer
+from funds.search import search
 from funds.serializers import (
     AccountSerializer,
+    BalanceSerializer,
     CategorySerializer,
     PostingSerializer,
     TransactionSerializer,
-    BudgetSerializer
+    BudgetSerializer,
+    BudgetReportSerializer,
+    BudgetReportRowSerializer,
+    BulkImportSerializer,
+    BulkPostingSerializer,
+    ExportSerializer,
+    ForecastSerializer,
+    MonthlyRollupSerializer,
+    MonthlyRollupFilterSerializer,
+    NetWorthSerializer,
+    PayeeSuggestSerializer,
+    PayeeSuggestionSerializer,
+    PostingFilterSerializer,
+    ReconcileSerializer,
+    RecurringPostingSerializer,
+    ReserveSerializer,
+    SearchSerializer,
+    SearchResultSerializer,
+    TransactionFilterSerializer,
+    UnbalancedPostingSerializer,
+    BudgetFilterSerializer
 )
 
 
-class AccountsViewset(viewsets.ModelViewSet):
+class ETagListMixin:
+    """
+    Answer list requests with 304 Not Modified when the client's ETag is current
+
+    The ETag is built from the cache versions of etag_models, so a matching
+    request is answered without touching the database or serializing.
+    """
+    etag_models = []
+
+    def list(self, request, *args, **kwargs):
+        etag = get_list_etag(request, self.etag_models)
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH', '')
+        if etag in (tag.strip() for tag in if_none_match.split(',')):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = super().list(request, *args, **kwargs)
+        response['ETag'] = etag
+        return response
+
+
+class CompactListMixin:
+    """
+    Serve lists as flat rows of values when asked for the compact representation
+
+    Selected with ?view=compact or `Accept: application/vnd.funds.compact+json`,
+    which only the list action offers. Rows come straight from values_list()
+    with foreign keys as integer ids, bypassing the serializer fields and
+    hyperlinks entirely. The first of compact_fields must be the primary key.
+
+    compact_children is the related name and fields of rows nested in each
+    row, like a posting's transactions. They are read for the whole page with
+    one more query and added as a last column holding arrays of the fields.
+    """
+    compact_fields = []
+    compact_children = None
+
+    def get_renderers(self):
+        renderers = super().get_renderers()
+        if self.action == 'list':
+            renderers.append(CompactJSONRenderer())
+        return renderers
+
+    def get_compact_children(self, rows):
+        """
+        Get the nested rows of each row's primary key as lists of arrays
+        """
+        name, fields = self.compact_children
+        relation = self.get_queryset().model._meta.get_field(name)
+        parent = relation.field.name
+        children = defaultdict(list)
+        keys = [row[0] for row in rows]
+        nested = (
+            relation.related_model.objects.filter(**{f'{parent}__in': keys})
+            .order_by('pk')
+            .values_list(parent, *fields)
+        )
+        for key, *values in nested:
+            children[key].append(values)
+        return children
+
+    def list(self, request, *args, **kwargs):
+        if request.query_params.get('view') == 'compact':
+            request.accepted_renderer = CompactJSONRenderer()
+            request.accepted_media_type = CompactJSONRenderer.media_type
+        elif request.accepted_renderer.format != CompactJSONRenderer.format:
+            return super().list(request, *args, **kwargs)
+
+        queryset = (
+            self.filter_queryset(self.get_queryset())
+            .prefetch_related(None)
+            .values_list(*self.compact_fields, named=True)
+        )
+        page = self.paginate_queryset(queryset)
+        rows = list(queryset) if page is None else page
+        data = {'columns': self.compact_fields}
+        if self.compact_children:
+            name, fields = self.compact_children
+            children = self.get_compact_children(rows)
+            rows = [[*row, children[row[0]]] for row in rows]
+            data = {
+                'columns': [*self.compact_fields, name],
+                'nested_columns': {name: fields}
+            }
+        if page is None:
+            return Response({**data, 'results': rows})
+        response = self.get_paginated_response(rows)
+        response.data.update(data)
+        response.data.move_to_end('results')
+        return response
+
+
+class AccountsViewset(ETagListMixin, CompactListMixin, viewsets.ModelViewSet):
     """
     Viewset for the Accounts table
     """
-    queryset = Accounts.objects.all()
+    queryset = Accounts.objects.annotate(
+        current_balance=Coalesce(
+            Subquery(
+                Balances.objects.filter(account_id=OuterRef('pk'))
+                .order_by('-date')
+                .values('balance')[:1]
+            ),
+            Value(decimal.Decimal(0)),
+            output_field=DecimalField(max_digits=19, decimal_places=4)
+        )
+    )
     serializer_class = AccountSerializer
+    etag_models = ['accounts', 'postings', 'transactions', 'balances']
+    compact_fields = [
+        'id', 'account_name', 'created_date',
+        'account_type', 'current_balance'
+    ]
+
+    @action(detail=True)
+    def balance(self, request, pk=None):
+        """
+        Get the balance of the account, optionally as of the end of a date
+        """
+        account = self.get_object()
+        serializer = BalanceSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        as_of = serializer.validated_data.get('as_of')
+        balance = Balances.objects.as_of(account.pk, as_of)
+        return Response(BalanceSerializer({'as_of': as_of, 'balance': balance}).data)
+
+    @action(detail=True)
+    def forecast(self, request, pk=None):
+        """
+        Project the account's balance at the end of each of the next ?days=, from today
 
+        Adds future dated postings, recurring postings and the budgeted
+        spending of the categories the account usually pays for.
+        """
+        account = self.get_object()
+        serializer = ForecastSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        points = forecast(account.pk, serializer.validated_data['days'])
+        # Formatted directly, a serializer per point costs more than the forecast
+        return Response({
+            'days': serializer.validated_data['days'],
+            'results': [
+                {'date': date.isoformat(), 'balance': str(balance)}
+                for date, balance in points
+            ]
+        })
 
-class CategoriesViewset(viewsets.ModelViewSet):
+    @action(detail=True, methods=['post'], serializer_class=ReconcileSerializer)
+    def reconcile(self, request, pk=None):
+        """
+        Clear the account's postings in posting_nums against a bank statement
+
+        The postings are only cleared, all at once, when the account's cleared
+        balance as of statement_date then equals statement_balance. Otherwise
+        nothing changes and the response has the difference.
+        """
+        account = self.get_object()
+        serializer = ReconcileSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        result = Postings.objects.reconcile(account.pk, **serializer.validated_data)
+        if result['missing']:
+            return Response(
+                {'posting_nums': [
+                    'Not postings of this account dated on or before the statement date: '
+                    + ', '.join(map(str, result['missing']))
+                ]},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        data = ReconcileSerializer({**serializer.validated_data, **result}).data
+        if result['difference']:
+            return Response(
+                {
+                    'detail': 'The cleared balance does not match the statement balance.',
+                    **data
+                },
+                status=status.HTTP_409_CONFLICT
+            )
+        return Response(data)
+
+
+class CategoriesViewset(ETagListMixin, CompactListMixin, viewsets.ModelViewSet):
     """
     Viewset for the Categories table
     """
     queryset = Categories.objects.all()
     serializer_class = CategorySerializer
+    etag_models = ['categories']
+    compact_fields = ['id', 'category_name', 'created_date']
 
 
-class PostingsViewset(viewsets.ModelViewSet):
+class PostingsViewset(ETagListMixin, CompactListMixin, viewsets.ModelViewSet):
     """
     Viewset for the Postings table
     """
-    queryset = Postings.objects.all()
+    queryset = Postings.objects.prefetch_related('transactions')
     serializer_class = PostingSerializer
+    etag_models = ['postings', 'transactions', 'accounts', 'categories']
+    compact_fields = ['posting_num', 'date', 'posting_type', 'payee', 'cleared', 'note']
+    compact_children = (
+        'transactions',
+        ['id', 'account_id', 'categories_id', 'amount', 'note']
+    )
+    pagination_class = PostingsPagination
+    filter_backends = [QueryParamFilterBackend, KeysetOrderingFilter]
+    filter_serializer_class = PostingFilterSerializer
+    ordering_fields = ['date', 'posting_num', 'payee']
+
+    @action(detail=False, methods=['post'], serializer_class=BulkPostingSerializer)
+    def bulk(self, request):
+        """
+        Create a list of postings with their nested transactions in one atomic batch
 
+        Every posting is validated before anything is written. On success the
+        response lists the posting_num and number of transactions of each item,
+        otherwise it lists the errors of each item in the same order.
+        """
+        options = BulkImportSerializer(data=request.query_params)
+        options.is_valid(raise_exception=True)
+        context = self.get_serializer_context()
+        context['batch_size'] = options.validated_data.get('batch_size')
+        serializer = BulkPostingSerializer(data=request.data, many=True, context=context)
+        serializer.is_valid(raise_exception=True)
+        results = [
+            {
+                'posting_num': posting['posting_num'],
+                'transactions': len(posting['transactions'])
+            }
+            for posting in serializer.validated_data
+        ]
+        serializer.save()
+        return Response({'results': results}, status=status.HTTP_201_CREATED)
 
-class TransactionsViewset(viewsets.ModelViewSet):
+    @action(detail=False, methods=['post'], serializer_class=ReserveSerializer)
+    def reserve(self, request):
+        """
+        Reserve a block of posting numbers for a client to create postings with
+
+        The numbers are returned as ranges of consecutive numbers, first and
+        last included, and are never handed out again. Parallel importers can
+        each reserve blocks and write their postings without coordinating.
+        """
+        serializer = ReserveSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ranges = []
+        for posting_num in Postings.objects.allocate(serializer.validated_data['count']):
+            if ranges and ranges[-1]['last'] == posting_num - 1:
+                ranges[-1]['last'] = posting_num
+            else:
+                ranges.append({'first': posting_num, 'last': posting_num})
+        data = ReserveSerializer({**serializer.validated_data, 'ranges': ranges}).data
+        return Response(data, status=status.HTTP_201_CREATED)
+
+    @action(detail=False)
+    def unbalanced(self, request):
+        """
+        List every transfer whose transactions don't net to zero, with their total
+        """
+        serializer = UnbalancedPostingSerializer(Postings.objects.unbalanced(), many=True)
+        return Response({'results': serializer.data})
+
+    @action(detail=False, renderer_classes=[CSVRenderer, NDJSONRenderer])
+    def export(self, request):
+        """
+        Stream every transaction with its posting, account and category as CSV or NDJSON
+
+        Choose the format with ?format=csv|ndjson or the Accept header and
+        limit the posting dates with ?from=&to=.
+        """
+        serializer = ExportSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        rows = export_rows(
+            serializer.validated_data.get('from'),
+            serializer.validated_data.get('to'),
+            chunk_size=settings.FUNDS_EXPORT_CHUNK_SIZE
+        )
+        renderer = request.accepted_renderer
+        stream = stream_csv(rows) if renderer.format == 'csv' else stream_ndjson(rows)
+        response = StreamingHttpResponse(stream, content_type=renderer.media_type)
+        filename = f'postings.{renderer.format}'
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+
+class TransactionsViewset(ETagListMixin, CompactListMixin, viewsets.ModelViewSet):
     """
     Viewset for the Transactions table
     """
     queryset = Transactions.objects.all()
     serializer_class = TransactionSerializer
+    etag_models = ['transactions', 'postings', 'accounts', 'categories']
+    compact_fields = ['id', 'posting_num', 'account_id', 'categories_id', 'amount', 'note']
+    filter_backends = [QueryParamFilterBackend, KeysetOrderingFilter]
+    filter_serializer_class = TransactionFilterSerializer
+    ordering_fields = ['id', 'amount']
+
+
+class RecurringPostingsViewset(viewsets.ModelViewSet):
+    """
+    Viewset for the templates of recurring postings
+
+    They are made into postings by the materialize_recurring command.
+    """
+    queryset = RecurringPostings.objects.prefetch_related('transactions')
+    serializer_class = RecurringPostingSerializer
 
 
-class BudgetsViewset(viewsets.ModelViewSet):
+class BudgetsViewset(ETagListMixin, CompactListMixin, viewsets.ModelViewSet):
     """
     Viewset for the Budgets table
     """
     queryset = Budgets.objects.all()
     serializer_class = BudgetSerializer
+    etag_models = ['budgets', 'categories']
+    compact_fields = ['id', 'month', 'year', 'categories_id', 'amount']
+    filter_backends = [QueryParamFilterBackend, KeysetOrderingFilter]
+    filter_serializer_class = BudgetFilterSerializer
+    ordering_fields = ['id', 'year', 'month']
+
+    @action(detail=False)
+    def report(self, request):
+        """
+        Compare budgeted and actual spending per category for a month or a whole year
+        """
+        serializer = BudgetReportSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        year = serializer.validated_data['year']
+        month = serializer.validated_data.get('month')
+        rows = Budgets.objects.report(year, month)
+        return Response({
+            'year': year,
+            'month': month,
+            'results': BudgetReportRowSerializer(rows, many=True).data
+        })
+
+
+class MonthlyRollupsViewset(ETagListMixin, mixins.ListModelMixin, viewsets.GenericViewSet):
+    """
+    Viewset for the monthly spending rollups per category and account
+    """
+    queryset = MonthlyRollups.objects.all()
+    serializer_class = MonthlyRollupSerializer
+    etag_models = ['postings', 'transactions', 'monthlyrollups']
+    pagination_class = MonthlyRollupsPagination
+    filter_backends = [QueryParamFilterBackend]
+    filter_serializer_class = MonthlyRollupFilterSerializer
+
+
+class PayeesViewset(viewsets.ViewSet):
+    """
+    Payees of past postings
+    """
+
+    @action(detail=False)
+    def suggest(self, request):
+        """
+        Suggest the most used payees starting with ?prefix=
+
+        Each comes with the category and account it usually goes with. Answered
+        from an index kept in memory, without querying the database.
+        """
+        serializer = PayeeSuggestSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        suggestions = payee_index.suggest(
+            serializer.validated_data['prefix'],
+            serializer.validated_data['limit']
+        )
+        return Response({
+            'results': PayeeSuggestionSerializer(suggestions, many=True).data
+        })
+
+
+class ReportsViewset(viewsets.ViewSet):
+    """
+    Reports computed from the whole ledger
+    """
+
+    @action(detail=False, url_path='net-worth')
+    def net_worth(self, request):
+        """
+        Total assets, liabilities and net worth at the end of every ?interval=
+
+        The interval is a day, week or month. Each point is dated with the
+        first day of its period, and periods without transactions are left out.
+        """
+        serializer = NetWorthSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        interval = serializer.validated_data['interval']
+        # Formatted directly, a daily series has thousands of points
+        return Response({
+            'interval': interval,
+            'results': [
+                {
+                    'date': date.isoformat(),
+                    'assets': str(assets),
+                    'liabilities': str(liabilities),
+                    'net_worth': str(assets - liabilities),
+                }
+                for date, assets, liabilities in Transactions.objects.net_worth(interval)
+            ]
+        })
+
+
+class SearchViewset(viewsets.ViewSet):
+    """
+    Search postings by payee and note and by the notes of their transactions
+
+    Results are ranked best match first and paged with ?page=&page_size=.
+    """
+
+    def list(self, request):
+        serializer = SearchSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        page = serializer.validated_data['page']
+        page_size = serializer.validated_data['page_size']
+        # Fetch an extra row to find out if there is a following page
+        results = search(
+            serializer.validated_data['q'],
+            offset=(page - 1) * page_size,
+            limit=page_size + 1
+        )
+        url = request.build_absolute_uri()
+        if page == 1:
+            previous = None
+        elif page == 2:
+            previous = remove_query_param(url, 'page')
+        else:
+            previous = replace_query_param(url, 'page', page - 1)
+        next_url = None
+        if len(results) > page_size:
+            next_url = replace_query_param(url, 'page', page + 1)
+        return Response({
+            'next': next_url,
+            'previous': previous,
+            'results': SearchResultSerializer(results[:page_size], many=True).data
+        })
+
+
+def metrics(request):
+    """
+    Expose the request and ledger metrics in the Prometheus text format
+    """
+    return HttpResponse(
+        registry.render(),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )